@@ -0,0 +1,155 @@
+"""Time each stage of the analysis on synthetic data
+
+Results are written as JSON lines with one record per stage, crystal system
+and number of rows. Passing a previous result file with ``--compare`` reports
+the ratio of the timings and exits with a non-zero status when a stage slowed
+down by more than ``--threshold``.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from functools import partial
+
+import crystalsystems
+import numpy as np
+from crystalsystems import __version__
+from crystalsystems.cif import loadCIF
+from crystalsystems.lattice import LatticeBuilder
+from crystalsystems.lstsq import getCrystalSystem, getLattice
+from synthetic import LATTICES, generate, writeCIF
+
+
+def _best_time(function, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def runStages(system: str, rows: int, repeat: int = 3, directory: str = None):
+    """Time every stage for one crystal system and size and yield a record per stage"""
+    lattice, hkl, d_vals = generate(system, rows)
+
+    with tempfile.TemporaryDirectory(dir=directory) as scratch:
+        filename = os.path.join(scratch, f"{system}.cif")
+        with open(filename, "w") as handle:
+            writeCIF(handle, lattice, hkl, d_vals)
+
+        def load():
+            with open(filename, "r") as handle:
+                loadCIF(handle)
+
+        stages = {
+            "loadCIF": load,
+            "getLattice": lambda: getLattice(hkl, d_vals),
+            "getCrystalSystem": lambda: getCrystalSystem(hkl, d_vals),
+            "toDspacings": lambda: lattice.toDspacings(hkl),
+            "LatticeBatch": lambda: batch(system, rows),
+        }
+        for stage, function in stages.items():
+            seconds = _best_time(function, repeat)
+            yield {"stage": stage, "system": system, "rows": rows, "seconds": seconds, "rows_per_sec": rows / seconds}
+
+
+def batch(system: str, rows: int):
+    """Build ``rows`` copies of the cell as one batch and calculate the reciprocal and B-matrices"""
+    constants = np.tile(LATTICES[system], (rows, 1)).T
+    cells = LatticeBuilder.construct_from_scalars(*constants)
+    cells.reciprocal()
+    cells.toB()
+
+
+def runLatticeStages(system: str, repeat: int = 3, calls: int = 1000):
+    """Time the single-lattice operations, which do not depend on the number of rows"""
+    lattice, hkl, _ = generate(system, calls)
+    vectors = lattice.vectors
+
+    stages = {
+        "reciprocal": lambda: [LatticeBuilder.construct_from_vectors(*vectors).reciprocal() for _ in range(calls)],
+        "toB": lambda: [LatticeBuilder.construct_from_vectors(*vectors).toB() for _ in range(calls)],
+        "toDspacing": lambda: [lattice.toDspacing(*vals) for vals in hkl],
+    }
+    for stage, function in stages.items():
+        seconds = _best_time(function, repeat) / calls
+        yield {"stage": stage, "system": system, "rows": 1, "seconds": seconds, "rows_per_sec": 1 / seconds}
+
+
+def runStartupStages(repeat: int = 3):
+    """Time starting the command line in a fresh interpreter, which should never need numpy"""
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(crystalsystems.__file__)))
+    commands = {
+        "startup python": [sys.executable, "-c", "pass"],
+        "startup --version": [sys.executable, "-m", "crystalsystems", "--version"],
+        "startup error": [sys.executable, "-m", "crystalsystems"],
+    }
+    for stage, command in commands.items():
+        seconds = _best_time(partial(subprocess.run, command, env=env, capture_output=True), repeat)
+        yield {"stage": stage, "system": "cli", "rows": 1, "seconds": seconds, "rows_per_sec": 1 / seconds}
+
+
+def compare(records, previous, threshold: float) -> int:
+    """Print the ratio to previous timings and return the number of regressions"""
+    baseline = {(record["stage"], record["system"], record["rows"]): record["seconds"] for record in previous}
+    regressions = 0
+    for record in records:
+        key = (record["stage"], record["system"], record["rows"])
+        if key not in baseline:
+            continue
+        ratio = record["seconds"] / baseline[key]
+        flag = ""
+        if ratio > 1.0 + threshold:
+            regressions += 1
+            flag = "  REGRESSION"
+        print(f"{record['stage']:>16} {record['system']:>12} {record['rows']:>9} {ratio:6.2f}x{flag}")
+    return regressions
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 100000], help="Number of reflections")
+    parser.add_argument("--systems", nargs="+", default=list(LATTICES), choices=list(LATTICES))
+    parser.add_argument("--repeat", type=int, default=3, help="Take the best of this many runs")
+    parser.add_argument("-o", "--output", type=argparse.FileType("w"), default="-", help="Where to write results")
+    parser.add_argument("--compare", type=argparse.FileType("r"), help="Previous results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown (default: %(default)s)")
+    parser.add_argument("--tmpdir", help="Where to write the synthetic CIF files")
+    args = parser.parse_args(args)
+
+    environment = {
+        "version": __version__,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+    }
+
+    def results():
+        yield from runStartupStages(repeat=args.repeat)
+        for system in args.systems:
+            yield from runLatticeStages(system, repeat=args.repeat)
+        for rows in args.sizes:
+            for system in args.systems:
+                yield from runStages(system, rows, repeat=args.repeat, directory=args.tmpdir)
+
+    records = []
+    for record in results():
+        record.update(environment)
+        records.append(record)
+        args.output.write(json.dumps(record) + "\n")
+        args.output.flush()
+
+    if args.compare:
+        previous = [json.loads(line) for line in args.compare if line.strip()]
+        if compare(records, previous, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,35 @@
+"""Synthetic reflection lists generated from known lattices"""
+import numpy as np
+from crystalsystems.lattice import LatticeBuilder
+
+# one representative cell for every crystal system
+LATTICES = {
+    "cubic": (5.43, 5.43, 5.43, 90, 90, 90),
+    "hexagonal": (3.21, 3.21, 5.21, 90, 90, 120),
+    "tetragonal": (4.59, 4.59, 2.96, 90, 90, 90),
+    "orthorhombic": (4.76, 10.2, 5.98, 90, 90, 90),
+    "monoclinic": (5.15, 5.21, 5.31, 90, 99.2, 90),
+    "triclinic": (6.608677, 6.847855, 7.525497, 106.10666, 106.50219, 111.62796),
+}
+
+
+def generate(system: str, rows: int, hmax: int = 20, seed: int = 42):
+    """Return ``(lattice, hkl, d_vals)`` with ``rows`` random reflections of the named crystal system"""
+    lattice = LatticeBuilder.construct_from_scalars(*LATTICES[system])
+
+    rng = np.random.default_rng(seed)
+    hkl = rng.integers(-hmax, hmax + 1, size=(rows, 3))
+    # (0, 0, 0) has no d-spacing
+    origin = ~hkl.any(axis=1)
+    hkl[origin] = (1, 0, 0)
+
+    return lattice, hkl, lattice.toDspacings(hkl)
+
+
+def writeCIF(handle, lattice, hkl, d_vals):
+    """Write reflections in the format read by :func:`crystalsystems.cif.loadCIF`"""
+    for label, value in zip(("a", "b", "c", "al", "be", "ga"), lattice.scalar_lattice_constants()):
+        handle.write(f"# {label:<4} {value:.6f}\n")
+    handle.write("\nh   k   l   m    d_spacing\n\n")
+    multiplicity = np.full(len(d_vals), 2)
+    np.savetxt(handle, np.column_stack((hkl, multiplicity, d_vals)), fmt="%d %d %d %d %.8f")
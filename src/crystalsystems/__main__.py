@@ -1,8 +1,9 @@
+import contextlib
 import logging
+import sys
 
-from crystalsystems import __version__
-from crystalsystems.cif import loadCIF
-from crystalsystems.lstsq import getLattice
+# only lightweight modules here, anything that needs numpy is imported once there is work to do
+from crystalsystems import __version__, profiling
 
 
 def main(args=None):
@@ -28,7 +29,67 @@ def main(args=None):
         choices=["debug", "info", "warn", "error"],
         help="The log level (default: %(default)s)",
     )
-    parser.add_argument("filename", nargs="?", type=argparse.FileType("r"), help="Name of CIF file to read in")
+    parser.add_argument(
+        "filename",
+        nargs="*",
+        help="Name of CIF file to read in. Batch mode also accepts directories and glob patterns",
+    )
+    parser.add_argument(
+        "--cache",
+        nargs="?",
+        const="",
+        metavar="DIR",
+        help="Reuse parsed reflections from an on-disk cache "
+        "(default directory: $CRYSTALSYSTEMS_CACHE or ~/.cache/crystalsystems)",
+    )
+    parser.add_argument("--clear-cache", action="store_true", help="Remove everything from the cache before running")
+    parser.add_argument(
+        "--streaming",
+        action="store_true",
+        help="Fit the reflections of a single file a chunk at a time, so files of any size fit in memory",
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="",
+        metavar="FILE",
+        help="Print the time spent in each stage to stderr and optionally write cProfile statistics to FILE. "
+        "Batch mode only times stages run in-process, see --jobs",
+    )
+    batch = parser.add_argument_group("batch mode")
+    batch.add_argument(
+        "--batch", action="store_true", help="Process many files in parallel and write one record per file"
+    )
+    batch.add_argument(
+        "-j", "--jobs", type=int, help="Number of worker processes (default: number of CPUs, 1 runs in-process)"
+    )
+    batch.add_argument(
+        "--format",
+        dest="output_format",
+        default="jsonl",
+        choices=["jsonl", "csv"],
+        help="Format of the records (default: %(default)s)",
+    )
+    batch.add_argument(
+        "-o",
+        "--output",
+        type=argparse.FileType("w"),
+        default="-",
+        help="Where to write the records (default: stdout)",
+    )
+    server = parser.add_argument_group("server mode")
+    server.add_argument(
+        "--serve",
+        action="store_true",
+        help="Answer JSON-lines requests from stdin, or from --socket, using the --jobs worker processes",
+    )
+    server.add_argument("--socket", metavar="PATH", help="Listen on a Unix socket rather than stdin")
+    server.add_argument(
+        "--max-pending",
+        type=int,
+        default=64,
+        help="Requests in flight before no more are read (default: %(default)s)",
+    )
     # configure
     args = parser.parse_args(args)
 
@@ -36,25 +97,105 @@ def main(args=None):
         print(__version__)
         return 0
 
+    # check everything that does not need the heavy modules first
+    if args.serve and (args.filename or args.batch):
+        parser.error("--serve does not take files or --batch")
+    if args.streaming and (args.batch or args.serve):
+        parser.error("--streaming only applies to a single file, not --batch or --serve")
+    if args.socket and not args.serve:
+        parser.error("--socket requires --serve")
+    if args.max_pending < 1:
+        parser.error("--max-pending must be at least 1")
+    if not args.filename and not args.clear_cache and not args.serve:
+        parser.error("Failed to specify any work to do")
+    if len(args.filename) > 1 and not args.batch:
+        parser.error("Multiple files require --batch")
+    if args.jobs is not None and args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if args.filename and not args.batch:
+        # the same message argparse.FileType gives, in single-file and cached mode alike
+        try:
+            open(args.filename[0], "r").close()
+        except OSError as e:
+            parser.error(f"argument filename: can't open '{args.filename[0]}': {e}")
+
     # configure logging - setup default handlers and formatting
     logging.basicConfig(level=args.log.upper())
     logger = logging.getLogger("crystalsystems")
 
-    if args.filename:
-        lattice_exp, hkl, dSpacing = loadCIF(args.filename)
+    if args.profile is None:
+        return _run(args, parser, logger)
+
+    import cProfile
+
+    profiling.reset()
+    profiling.enable()
+    profiler = cProfile.Profile() if args.profile else None
+    if profiler:
+        profiler.enable()
+    try:
+        return _run(args, parser, logger)
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+        profiling.disable()
+        print(profiling.formatReport(), file=sys.stderr)
+
+
+def _run(args, parser, logger):
+    """Do the work that was asked for once the arguments are parsed"""
+    from crystalsystems.batch import expandPaths, runBatch
+    from crystalsystems.cache import ReflectionCache
+    from crystalsystems.cif import loadCIF, loadCIFChunks
+    from crystalsystems.lstsq import getLattice, getLatticeStreaming, iterChunks
+
+    if args.cache == "":
+        # the cache picks its default directory, the workers need to be told which one that was
+        args.cache = ReflectionCache().directory
+
+    if args.clear_cache:
+        ReflectionCache(args.cache).clear()
+        logger.info("Cleared the cache")
+        if not args.filename and not args.serve:
+            return 0
+
+    if args.serve:
+        from crystalsystems.server import runServer
+
+        runServer(args.socket, jobs=args.jobs, max_pending=args.max_pending, cache_directory=args.cache)
+        return 0
+
+    if args.batch:
+        filenames = expandPaths(args.filename)
+        if not filenames:
+            parser.error("Failed to find any files to process")
+        failures = runBatch(
+            filenames, args.output, jobs=args.jobs, output_format=args.output_format, cache_directory=args.cache
+        )
+        return 1 if failures else 0
+
+    with contextlib.ExitStack() as stack:
+        if args.cache:
+            lattice_exp, hkl, dSpacing = ReflectionCache(args.cache).loadCIF(args.filename[0])
+            chunks = iterChunks(hkl, dSpacing)
+        elif args.streaming:
+            handle = stack.enter_context(open(args.filename[0], "r"))
+            lattice_exp, chunks = loadCIFChunks(handle)
+        else:
+            with open(args.filename[0], "r") as handle:
+                lattice_exp, hkl, dSpacing = loadCIF(handle)
         if lattice_exp:
             logger.info(f"CIF file contained {lattice_exp}")
 
         # find the lattice and output the result
-        lattice_obs = getLattice(hkl, dSpacing)
-        logger.info("Found lattice:")
-        logger.info(lattice_obs)
-    else:
-        # error out if file wasn't provided
-        parser.error("Failed to specify any work to do")
+        if args.streaming:
+            lattice_obs = getLatticeStreaming(chunks)
+        else:
+            lattice_obs = getLattice(hkl, dSpacing)
+    logger.info("Found lattice:")
+    logger.info(lattice_obs)
 
 
 if __name__ == "__main__":
-    import sys
-
     sys.exit(main())
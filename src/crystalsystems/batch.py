@@ -0,0 +1,107 @@
+import csv
+import glob
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import partial
+from typing import Dict, Iterable, List
+
+from crystalsystems.cache import ReflectionCache
+from crystalsystems.cif import loadCIF
+from crystalsystems.lstsq import getLattice
+
+logger = logging.getLogger("crystalsystems.batch")
+
+FIELDS = ["filename", "status", "reflections", "a", "b", "c", "alpha", "beta", "gamma", "error"]
+
+
+def expandPaths(paths: Iterable[str], pattern: str = "*.cif") -> List[str]:
+    """Expand directories and glob patterns into a sorted list of files without duplicates"""
+    filenames = []
+    for path in paths:
+        if os.path.isdir(path):
+            filenames.extend(sorted(glob.glob(os.path.join(path, pattern))))
+        elif glob.has_magic(path):
+            filenames.extend(sorted(glob.glob(path, recursive=True)))
+        else:
+            filenames.append(path)
+    # preserve the order that things were requested in
+    return list(dict.fromkeys(filenames))
+
+
+def processFile(filename: str, cache_directory: str = None) -> Dict:
+    """Run ``loadCIF`` and ``getLattice`` on one file and return a flat record
+
+    Failures are reported in the record rather than raised so one bad file
+    does not stop the rest of a batch. Supplying ``cache_directory`` reads the
+    reflections through a :class:`crystalsystems.cache.ReflectionCache`.
+    """
+    record = dict.fromkeys(FIELDS)
+    record["filename"] = filename
+    try:
+        if cache_directory:
+            _, hkl, dSpacing = ReflectionCache(cache_directory).loadCIF(filename)
+        else:
+            with open(filename, "r") as handle:
+                _, hkl, dSpacing = loadCIF(handle)
+        lattice = getLattice(hkl, dSpacing)
+    except Exception as e:  # noqa: BLE001
+        record["status"] = "error"
+        record["error"] = f"{type(e).__name__}: {e}"
+        return record
+
+    record["status"] = "ok"
+    record["reflections"] = len(dSpacing)
+    for label, value in zip(FIELDS[3:9], lattice.scalar_lattice_constants()):
+        record[label] = float(value)
+    return record
+
+
+class _RecordWriter:
+    def __init__(self, output, output_format: str):
+        self.output = output
+        if output_format == "csv":
+            self._csv = csv.DictWriter(output, fieldnames=FIELDS)
+            self._csv.writeheader()
+        elif output_format == "jsonl":
+            self._csv = None
+        else:
+            raise ValueError(f"Unknown output format {output_format}")
+
+    def write(self, record: Dict):
+        if self._csv:
+            self._csv.writerow(record)
+        else:
+            self.output.write(json.dumps(record) + "\n")
+        self.output.flush()
+
+
+def runBatch(
+    filenames: Iterable[str], output, jobs: int = None, output_format: str = "jsonl", cache_directory: str = None
+) -> int:
+    """Process many files and write a record to ``output`` as each one finishes
+
+    ``jobs`` is the number of worker processes, with ``None`` meaning one per
+    CPU and ``1`` meaning everything runs in the calling process. Returns the
+    number of files that failed.
+    """
+    writer = _RecordWriter(output, output_format)
+    filenames = list(filenames)
+    process = partial(processFile, cache_directory=cache_directory)
+    failures = 0
+
+    if jobs == 1:
+        for record in map(process, filenames):
+            failures += record["status"] != "ok"
+            writer.write(record)
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = [executor.submit(process, filename) for filename in filenames]
+            for future in as_completed(futures):
+                record = future.result()
+                failures += record["status"] != "ok"
+                writer.write(record)
+
+    logger.info(f"Processed {len(filenames)} files with {failures} failures")
+    return failures
@@ -0,0 +1,107 @@
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from crystalsystems.cif import loadCIF
+from crystalsystems.lattice import Lattice
+
+logger = logging.getLogger("crystalsystems.cache")
+
+DEFAULT_DIRECTORY = os.path.join(os.path.expanduser("~"), ".cache", "crystalsystems")
+DEFAULT_MAX_BYTES = 1024**3
+
+
+class ReflectionCache:
+    """On-disk cache of parsed CIF files
+
+    Every entry is a directory of ``.npy`` files named after a hash of the
+    absolute path, modification time and size of the source file, so an edited
+    file is parsed again. Hits are memory-mapped rather than read. When the
+    total size exceeds ``max_bytes`` the least recently used entries are
+    removed.
+    """
+
+    def __init__(self, directory: str = None, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = directory or os.environ.get("CRYSTALSYSTEMS_CACHE", DEFAULT_DIRECTORY)
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _key(self, filename: str) -> str:
+        stat = os.stat(filename)
+        identity = f"{os.path.abspath(filename)}:{stat.st_mtime_ns}:{stat.st_size}"
+        return hashlib.sha1(identity.encode()).hexdigest()
+
+    def _entries(self):
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if os.path.isdir(path) and not name.startswith("."):
+                yield path
+
+    def loadCIF(self, filename: str):
+        """Same as :func:`crystalsystems.cif.loadCIF` for a filename, but reading from the cache when possible"""
+        entry = os.path.join(self.directory, self._key(filename))
+        if os.path.isdir(entry):
+            try:
+                result = self._read(entry)
+                os.utime(entry)  # mark as recently used
+                logger.debug(f"Cache hit for {filename}")
+                return result
+            except (OSError, ValueError) as e:
+                logger.debug(f"Discarding unreadable cache entry {entry}: {e}")
+                shutil.rmtree(entry, ignore_errors=True)
+
+        with open(filename, "r") as handle:
+            lattice, hkl, d_vals = loadCIF(handle)
+        self._write(entry, lattice, hkl, d_vals)
+        self.evict()
+        return lattice, hkl, d_vals
+
+    @staticmethod
+    def _read(entry: str):
+        vectors = np.load(os.path.join(entry, "lattice.npy"))
+        lattice = None if np.isnan(vectors).any() else Lattice(*vectors)
+        hkl = np.load(os.path.join(entry, "hkl.npy"), mmap_mode="r")
+        d_vals = np.load(os.path.join(entry, "d_vals.npy"), mmap_mode="r")
+        return lattice, hkl, d_vals
+
+    def _write(self, entry: str, lattice, hkl, d_vals):
+        # write somewhere private then rename so readers never see a partial entry
+        staging = tempfile.mkdtemp(prefix=".", dir=self.directory)
+        vectors = np.full((3, 3), np.nan) if lattice is None else lattice.vectors
+        np.save(os.path.join(staging, "lattice.npy"), vectors)
+        np.save(os.path.join(staging, "hkl.npy"), hkl)
+        np.save(os.path.join(staging, "d_vals.npy"), d_vals)
+        try:
+            os.rename(staging, entry)
+        except OSError:
+            # another process got there first
+            shutil.rmtree(staging, ignore_errors=True)
+
+    @staticmethod
+    def _size(entry: str) -> int:
+        return sum(entry_file.stat().st_size for entry_file in os.scandir(entry))
+
+    def size(self) -> int:
+        """Total bytes used by the cache"""
+        return sum(self._size(entry) for entry in self._entries())
+
+    def evict(self):
+        """Remove the least recently used entries until the cache fits in ``max_bytes``"""
+        entries = sorted(self._entries(), key=os.path.getmtime)
+        sizes = [self._size(entry) for entry in entries]
+        total = sum(sizes)
+        for entry, entry_size in zip(entries, sizes):
+            if total <= self.max_bytes:
+                break
+            logger.debug(f"Evicting {entry}")
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= entry_size
+
+    def clear(self):
+        """Remove every entry from the cache"""
+        for entry in self._entries():
+            shutil.rmtree(entry, ignore_errors=True)
@@ -1,33 +1,72 @@
+import itertools
 import logging
 import re
+import warnings
 
 import numpy as np
 
+from crystalsystems import profiling
 from crystalsystems.lattice import LatticeBuilder
+from crystalsystems.reflections import ReflectionTable
+from crystalsystems.spacegroup import getSpaceGroup
 
 logger = logging.getLogger("crystalsystems.cif")
 
 
-def _split(handle):
+_HEADER_MATCHER = re.compile(r"^h.+k.+l.+")
+# "h k l m d" with integer hkl, anything for m, and a floating point d-spacing
+_ROW_MATCHER = re.compile(r"^\s*[-+]?\d+\s+[-+]?\d+\s+[-+]?\d+\s+\S+\s+[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?\s*$")
+
+
+def _read_header(lines):
+    """Consume lines up to and including the column labels and return the header"""
     header = []
-    body = []
-    inHeader = True
-    matcher = re.compile(r"^h.+k.+l.+")
-    for line in handle:
+    for line in lines:
         line = line.strip()
         if not line:
             continue
-        if inHeader:
-            if matcher.match(line):
-                inHeader = False
-            else:
-                header.append(line)
-        else:
-            if line.startswith("#"):
-                pass
-            else:
-                body.append(line)
-    return header, body
+        if _HEADER_MATCHER.match(line):
+            break
+        header.append(line)
+    return header
+
+
+def _multiplicity(column):
+    """The multiplicity column if every value in it is an integer, otherwise ``None``"""
+    if np.any(~np.isfinite(column)) or np.any(column != np.round(column)):
+        return None
+    return column
+
+
+def _parse_block(lines) -> ReflectionTable:
+    """Parse lines of "h k l m d" into a :class:`crystalsystems.reflections.ReflectionTable`
+
+    Everything is handed to numpy's parser in one go. If that fails because of
+    malformed lines they are filtered out individually and the rest is parsed
+    in bulk. The multiplicity is kept when every line of the block has an
+    integer one.
+    """
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")  # numpy complains about empty input
+        try:
+            data = np.loadtxt(lines, comments="#", ndmin=2)
+            if data.size and (data.shape[1] != 5 or np.any(data[:, :3] != np.round(data[:, :3]))):
+                raise ValueError(f"expected 5 columns with integer hkl, found {data.shape[1]} columns")
+            multiplicity = _multiplicity(data[:, 3]) if data.size else None
+            columns = (0, 1, 2, 4)
+        except ValueError as e:
+            logger.debug(f"Filtering malformed lines after: {e}")
+            lines = [line for line in lines if _ROW_MATCHER.match(line)]
+            data = np.loadtxt(lines, usecols=(0, 1, 2, 4), ndmin=2)
+            try:
+                multiplicity = _multiplicity(np.loadtxt(lines, usecols=3, ndmin=1))
+            except ValueError:
+                multiplicity = None
+            columns = (0, 1, 2, 3)
+
+    if data.size == 0:
+        return ReflectionTable(np.zeros((0, 3), dtype=np.int8), np.zeros(0))
+    return ReflectionTable(data[:, columns[:3]], np.ascontiguousarray(data[:, columns[3]]), multiplicity)
 
 
 def _read_crystal_info(header):
@@ -70,37 +109,90 @@ def _read_crystal_info(header):
         return None
 
 
-def _read_data(body):
-    h_vals = []
-    k_vals = []
-    l_vals = []
-    d_vals = []
+def _read_space_group(header):
+    """The space group named in the header, or ``None`` if there is none or it is not supported"""
+    for line in header:
+        if line.startswith("#"):
+            line = line[1:].strip()
+        if line.startswith("Space group"):
+            symbol = line.replace("Space group", "").strip()
+            try:
+                return getSpaceGroup(symbol)
+            except ValueError as e:
+                logger.warning(f"Ignoring the space group: {e}")
+                return None
+    return None
+
 
-    for line in body:
-        if not line:  # skip empty lines
-            continue
+_SYMMETRY = (None, "filter", "merge")
 
-        try:
-            h_val, k_val, l_val, _, d_val = line.split()
-            h_vals.append(int(h_val))
-            k_vals.append(int(k_val))
-            l_vals.append(int(l_val))
-            d_vals.append(float(d_val))
-        except ValueError as e:
-            # log issues and carry on
-            logger.debug(f'While parsing "{line}" encountered: {e}')
 
-    if len(d_vals) == 0:
-        raise RuntimeError("Failed to read any data")
+def loadReflections(handle, symmetry: str = None):
+    """Read the lattice from the header and return it with a :class:`crystalsystems.reflections.ReflectionTable`
 
-    d_vals = np.asarray(d_vals)
-    hkl = np.array([h_vals, k_vals, l_vals])
-    return np.transpose(hkl), d_vals
+    With a supported space group in the header ``symmetry`` can be "filter"
+    to drop its systematic absences, or "merge" to also collapse equivalent
+    reflections into one row with a multiplicity.
+    """
+    if symmetry not in _SYMMETRY:
+        raise ValueError(f"Unknown symmetry {symmetry}, options are {_SYMMETRY}")
+    # parsing in chunks keeps the cost of any malformed lines local to their chunk
+    lattice, space_group, chunks = _load_chunks(handle, 65536, symmetry and "filter")
+    reflections = ReflectionTable.concatenate(chunks)
+    if symmetry == "merge" and space_group is not None:
+        reflections = space_group.merge(reflections)
+    return lattice, reflections
 
 
 def loadCIF(handle):
-    header, body = _split(handle)
-    lattice = _read_crystal_info(header)
-    hkl, d_vals = _read_data(body)
-
-    return lattice, hkl, d_vals
+    lattice, reflections = loadReflections(handle)
+    # the table keeps hkl compact, callers get int64 so that arithmetic on them cannot overflow
+    return lattice, reflections.hkl.astype(np.int64), reflections.d
+
+
+def loadCIFChunks(handle, chunksize: int = 1000000, symmetry: str = None):
+    """Read the lattice from the header and return it with a generator of
+    :class:`crystalsystems.reflections.ReflectionTable` chunks
+
+    Each chunk is parsed from at most ``chunksize`` lines, so memory use is
+    bounded for inputs of any length. ``symmetry`` can be "filter" to drop
+    the systematic absences of the space group in the header, when it is
+    supported. Merging equivalents needs every chunk at once, see
+    :func:`loadReflections`. The hkl of the chunks have the compact type of the
+    table, widen them before doing arithmetic on them.
+    """
+    if symmetry not in _SYMMETRY[:2]:
+        raise ValueError(f"Unknown symmetry {symmetry} for chunks, options are {_SYMMETRY[:2]}")
+    lattice, _, chunks = _load_chunks(handle, chunksize, symmetry)
+    return lattice, chunks
+
+
+def _load_chunks(handle, chunksize: int, symmetry: str):
+    lines = iter(handle)
+    with profiling.stage("cif.header") as timer:
+        header = _read_header(lines)
+        timer.rows = len(header)
+    with profiling.stage("cif.crystal_info"):
+        lattice = _read_crystal_info(header)
+        space_group = _read_space_group(header) if symmetry else None
+
+    def chunks():
+        found = False
+        while True:
+            with profiling.stage("cif.data") as timer:
+                block = list(itertools.islice(lines, chunksize))
+                if not block:
+                    break
+                reflections = _parse_block(block)
+                timer.rows = len(reflections)
+            if space_group is not None:
+                with profiling.stage("cif.absences") as timer:
+                    reflections = space_group.dropAbsent(reflections)
+                    timer.rows = len(reflections)
+            if len(reflections):
+                found = True
+                yield reflections
+        if not found:
+            raise RuntimeError("Failed to read any data")
+
+    return lattice, space_group, chunks()
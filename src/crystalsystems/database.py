@@ -0,0 +1,163 @@
+import json
+import logging
+import os
+from typing import NamedTuple
+
+import numpy as np
+
+from crystalsystems.lattice import Lattice, LatticeBatch, LatticeBuilder, niggli_reduce
+
+logger = logging.getLogger("crystalsystems.database")
+
+# cells reduced at once while building, which bounds the memory of the reduction
+_BUILD_CHUNK = 100000
+
+
+class CellMatches(NamedTuple):
+    query: np.ndarray  # (K,) index of the queried cell
+    reference: np.ndarray  # (K,) index of the matching reference cell, in the order given to build
+    distance: np.ndarray  # (K,) largest difference in units of the tolerances, at most 1
+
+
+def _reduced_constants(cells):
+    """``(N, 6)`` Niggli-reduced ``(a, b, c, alpha, beta, gamma)`` of lattices or of an array of constants"""
+    if isinstance(cells, Lattice):
+        cells = LatticeBatch(cells.vectors)
+    elif not isinstance(cells, LatticeBatch):
+        constants = np.atleast_2d(np.asarray(cells, dtype=float))
+        if constants.shape[1:] != (6,):
+            raise ValueError(f"Expected lattices or an array of shape (N, 6), found {constants.shape}")
+        reduced = [
+            _reduced_constants(LatticeBuilder.construct_from_scalars(*chunk.T))
+            for chunk in np.array_split(constants, len(constants) // _BUILD_CHUNK + 1)
+        ]
+        return np.concatenate(reduced)
+    reduced = [
+        np.column_stack(niggli_reduce(cells[start : start + _BUILD_CHUNK]).lattice.scalar_lattice_constants())
+        for start in range(0, len(cells), _BUILD_CHUNK)
+    ]
+    return np.concatenate(reduced) if reduced else np.zeros((0, 6))
+
+
+class ReferenceIndex:
+    """Reduced cells of a reference database bucketed on a grid for tolerance queries
+
+    Cells are Niggli-reduced and filed under the logarithms of their three
+    lengths, in buckets ``bucket_width`` wide, so a relative length tolerance
+    of up to ``bucket_width`` only needs the neighbouring buckets. The
+    reference cells are stored sorted by bucket, so finding the contents of a
+    bucket is a binary search. Every array can be memory-mapped from disk.
+    """
+
+    _FILES = ("constants", "keys", "ids")
+
+    def __init__(self, constants, keys, ids, bucket_width: float, origin, shape):
+        self.constants = constants
+        self.keys = keys
+        self.ids = ids
+        self.bucket_width = float(bucket_width)
+        self.origin = np.asarray(origin, dtype=float)
+        self.shape = np.asarray(shape, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.keys)
+
+    @staticmethod
+    def build(cells, bucket_width: float = 0.01) -> "ReferenceIndex":
+        """Index lattices, a :class:`crystalsystems.lattice.LatticeBatch` or an ``(N, 6)`` array of constants"""
+        constants = _reduced_constants(cells)
+        logs = np.log(constants[:, :3])
+        origin = logs.min(axis=0) if len(logs) else np.zeros(3)
+        coordinates = np.floor((logs - origin) / bucket_width).astype(np.int64)
+        shape = coordinates.max(axis=0) + 1 if len(logs) else np.ones(3, dtype=np.int64)
+        keys = np.ravel_multi_index(coordinates.T, shape) if len(logs) else np.zeros(0, dtype=np.int64)
+
+        order = np.argsort(keys, kind="stable")
+        logger.debug(f"Indexed {len(keys)} cells in {len(np.unique(keys))} buckets")
+        return ReferenceIndex(constants[order], keys[order], order, bucket_width, origin, shape)
+
+    def save(self, directory: str):
+        """Write the index as ``.npy`` files that :meth:`load` can memory-map"""
+        os.makedirs(directory, exist_ok=True)
+        for name in self._FILES:
+            np.save(os.path.join(directory, f"{name}.npy"), getattr(self, name))
+        settings = {"bucket_width": self.bucket_width, "origin": self.origin.tolist(), "shape": self.shape.tolist()}
+        with open(os.path.join(directory, "index.json"), "w") as handle:
+            json.dump(settings, handle)
+
+    @staticmethod
+    def load(directory: str, mmap_mode: str = "r") -> "ReferenceIndex":
+        with open(os.path.join(directory, "index.json"), "r") as handle:
+            settings = json.load(handle)
+        arrays = [
+            np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode) for name in ReferenceIndex._FILES
+        ]
+        return ReferenceIndex(*arrays, **settings)
+
+    def query(self, cells, rtol: float = 0.01, angle_tolerance: float = 0.5) -> CellMatches:
+        """Every reference cell within the tolerances of each of the cells, nearest first
+
+        Lengths must agree within ``rtol`` and angles within
+        ``angle_tolerance`` degrees. Angles that are both within the tolerance
+        of 90 are compared by their distance from 90, since which side they
+        fall on, and so the setting of the reduced cell, is arbitrary.
+        """
+        return self._query(_reduced_constants(cells), rtol, angle_tolerance)
+
+    def _query(self, constants, rtol: float, angle_tolerance: float) -> CellMatches:
+        # neighbouring buckets that can hold a match, the widest being a length that is rtol too short
+        span = int(np.ceil(-np.log1p(-rtol) / self.bucket_width))
+        offsets = np.stack(np.meshgrid(*([np.arange(-span, span + 1)] * 3), indexing="ij"), axis=-1).reshape(-1, 3)
+        coordinates = np.floor((np.log(constants[:, :3]) - self.origin) / self.bucket_width).astype(np.int64)
+        neighbours = coordinates[:, np.newaxis, :] + offsets
+        valid = np.all((neighbours >= 0) & (neighbours < self.shape), axis=-1)
+        query, _ = np.nonzero(valid)
+        keys = np.ravel_multi_index(neighbours[valid].T, self.shape)
+
+        # every candidate from the contents of the buckets
+        lower = np.searchsorted(self.keys, keys, side="left")
+        counts = np.searchsorted(self.keys, keys, side="right") - lower
+        query = np.repeat(query, counts)
+        first = np.repeat(lower - np.cumsum(counts) + counts, counts)
+        candidate = first + np.arange(len(query))
+
+        reference = np.asarray(self.constants[candidate])
+        mine = constants[query]
+        lengths = np.abs(reference[:, :3] / mine[:, :3] - 1.0).max(axis=1, initial=0.0) / rtol
+        angles = self._angle_distance(reference[:, 3:], mine[:, 3:], angle_tolerance)
+        distance = np.maximum(lengths, angles / angle_tolerance)
+
+        keep = distance <= 1.0
+        query, candidate, distance = query[keep], candidate[keep], distance[keep]
+        order = np.lexsort((distance, query))
+        return CellMatches(query[order], np.asarray(self.ids[candidate[order]]), distance[order])
+
+    @staticmethod
+    def _angle_distance(reference, mine, angle_tolerance: float):
+        """Largest difference of the angles, allowing for the other setting of a reduced cell with a 90 degree angle
+
+        Flipping the vector that is not in a right angle turns the other two
+        angles into their supplements, and the reduction may pick either.
+        """
+        reference_right = np.abs(reference - 90.0)
+        mine_right = np.abs(mine - 90.0)
+        near = (reference_right <= angle_tolerance) & (mine_right <= angle_tolerance)
+        right = np.abs(reference_right - mine_right)
+        distance = np.where(near, right, np.abs(reference - mine)).max(axis=1, initial=0.0)
+        for angle in range(3):
+            flipped = np.where(near, right, np.abs(180.0 - reference - mine))
+            flipped[:, angle] = right[:, angle]
+            distance = np.where(near[:, angle], np.minimum(distance, flipped.max(axis=1)), distance)
+        return distance
+
+    def nearest(self, cells, rtol: float = 0.01, angle_tolerance: float = 0.5):
+        """Index of the closest reference cell to each cell and its distance, ``-1`` and ``inf`` where none match"""
+        constants = _reduced_constants(cells)
+        matches = self._query(constants, rtol, angle_tolerance)
+        num_cells = len(constants)
+        reference = np.full(num_cells, -1, dtype=np.int64)
+        distance = np.full(num_cells, np.inf)
+        first = np.unique(matches.query, return_index=True)[1]
+        reference[matches.query[first]] = matches.reference[first]
+        distance[matches.query[first]] = matches.distance[first]
+        return reference, distance
@@ -0,0 +1,261 @@
+import functools
+import itertools
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, NamedTuple
+
+import numpy as np
+
+from crystalsystems.lattice import Lattice, LatticeBatch, LatticeBuilder, niggli_reduce
+from crystalsystems.lstsq import CRYSTAL_SYSTEMS, isMetric, toDesignMatrix
+from crystalsystems.scoring import deWolffM20, neighbourLines
+
+logger = logging.getLogger("crystalsystems.indexing")
+
+
+class SearchSettings(NamedTuple):
+    trial_hmax: int  # largest index assigned to the basis peaks
+    basis: int  # number of lowest-angle peaks the basis peaks are drawn from
+    # the first peaks are pinned to (100) and (010), the shortest reciprocal
+    # vectors can always be chosen as the axes of a reduced cell
+    fixed: int = 0
+
+
+# the lower the symmetry the more unknowns, so fewer trial assignments are affordable
+SEARCH_SETTINGS = {
+    "cubic": SearchSettings(4, 3),
+    "hexagonal": SearchSettings(3, 5),
+    "tetragonal": SearchSettings(3, 5),
+    "orthorhombic": SearchSettings(2, 5),
+    "monoclinic": SearchSettings(1, 5),
+    "triclinic": SearchSettings(1, 8, fixed=2),
+}
+
+# largest index of the reflections the candidates are pruned and scored with
+_PRUNE_HMAX = 4
+_TABLE_HMAX = 6
+# candidates kept after pruning in every chunk
+_SURVIVORS = 200
+
+
+class IndexingSolution(NamedTuple):
+    system: str
+    lattice: Lattice
+    hkl: np.ndarray  # (M, 3) assigned indices, zero where the peak is not indexed
+    indexed: np.ndarray  # (M,) which peaks are indexed within the tolerance
+    errors: np.ndarray  # (M,) relative difference between observed and calculated d-spacing
+
+
+def _hkl_grid(hmax: int):
+    span = np.arange(-hmax, hmax + 1)
+    hkl = np.stack(np.meshgrid(span, span, span, indexing="ij"), axis=-1).reshape(-1, 3)
+    return hkl[hkl.any(axis=1)]
+
+
+@functools.lru_cache(maxsize=None)
+def _forms(system: str, hmax: int):
+    """Unique rows of the reduced design matrix with one representative hkl for each"""
+    hkl = _hkl_grid(hmax)
+    # prefer representatives with small, positive indices
+    order = np.lexsort((-hkl[:, 2], -hkl[:, 1], -hkl[:, 0], np.abs(hkl).sum(axis=1)))
+    hkl = hkl[order]
+    rows = toDesignMatrix(hkl) @ CRYSTAL_SYSTEMS[system]
+    rows, first = np.unique(rows, axis=0, return_index=True)
+    hkl = hkl[first]
+    # these are shared between calls
+    rows.flags.writeable = False
+    hkl.flags.writeable = False
+    return rows, hkl
+
+
+def _nearest(params, table, qObs):
+    """For every candidate the index into ``table`` and the distance of the closest calculated Q to each peak
+
+    Uses one sort and one binary search, see :func:`crystalsystems.scoring.neighbourLines`.
+    """
+    # lines far beyond the last peak cannot be nearest, clipping them keeps the search precise
+    qCalc = np.clip(params @ table.T, 0.0, 2.0 * qObs.max() + 1.0)
+    order = np.argsort(qCalc, axis=1)
+    qCalc = np.take_along_axis(qCalc, order, axis=1)
+
+    below, above = neighbourLines(qCalc, qObs)
+    q_below = np.take_along_axis(qCalc, below, axis=1)
+    q_above = np.take_along_axis(qCalc, above, axis=1)
+    use_below = np.abs(q_below - qObs) < np.abs(q_above - qObs)
+    nearest = np.where(use_below, below, above)
+
+    distance = np.abs(np.where(use_below, q_below, q_above) - qObs)
+    index = np.take_along_axis(order, nearest, axis=1)
+    return index, distance
+
+
+def _prune_score(params, table, qObs, tolerance: float):
+    """Number of indexed peaks with ties broken by fewest calculated lines in the observed range
+
+    Rather than sorting the calculated Q of every candidate, each one is
+    located among the tolerance windows of the (sorted) observed peaks.
+    """
+    qCalc = params @ table.T
+    # a relative tolerance in d is twice that in Q
+    lower = qObs * (1.0 - 2.0 * tolerance)
+    upper = qObs * (1.0 + 2.0 * tolerance)
+
+    window = np.searchsorted(lower, qCalc, side="right") - 1
+    inside = (window >= 0) & (qCalc <= upper[np.maximum(window, 0)])
+    indexed = np.zeros((len(params), len(qObs)), dtype=bool)
+    candidate, _ = np.nonzero(inside)
+    indexed[candidate, window[inside]] = True
+
+    lines = np.count_nonzero(qCalc <= upper[-1], axis=1)
+    return np.count_nonzero(indexed, axis=1) - lines / (len(table) + 1.0)
+
+
+def _m20(params, table, qObs, tolerance: float):
+    """de Wolff figure of merit of each candidate, using distinct calculated lines"""
+    _, distance = _nearest(params, table, qObs)
+    indexed = distance <= 2.0 * tolerance * qObs
+    qCalc = np.round(params @ table.T / qObs[-1], 9)
+    lines = np.asarray([len(np.unique(row[row <= 1.0])) for row in qCalc])
+    mean_error = np.sum(np.where(indexed, distance, 0.0), axis=1) / np.maximum(np.count_nonzero(indexed, axis=1), 1)
+    return deWolffM20(qObs[-1], mean_error, lines)
+
+
+def _search_chunk(system: str, assignments, subset, qObs, tolerance: float):
+    """Solve every trial assignment of forms to the basis peaks and keep the best after pruning"""
+    trial, _ = _forms(system, SEARCH_SETTINGS[system].trial_hmax)
+    table, _ = _forms(system, _PRUNE_HMAX)
+    constraint = CRYSTAL_SYSTEMS[system]
+
+    matrices = trial[assignments]
+    solvable = np.abs(np.linalg.det(matrices)) > 1e-9
+    if not np.any(solvable):
+        return np.zeros((0, constraint.shape[1]))
+    rhs = np.broadcast_to(qObs[subset], (np.count_nonzero(solvable), len(subset)))
+    params = np.linalg.solve(matrices[solvable], rhs[..., np.newaxis])[..., 0]
+
+    # only keep things that are real lattices
+    params = params[isMetric(params @ constraint.T)]
+    if len(params) == 0:
+        return params
+    params = np.unique(np.round(params, 12), axis=0)
+
+    if len(params) > _SURVIVORS:
+        keep = np.argpartition(-_prune_score(params, table, qObs, tolerance), _SURVIVORS)[:_SURVIVORS]
+        params = params[keep]
+    return params
+
+
+def _jobs(system: str, qObs):
+    settings = SEARCH_SETTINGS[system]
+    trial, trial_hkl = _forms(system, settings.trial_hmax)
+    unknowns = CRYSTAL_SYSTEMS[system].shape[1]
+
+    # forms of (100), (010), ... for the pinned peaks
+    fixed = [int(np.flatnonzero((trial_hkl == axis).all(axis=1))[0]) for axis in np.eye(3, dtype=int)[: settings.fixed]]
+    free = [form for form in range(len(trial)) if form not in fixed]
+
+    # every ordered choice of distinct forms for the remaining basis peaks
+    assignments = np.asarray(list(itertools.permutations(free, unknowns - len(fixed))), dtype=np.intp)
+    assignments = np.hstack((np.tile(fixed, (len(assignments), 1)).astype(np.intp), assignments))
+    chunksize = 5000
+    peaks = range(len(fixed), min(settings.basis, len(qObs)))
+    for subset in itertools.combinations(peaks, unknowns - len(fixed)):
+        subset = np.asarray(list(range(len(fixed))) + list(subset))
+        for start in range(0, len(assignments), chunksize):
+            yield system, assignments[start : start + chunksize], subset, qObs
+
+
+def _refine(system: str, params, qObs, tolerance: float):
+    """Assign hkl to the peaks, refit with the indexed ones and return the refined parameters"""
+    table, table_hkl = _forms(system, _TABLE_HMAX)
+    index, distance = _nearest(params[np.newaxis, :], table, qObs)
+    indexed = distance[0] <= 2.0 * tolerance * qObs
+    if np.count_nonzero(indexed) >= len(params):
+        refined, _, rank, _ = np.linalg.lstsq(table[index[0, indexed]], qObs[indexed], rcond=None)
+        if rank == len(params) and isMetric((CRYSTAL_SYSTEMS[system] @ refined)[np.newaxis])[0]:
+            params = refined
+    index, distance = _nearest(params[np.newaxis, :], table, qObs)
+    return params, table_hkl[index[0]], distance[0]
+
+
+def _reduced_metrics(lattices):
+    if not lattices:
+        return np.zeros((0, 3, 3))
+    return niggli_reduce(LatticeBatch.from_lattices(lattices)).lattice.metric_tensor()
+
+
+def _same_cell(metric, other, rtol: float = 2e-3) -> bool:
+    """Reduced cells agree, ignoring the sign of angles that are close to 90 degrees"""
+    scale = rtol * np.diagonal(metric).max()
+    return bool(
+        np.allclose(np.diagonal(metric), np.diagonal(other), rtol=rtol)
+        and np.allclose(np.abs(metric), np.abs(other), atol=scale, rtol=0)
+    )
+
+
+def indexPeaks(
+    dSpacing, systems=None, tolerance: float = 0.001, peaks: int = 20, max_solutions: int = 10, jobs: int = 1
+) -> List[IndexingSolution]:
+    """Find lattices that index observed d-spacings without knowing any hkl
+
+    For every crystal system the lowest-angle peaks are assigned every
+    combination of low-index reflections (see ``SEARCH_SETTINGS``) and the
+    resulting linear systems are solved as one batch. Candidates are pruned by
+    how many of the first ``peaks`` they index against a precomputed table of
+    reflection forms, then the best are refined and scored against a larger
+    table. ``tolerance`` is relative in d. Setting ``jobs`` to anything but 1
+    spreads the trials over a process pool, which mostly helps the monoclinic
+    and triclinic searches.
+
+    The same cell found in several crystal systems, or in several settings, is
+    reported once in the highest symmetry. Solutions are ranked by the number
+    of indexed peaks, then by the de Wolff figure of merit. The per-peak
+    arrays of a solution are in order of decreasing d-spacing. The hexagonal
+    search assumes the gamma=120 setting and monoclinic assumes unique axis b.
+    """
+    qObs = np.sort(1.0 / np.square(np.asarray(dSpacing, dtype=float)))[:peaks]
+    systems = list(CRYSTAL_SYSTEMS) if systems is None else systems
+    for system in systems:
+        if system not in CRYSTAL_SYSTEMS:
+            raise ValueError(f"Unknown crystal system {system}")
+
+    work = [job for system in systems for job in _jobs(system, qObs)]
+    if jobs == 1:
+        found = [_search_chunk(*job, tolerance) for job in work]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            found = list(executor.map(_search_chunk, *zip(*work), itertools.repeat(tolerance)))
+
+    solutions = []
+    for system in systems:
+        candidates = [params for job, params in zip(work, found) if job[0] == system and len(params)]
+        if not candidates:
+            continue
+        candidates = np.unique(np.round(np.concatenate(candidates), 12), axis=0)
+        table, _ = _forms(system, _TABLE_HMAX)
+        chunks = np.array_split(candidates, len(candidates) // 1000 + 1)
+        score = np.concatenate([_prune_score(chunk, table, qObs, tolerance) for chunk in chunks])
+        best = np.argsort(-score, kind="stable")[:max_solutions]
+
+        for params in candidates[best]:
+            params, hkl, distance = _refine(system, params, qObs, tolerance)
+            indexed = distance <= 2.0 * tolerance * qObs
+            lattice = LatticeBuilder.from_solution(CRYSTAL_SYSTEMS[system] @ params)
+            errors = lattice.toDspacings(hkl) * np.sqrt(qObs) - 1.0
+            merit = float(_m20(params[np.newaxis, :], table, qObs, tolerance)[0])
+            hkl = np.where(indexed[:, np.newaxis], hkl, 0)
+            solutions.append((IndexingSolution(system, lattice, hkl, indexed, errors), merit))
+
+    # a cell found in several crystal systems is reported in the highest symmetry that indexes as many peaks
+    rank = list(CRYSTAL_SYSTEMS)
+    solutions.sort(key=lambda item: (-np.count_nonzero(item[0].indexed), rank.index(item[0].system)))
+    # compare Niggli-reduced cells so different settings of one lattice are recognised
+    reduced = _reduced_metrics([solution.lattice for solution, _ in solutions])
+    unique = []
+    for index, (solution, merit) in enumerate(solutions):
+        if not any(_same_cell(reduced[index], reduced[other]) for other in unique):
+            unique.append(index)
+    unique = [solutions[index] for index in unique]
+
+    unique.sort(key=lambda item: (-np.count_nonzero(item[0].indexed), -item[1]))
+    return [solution for solution, _ in unique[:max_solutions]]
@@ -1,7 +1,170 @@
+from typing import NamedTuple, Union
+
 import numpy as np
 
 
+def _volume(vectors):
+    """Volume of cells given as ``(..., 3, 3)`` arrays of row vectors"""
+    return np.einsum("...i,...i", vectors[..., 0, :], np.cross(vectors[..., 1, :], vectors[..., 2, :]))
+
+
+def _metric_tensor(vectors):
+    """Metric tensor ``G = V V^T`` of cells given as ``(..., 3, 3)`` arrays of row vectors"""
+    return np.einsum("...ij,...kj->...ik", vectors, vectors)
+
+
+def _scalar_lattice_constants(vectors):
+    metric = _metric_tensor(vectors)
+
+    # lengths are easy
+    a_length = np.sqrt(metric[..., 0, 0])
+    b_length = np.sqrt(metric[..., 1, 1])
+    c_length = np.sqrt(metric[..., 2, 2])
+
+    def to_angle(dotprod, left_length, right_length):
+        cos_angle = np.clip(dotprod / (left_length * right_length), -1.0, 1.0)
+        return np.rad2deg(np.arccos(cos_angle))
+
+    # angles are a little more interesting as a dot product of zero means
+    # the lattices are perpendicular
+    alpha = to_angle(metric[..., 1, 2], b_length, c_length)
+    beta = to_angle(metric[..., 0, 2], a_length, c_length)
+    gamma = to_angle(metric[..., 0, 1], a_length, b_length)
+
+    return (a_length, b_length, c_length, alpha, beta, gamma)
+
+
+def _reciprocal(vectors):
+    """Reciprocal row vectors (without the factor of 2 pi) of ``(..., 3, 3)`` cells"""
+    volume = _volume(vectors)[..., np.newaxis]
+
+    a_vec = np.cross(vectors[..., 1, :], vectors[..., 2, :]) / volume
+    b_vec = np.cross(vectors[..., 2, :], vectors[..., 0, :]) / volume
+    c_vec = np.cross(vectors[..., 0, :], vectors[..., 1, :]) / volume
+
+    return np.stack((a_vec, b_vec, c_vec), axis=-2)
+
+
+def _b_matrix(constants, reciprocal_constants):
+    """Busing-Levy B-matrix from the scalar constants of direct-space cells and their reciprocals"""
+    _, _, c_length, alpha, _, _ = constants
+    astar, bstar, cstar, _, betastar, gammastar = reciprocal_constants
+
+    cos_alpha = np.cos(np.deg2rad(alpha))
+    cos_beta = np.cos(np.deg2rad(betastar))
+    sin_beta = np.sin(np.deg2rad(betastar))
+    cos_gamma = np.cos(np.deg2rad(gammastar))
+    sin_gamma = np.sin(np.deg2rad(gammastar))
+
+    matrix = np.zeros(np.shape(astar) + (3, 3))
+    matrix[..., 0, 0] = astar
+    matrix[..., 0, 1] = bstar * cos_gamma
+    matrix[..., 0, 2] = cstar * cos_beta
+    matrix[..., 1, 1] = bstar * sin_gamma
+    matrix[..., 1, 2] = -1 * cstar * sin_beta * cos_alpha
+    matrix[..., 2, 2] = 1 / c_length
+    return matrix
+
+
+def _dspacing(matrix, hkl):
+    """d-spacings of an ``(N, 3)`` hkl array, or the hkl of a reflection table, for one or many ``(..., 3, 3)``
+    B-matrices"""
+    hkl = np.asarray(getattr(hkl, "hkl", hkl), dtype=float)
+    qcrys = np.einsum("...ij,nj->...ni", matrix, hkl)
+    return 1.0 / np.sqrt(np.einsum("...i,...i", qcrys, qcrys))
+
+
+def _metric_symmetry(metric, tolerance: float = 1e-5):
+    """Integer matrices with entries of -1, 0 and 1 that leave the metric tensor unchanged
+
+    Applied to hkl of the reciprocal metric these are the operations of the
+    lattice's holohedry, provided the cell is in a conventional or reduced setting.
+    """
+    entries = np.asarray([-1, 0, 1])
+    matrices = np.stack(np.meshgrid(*([entries] * 9), indexing="ij"), axis=-1).reshape(-1, 3, 3)
+    matrices = matrices[np.abs(np.linalg.det(matrices)).round() == 1]
+    transformed = np.einsum("nji,jk,nkl->nil", matrices, metric, matrices)
+    same = np.all(np.abs(transformed - metric) <= tolerance * np.abs(metric).max(), axis=(1, 2))
+    return matrices[same]
+
+
+class Reflections(NamedTuple):
+    hkl: np.ndarray  # (N, 3) small integers
+    d: np.ndarray  # (N,) d-spacings in decreasing order
+    multiplicity: np.ndarray  # (N,) number of reflections merged into each row
+
+
+def _generate_reflections(lattice, dmin: float):
+    """Every hkl with d >= dmin, sorted by decreasing d"""
+    # |h| = |a . q| <= |a| / dmin and likewise for k and l
+    limits = np.floor(np.asarray(lattice.scalar_lattice_constants()[:3]) / dmin + 1e-9).astype(int)
+    metric = lattice.reciprocal().metric_tensor()
+    qmax = (1.0 + 1e-12) / (dmin * dmin)
+
+    k_vals, l_vals = np.meshgrid(
+        np.arange(-limits[1], limits[1] + 1), np.arange(-limits[2], limits[2] + 1), indexing="ij"
+    )
+    k_vals, l_vals = k_vals.ravel(), l_vals.ravel()
+    plane = metric[1, 1] * k_vals * k_vals + metric[2, 2] * l_vals * l_vals + 2 * metric[1, 2] * k_vals * l_vals
+
+    # one vectorized (k, l) plane at a time keeps memory bounded
+    hkl = []
+    for h_val in range(-limits[0], limits[0] + 1):
+        qsq = metric[0, 0] * h_val * h_val + 2 * h_val * (metric[0, 1] * k_vals + metric[0, 2] * l_vals) + plane
+        keep = qsq <= qmax
+        if h_val == 0:
+            keep &= (k_vals != 0) | (l_vals != 0)
+        hkl.append(np.column_stack((np.full(np.count_nonzero(keep), h_val), k_vals[keep], l_vals[keep])))
+
+    dtype = np.int16 if limits.max() < np.iinfo(np.int16).max else np.int32
+    hkl = np.concatenate(hkl).astype(dtype)
+    d_vals = lattice.toDspacings(hkl)
+    order = np.lexsort((-hkl[:, 2], -hkl[:, 1], -hkl[:, 0], -d_vals))
+    return Reflections(hkl[order], d_vals[order], np.ones(len(order), dtype=np.int16))
+
+
+def _merge_reflections(reflections, operations):
+    """Keep one row of every orbit of hkl under the operations, with the number of rows merged into it as multiplicity
+
+    The representative is the largest hkl of the orbit that is in the table,
+    so an orbit cut by ``dmin`` keeps the members that are present rather than
+    being dropped.
+    """
+    hkl = reflections.hkl.astype(np.int64)
+    images = np.einsum("ni,oji->onj", hkl, operations)
+
+    # encode each image as a single integer, the largest one names the orbit
+    base = 2 * int(np.abs(hkl).max(initial=0)) + 1
+    keys = ((images[..., 0] + base) * 4 * base + images[..., 1] + base) * 4 * base + images[..., 2] + base
+    _, inverse = np.unique(keys.max(axis=0), return_inverse=True)
+    inverse = inverse.ravel()
+    multiplicity = np.bincount(inverse, reflections.multiplicity)
+
+    # the present row with the largest key of every orbit, in the order of the table
+    own = ((hkl[:, 0] + base) * 4 * base + hkl[:, 1] + base) * 4 * base + hkl[:, 2] + base
+    ranked = np.lexsort((-own, inverse))
+    first = ranked[np.r_[True, np.diff(inverse[ranked]) != 0]]
+    keep = np.sort(first)
+    multiplicity = np.round(multiplicity[inverse[keep]]).astype(np.int16)
+    return Reflections(reflections.hkl[keep], reflections.d[keep], multiplicity)
+
+
+def _zero_small(vectors):
+    """set things that are almost zero to zero"""
+    vectors[np.isclose(vectors, 0.0)] = 0.0
+    return vectors
+
+
 class Lattice:
+    """A direct or reciprocal lattice described by three vectors
+
+    Derived quantities are calculated on first use and kept until
+    :meth:`set_vectors` replaces the vectors. The vectors themselves are
+    read-only so the cached values cannot go stale.
+    """
+
+    __slots__ = ("_vectors", "_metric", "_volume", "_constants", "_reciprocal", "_b_matrix", "_reflections")
+
     def __init__(self, a_vec, b_vec, c_vec):
         if Lattice.__vectors_are_valid(a_vec, b_vec, c_vec):
             self.set_vectors(a_vec, b_vec, c_vec)
@@ -19,6 +182,25 @@ class Lattice:
 
         return is_ok(a_vec) and is_ok(b_vec) and is_ok(c_vec)
 
+    @staticmethod
+    def _from_matrix(vectors) -> "Lattice":
+        """Wrap a ``(3, 3)`` array of row vectors without copying it"""
+        lattice = Lattice.__new__(Lattice)
+        lattice._set_matrix(vectors)
+        return lattice
+
+    def _set_matrix(self, vectors):
+        vectors = vectors.view()
+        vectors.flags.writeable = False
+        self._vectors = vectors
+        # derived quantities are calculated on first use
+        self._metric = None
+        self._volume = None
+        self._constants = None
+        self._reciprocal = None
+        self._b_matrix = None
+        self._reflections = None
+
     def __str__(self):
         a_length, b_length, c_length, alpha, beta, gamma = self.scalar_lattice_constants()
         return f"a={a_length} b={b_length} c={c_length} al={alpha} be={beta} ga={gamma}"
@@ -26,45 +208,47 @@ class Lattice:
     def set_vectors(self, a_vec, b_vec, c_vec):
         if not Lattice.__vectors_are_valid(a_vec, b_vec, c_vec):
             raise ValueError("Vector values are invalid")
-        self.a_vec = np.asarray(a_vec, dtype=float)
-        self.b_vec = np.asarray(b_vec, dtype=float)
-        self.c_vec = np.asarray(c_vec, dtype=float)
-        # set things that are almost zero to zero
-        self.a_vec[np.isclose(self.a_vec, 0.0)] = 0.0
-        self.b_vec[np.isclose(self.b_vec, 0.0)] = 0.0
-        self.c_vec[np.isclose(self.c_vec, 0.0)] = 0.0
+        self._set_matrix(_zero_small(np.array([a_vec, b_vec, c_vec], dtype=float)))
 
     @property
-    def volume(self) -> float:
-        return np.dot(self.a_vec, np.cross(self.b_vec, self.c_vec))
+    def vectors(self):
+        """The ``(3, 3)`` array with the a, b, and c vectors as rows"""
+        return self._vectors
 
-    def scalar_lattice_constants(self):
-        # lengths are easy
-        a_length = np.sqrt(np.dot(self.a_vec, self.a_vec))
-        b_length = np.sqrt(np.dot(self.b_vec, self.b_vec))
-        c_length = np.sqrt(np.dot(self.c_vec, self.c_vec))
+    @property
+    def a_vec(self):
+        return self._vectors[0]
 
-        def to_angle(left, right, left_length, right_length):
-            cos_angle = np.dot(left, right) / (left_length * right_length)
-            return np.rad2deg(np.arccos(cos_angle))
+    @property
+    def b_vec(self):
+        return self._vectors[1]
 
-        # angles are a little more interesting as a dot product of zero means
-        # the lattices are perpendicular
-        alpha = to_angle(self.b_vec, self.c_vec, b_length, c_length)
-        beta = to_angle(self.a_vec, self.c_vec, a_length, c_length)
-        gamma = to_angle(self.a_vec, self.b_vec, a_length, b_length)
+    @property
+    def c_vec(self):
+        return self._vectors[2]
 
-        return (a_length, b_length, c_length, alpha, beta, gamma)
+    @property
+    def volume(self) -> float:
+        if self._volume is None:
+            self._volume = _volume(self._vectors)
+        return self._volume
 
-    def reciprocal(self):
-        # cache the value
-        volume = self.volume
+    def metric_tensor(self):
+        if self._metric is None:
+            metric = _metric_tensor(self._vectors)
+            metric.flags.writeable = False
+            self._metric = metric
+        return self._metric
 
-        a_vec = np.cross(self.b_vec, self.c_vec) / volume
-        b_vec = np.cross(self.c_vec, self.a_vec) / volume
-        c_vec = np.cross(self.a_vec, self.b_vec) / volume
+    def scalar_lattice_constants(self):
+        if self._constants is None:
+            self._constants = _scalar_lattice_constants(self._vectors)
+        return self._constants
 
-        return Lattice(a_vec=a_vec, b_vec=b_vec, c_vec=c_vec)
+    def reciprocal(self):
+        if self._reciprocal is None:
+            self._reciprocal = Lattice._from_matrix(_reciprocal(self._vectors))
+        return self._reciprocal
 
     def toDspacing(self, h_val, k_val, l_val):
         """Calculate the Qcrys making the assumption that this is the direct space lattice"""
@@ -73,25 +257,73 @@ class Lattice:
 
         return 1.0 / np.sqrt(np.dot(vec, vec))
 
-    def toB(self):
-        """Calculates the B-matrix with the assumption that this is the direct-space lattice"""
-        reciprocal = self.reciprocal()
-        astar, bstar, cstar, alphastar, betastar, gammastar = reciprocal.scalar_lattice_constants()
+    def toDspacings(self, hkl):
+        """Calculate the d-spacing for every row of an ``(N, 3)`` hkl array"""
+        return _dspacing(self.toB(), hkl)
 
-        cos_alpha = np.cos(np.deg2rad(alphastar))
-        cos_beta = np.cos(np.deg2rad(betastar))
-        sin_beta = np.sin(np.deg2rad(betastar))
-        cos_gamma = np.cos(np.deg2rad(gammastar))
-        sin_gamma = np.sin(np.deg2rad(gammastar))
+    def toQ(self, hkl):
+        """Calculate ``Q = 2 pi / d`` for every row of an ``(N, 3)`` hkl array"""
+        return 2.0 * np.pi / self.toDspacings(hkl)
 
-        _, _, c_length, _, _, _ = self.scalar_lattice_constants()
-
-        matrix = [
-            [astar, bstar * cos_gamma, cstar * cos_beta],
-            [0, bstar * sin_gamma, -1 * cstar * sin_beta * cos_alpha],
-            [0, 0, 1 / c_length],
-        ]
-        return np.asarray(matrix)
+    def toB(self):
+        """Calculates the B-matrix with the assumption that this is the direct-space lattice"""
+        if self._b_matrix is None:
+            matrix = _b_matrix(self.scalar_lattice_constants(), self.reciprocal().scalar_lattice_constants())
+            matrix.flags.writeable = False
+            self._b_matrix = matrix
+        return self._b_matrix
+
+    def reflections(self, dmin: float, merge: str = None, space_group=None) -> Reflections:
+        """Every reflection with d-spacing of at least ``dmin``, sorted by decreasing d-spacing
+
+        ``merge`` can be "friedel" to keep one of each hkl and -h-k-l, or "laue"
+        to keep one reflection of each set related by the symmetry of the
+        lattice metric. A :class:`crystalsystems.spacegroup.SpaceGroup` drops
+        its systematic absences and merges with its Laue class instead of the
+        metric, see :meth:`crystalsystems.spacegroup.SpaceGroup.merge`.
+        Merging keeps the reflections present at ``dmin``, so the
+        multiplicities add up to the number of unmerged reflections. The
+        unmerged table is cached so asking again for the same or a larger
+        ``dmin`` only slices it before merging.
+        """
+        if dmin <= 0:
+            raise ValueError(f"dmin must be positive, found {dmin}")
+        if merge not in (None, "friedel", "laue"):
+            raise ValueError(f"Unknown merge {merge}, options are None, friedel, laue")
+
+        if self._reflections is None:
+            self._reflections = {}
+        key = None if space_group is None else space_group.symbol
+        if key in self._reflections and self._reflections[key][0] <= dmin:
+            _, reflections, merged = self._reflections[key]
+        else:
+            reflections = _generate_reflections(self, dmin)
+            if space_group is not None:
+                reflections = space_group.dropAbsent(reflections)
+            for column in reflections:
+                column.flags.writeable = False
+            merged = {}
+            self._reflections[key] = (dmin, reflections, merged)
+
+        # d-spacings are sorted in decreasing order
+        stop = len(reflections.d) - np.searchsorted(reflections.d[::-1], dmin * (1.0 - 1e-12), side="left")
+        reflections = Reflections(*(column[:stop] for column in reflections))
+        if merge is None:
+            return reflections
+
+        # merging after the cut only counts reflections that are present, the last merge of each kind is kept
+        if merge in merged and merged[merge][0] == stop:
+            return merged[merge][1]
+        if merge == "friedel":
+            reflections = _merge_reflections(reflections, np.asarray([np.eye(3), -np.eye(3)], dtype=int))
+        elif space_group is not None:
+            reflections = space_group.merge(reflections)
+        else:
+            reflections = _merge_reflections(reflections, _metric_symmetry(self.reciprocal().metric_tensor()))
+        for column in reflections:
+            column.flags.writeable = False
+        merged[merge] = (stop, reflections)
+        return reflections
 
     def assert_allclose(self, other, atol=0.00001):
         # this is more consistent/understandable when looking at scalar constants
@@ -102,22 +334,266 @@ class Lattice:
             np.testing.assert_allclose(me, you, atol=atol, err_msg=label)
 
 
-def get_angle_from_dot(dotprod: float, left_scalar: float, right_scalar: float) -> float:
-    cos_ang = 0.5 * dotprod / (left_scalar * right_scalar)
-    if np.isclose(cos_ang, 0.0):
-        return 90.0
+class LatticeBatch:
+    """Many lattices stored as a single ``(N, 3, 3)`` array of row vectors
+
+    Indexing with an integer returns a :class:`Lattice` that is a view into the
+    batch, indexing with a slice or mask returns another ``LatticeBatch``.
+    Changing the vectors of a batch in place does not update the cached
+    quantities of lattices that were already taken from it.
+    """
+
+    def __init__(self, vectors):
+        vectors = np.asarray(vectors, dtype=float)
+        if vectors.ndim == 2:
+            vectors = vectors[np.newaxis]
+        if vectors.ndim != 3 or vectors.shape[1:] != (3, 3):
+            raise ValueError(f"Expected an array of shape (N, 3, 3), found {vectors.shape}")
+        self.vectors = vectors
+
+    @staticmethod
+    def from_lattices(lattices) -> "LatticeBatch":
+        return LatticeBatch(np.stack([lattice.vectors for lattice in lattices]))
+
+    def __len__(self):
+        return self.vectors.shape[0]
+
+    def __getitem__(self, index):
+        if np.ndim(index) == 0 and not isinstance(index, slice):
+            return Lattice._from_matrix(self.vectors[index])
+        return LatticeBatch(self.vectors[index])
+
+    def __iter__(self):
+        for vectors in self.vectors:
+            yield Lattice._from_matrix(vectors)
+
+    @property
+    def volume(self):
+        return _volume(self.vectors)
+
+    def metric_tensor(self):
+        return _metric_tensor(self.vectors)
+
+    def scalar_lattice_constants(self):
+        """Tuple of ``(a, b, c, alpha, beta, gamma)`` arrays of length N"""
+        return _scalar_lattice_constants(self.vectors)
+
+    def reciprocal(self) -> "LatticeBatch":
+        return LatticeBatch(_reciprocal(self.vectors))
+
+    def toB(self):
+        """The ``(N, 3, 3)`` B-matrices with the assumption that these are direct-space lattices"""
+        return _b_matrix(_scalar_lattice_constants(self.vectors), _scalar_lattice_constants(_reciprocal(self.vectors)))
+
+    def toDspacings(self, hkl):
+        """The ``(N, M)`` d-spacings of an ``(M, 3)`` hkl array for every lattice"""
+        return _dspacing(self.toB(), hkl)
+
+    def toQ(self, hkl):
+        """The ``(N, M)`` values of ``Q = 2 pi / d`` of an ``(M, 3)`` hkl array for every lattice"""
+        return 2.0 * np.pi / self.toDspacings(hkl)
+
+
+class ReducedCell(NamedTuple):
+    lattice: Union[Lattice, LatticeBatch]
+    transform: np.ndarray  # integer matrices with ``reduced.vectors == transform @ vectors``
+
+
+def _as_vectors(lattices):
+    """``(N, 3, 3)`` vectors of a lattice or batch and whether the input was a single lattice"""
+    if isinstance(lattices, Lattice):
+        return lattices.vectors[np.newaxis], True
+    return lattices.vectors, False
+
+
+def _as_reduced(vectors, transform, single: bool) -> ReducedCell:
+    reduced = np.einsum("nij,njk->nik", transform, vectors)
+    if single:
+        return ReducedCell(Lattice._from_matrix(reduced[0]), transform[0])
+    return ReducedCell(LatticeBatch(reduced), transform)
+
+
+def _niggli_parameters(metric):
+    """``(A, B, C, xi, eta, zeta)`` of Krivy & Gruber from ``(N, 3, 3)`` metric tensors"""
+    return (
+        metric[:, 0, 0],
+        metric[:, 1, 1],
+        metric[:, 2, 2],
+        2.0 * metric[:, 1, 2],
+        2.0 * metric[:, 0, 2],
+        2.0 * metric[:, 0, 1],
+    )
+
+
+def niggli_reduce(lattices, tolerance: float = 1e-5, max_iterations: int = 1000) -> ReducedCell:
+    """Niggli-reduced cells of a lattice or a :class:`LatticeBatch`
+
+    Follows the algorithm of Krivy & Gruber with the tolerances of
+    Grosse-Kunstleve, Sauter & Adams (2004). Every pass applies the first
+    applicable step to all cells that are not yet reduced, so the loop runs as
+    many times as the slowest cell needs rather than once per cell.
+    ``tolerance`` is relative to the squared cube root of each cell's volume.
+    All of the steps keep the handedness of the cell.
+    """
+    vectors, single = _as_vectors(lattices)
+    num_cells = len(vectors)
+    metric = _metric_tensor(vectors)
+    transform = np.broadcast_to(np.eye(3, dtype=np.int64), (num_cells, 3, 3)).copy()
+    eps = tolerance * np.cbrt(np.abs(_volume(vectors))) ** 2
+
+    def apply(mask, steps):
+        nonlocal metric
+        steps = np.broadcast_to(steps, (num_cells, 3, 3))[mask]
+        metric[mask] = np.einsum("nij,njk,nlk->nil", steps, metric[mask], steps)
+        transform[mask] = np.einsum("nij,njk->nik", steps, transform[mask])
+
+    def sign(value):
+        return np.where(value > eps, 1, np.where(value < -eps, -1, 0))
+
+    def shear(row, column, value):
+        steps = np.broadcast_to(np.eye(3, dtype=np.int64), (num_cells, 3, 3)).copy()
+        steps[:, row, column] = np.where(value > 0, -1, 1)
+        return steps
+
+    active = np.ones(num_cells, dtype=bool)
+    for _ in range(max_iterations):
+        if not np.any(active):
+            break
+        pending = active.copy()
+
+        # 1: A <= B
+        A, B, C, xi, eta, zeta = _niggli_parameters(metric)
+        swap = (A > B + eps) | ((np.abs(A - B) <= eps) & (np.abs(xi) > np.abs(eta) + eps))
+        apply(pending & swap, np.asarray([[0, -1, 0], [-1, 0, 0], [0, 0, -1]]))
+
+        # 2: B <= C, then start again
+        A, B, C, xi, eta, zeta = _niggli_parameters(metric)
+        swap = pending & ((B > C + eps) | ((np.abs(B - C) <= eps) & (np.abs(eta) > np.abs(zeta) + eps)))
+        apply(swap, np.asarray([[-1, 0, 0], [0, 0, -1], [0, -1, 0]]))
+        pending &= ~swap
+
+        # 3 and 4: the angles are all acute or all non-acute
+        l_sign, m_sign, n_sign = sign(xi), sign(eta), sign(zeta)
+        acute = l_sign * m_sign * n_sign == 1
+        flips = np.where(acute[:, np.newaxis], np.stack((l_sign, m_sign, n_sign), axis=1), 1)
+        obtuse = np.stack((l_sign, m_sign, n_sign), axis=1)
+        flips = np.where(~acute[:, np.newaxis] & (obtuse == 1), -1, flips)
+        # an odd number of flips is made even using an angle that is exactly 90
+        odd = np.prod(flips, axis=1) < 0
+        last_zero = 2 - np.argmax((obtuse == 0)[:, ::-1], axis=1)
+        flips[odd, last_zero[odd]] = -1
+        steps = np.zeros((num_cells, 3, 3), dtype=np.int64)
+        steps[:, [0, 1, 2], [0, 1, 2]] = flips
+        apply(pending, steps)
+
+        # 5 to 8: shorten a vector by adding or subtracting another, then start again
+        # only cells that are not changed by a step go on to the next, so the parameters stay valid
+        A, B, C, xi, eta, zeta = _niggli_parameters(metric)
+        shorten = (
+            (np.abs(xi) > B + eps)
+            | ((np.abs(xi - B) <= eps) & (2 * eta < zeta - eps))
+            | ((np.abs(xi + B) <= eps) & (zeta < -eps))
+        )
+        apply(pending & shorten, shear(2, 1, xi))
+        pending &= ~shorten
+
+        shorten = (
+            (np.abs(eta) > A + eps)
+            | ((np.abs(eta - A) <= eps) & (2 * xi < zeta - eps))
+            | ((np.abs(eta + A) <= eps) & (zeta < -eps))
+        )
+        apply(pending & shorten, shear(2, 0, eta))
+        pending &= ~shorten
+
+        shorten = (
+            (np.abs(zeta) > A + eps)
+            | ((np.abs(zeta - A) <= eps) & (2 * xi < eta - eps))
+            | ((np.abs(zeta + A) <= eps) & (eta < -eps))
+        )
+        apply(pending & shorten, shear(1, 0, zeta))
+        pending &= ~shorten
+
+        total = xi + eta + zeta + A + B
+        shorten = (total < -eps) | ((np.abs(total) <= eps) & (2 * (A + eta) + zeta > eps))
+        apply(pending & shorten, np.asarray([[1, 0, 0], [0, 1, 0], [1, 1, 1]]))
+        pending &= ~shorten
+
+        # anything that got through every step is reduced
+        active &= ~pending
+    else:
+        raise RuntimeError(f"Niggli reduction did not converge in {max_iterations} iterations")
+
+    return _as_reduced(vectors, transform, single)
+
+
+def delaunay_reduce(lattices, tolerance: float = 1e-5, max_iterations: int = 1000) -> ReducedCell:
+    """Delaunay-reduced cells of a lattice or a :class:`LatticeBatch`
+
+    Selling's reduction of the superbase ``(-(a+b+c), a, b, c)`` until all six
+    scalar products are non-positive, applied to every cell that still has a
+    positive product on each pass. The reduced cell is the three shortest
+    vectors of the superbase in a right-handed order. ``tolerance`` is
+    relative to the squared cube root of each cell's volume.
+    """
+    vectors, single = _as_vectors(lattices)
+    num_cells = len(vectors)
+    # superbase vectors as integer combinations of the original ones
+    superbase = np.broadcast_to(
+        np.asarray([[-1, -1, -1], [1, 0, 0], [0, 1, 0], [0, 0, 1]], dtype=np.int64), (num_cells, 4, 3)
+    ).copy()
+    metric = _metric_tensor(vectors)
+    eps = tolerance * np.cbrt(np.abs(_volume(vectors))) ** 2
+    first, second = np.triu_indices(4, k=1)
+    cells = np.arange(num_cells)
+
+    for _ in range(max_iterations):
+        products = np.einsum("npi,nij,nqj->npq", superbase, metric, superbase)[:, first, second]
+        largest = np.argmax(products, axis=1)
+        active = products[cells, largest] > eps
+        if not np.any(active):
+            break
+
+        # for the largest positive b_i.b_j: b_k += b_i, b_l += b_i and b_i = -b_i
+        index, other = first[largest[active]], second[largest[active]]
+        rows = cells[active]
+        pivot = superbase[rows, index].copy()
+        rest = np.ones((len(rows), 4), dtype=bool)
+        rest[np.arange(len(rows)), index] = False
+        rest[np.arange(len(rows)), other] = False
+        superbase[rows] += np.where(rest[..., np.newaxis], pivot[:, np.newaxis, :], 0)
+        superbase[rows, index] = -pivot
     else:
-        return np.rad2deg(np.arccos(cos_ang))
+        raise RuntimeError(f"Delaunay reduction did not converge in {max_iterations} iterations")
+
+    lengths = np.einsum("npi,nij,npj->np", superbase, metric, superbase)
+    order = np.argsort(lengths, axis=1, kind="stable")[:, :3]
+    transform = np.take_along_axis(superbase, order[..., np.newaxis], axis=1)
+    # flipping all three vectors fixes the handedness without changing any angle
+    transform *= np.sign(np.round(np.linalg.det(transform))).astype(np.int64)[:, np.newaxis, np.newaxis]
+    return _as_reduced(vectors, transform, single)
+
+
+def get_angle_from_dot(dotprod, left_scalar, right_scalar):
+    cos_ang = 0.5 * np.asarray(dotprod) / (left_scalar * right_scalar)
+    angle = np.where(np.isclose(cos_ang, 0.0), 90.0, np.rad2deg(np.arccos(cos_ang)))
+    if angle.ndim == 0:
+        return float(angle)
+    return angle
 
 
 class LatticeBuilder:
     @staticmethod
     def construct_from_scalars(
-        a: float, b: float, c: float, alpha: float, beta: float, gamma: float  # pylint: disable=invalid-name
-    ) -> Lattice:
+        a, b, c, alpha, beta, gamma  # pylint: disable=invalid-name
+    ) -> Union[Lattice, LatticeBatch]:
+        """Create a lattice from lengths and angles (degrees)
+
+        Passing arrays of equal length creates a :class:`LatticeBatch` in a single vectorized step.
+        """
         if not LatticeBuilder.__scalars_are_valid(a, b, c, alpha, beta, gamma):
             raise RuntimeError("scalar values are invalid")
 
+        a, b, c = (np.asarray(value, dtype=float) for value in (a, b, c))
         cos_alpha = np.cos(np.deg2rad(alpha))
         cos_beta = np.cos(np.deg2rad(beta))
         cos_gamma = np.cos(np.deg2rad(gamma))
@@ -131,30 +607,42 @@ class LatticeBuilder:
 
         sin_gamma = np.sin(np.deg2rad(gamma))
 
-        a_vec = np.asarray([a, 0, 0])
-        b_vec = np.asarray([b * cos_gamma, b * sin_gamma, 0])
-        c_vec = np.asarray([c * cos_beta, c * (cos_alpha - cos_gamma * cos_beta) / sin_gamma, c * v_term / sin_gamma])
+        shape = np.broadcast(a, b, c, cos_alpha, cos_beta, cos_gamma).shape
+        vectors = np.zeros(shape + (3, 3))
+        vectors[..., 0, 0] = a
+        vectors[..., 1, 0] = b * cos_gamma
+        vectors[..., 1, 1] = b * sin_gamma
+        vectors[..., 2, 0] = c * cos_beta
+        vectors[..., 2, 1] = c * (cos_alpha - cos_gamma * cos_beta) / sin_gamma
+        vectors[..., 2, 2] = c * v_term / sin_gamma
+        vectors = _zero_small(vectors)
 
-        return Lattice(a_vec, b_vec, c_vec)
+        if shape:
+            return LatticeBatch(vectors.reshape(-1, 3, 3))
+        return Lattice._from_matrix(vectors)
 
     @staticmethod
-    def __scalars_are_valid(
-        a: float, b: float, c: float, alpha: float, beta: float, gamma: float  # pylint: disable=invalid-name
-    ) -> bool:
-        return a > 0 and b > 0 and c > 0 and alpha > 0 and beta > 0 and gamma > 0
+    def __scalars_are_valid(a, b, c, alpha, beta, gamma) -> bool:  # pylint: disable=invalid-name
+        return bool(np.all([np.all(np.asarray(value) > 0) for value in (a, b, c, alpha, beta, gamma)]))
 
     # TODO should this use the residuals?
     @staticmethod
-    def from_solution(solution) -> Lattice:
+    def from_solution(solution) -> Union[Lattice, LatticeBatch]:
+        """Convert the least-squares solution(s) to the direct-space lattice
+
+        An ``(M, 6)`` array of solutions is converted in one vectorized step into a :class:`LatticeBatch`.
+        """
+        solution = np.asarray(solution, dtype=float)
+
         # lengths are easy
-        a_star = np.sqrt(solution[0])
-        b_star = np.sqrt(solution[1])
-        c_star = np.sqrt(solution[2])
+        a_star = np.sqrt(solution[..., 0])
+        b_star = np.sqrt(solution[..., 1])
+        c_star = np.sqrt(solution[..., 2])
 
         # get the angles
-        gamma_star = get_angle_from_dot(solution[3], a_star, b_star)
-        beta_star = get_angle_from_dot(solution[4], a_star, c_star)
-        alpha_star = get_angle_from_dot(solution[5], b_star, c_star)
+        gamma_star = get_angle_from_dot(solution[..., 3], a_star, b_star)
+        beta_star = get_angle_from_dot(solution[..., 4], a_star, c_star)
+        alpha_star = get_angle_from_dot(solution[..., 5], b_star, c_star)
 
         # create the reciprocal lattice
         recip = LatticeBuilder.construct_from_scalars(a_star, b_star, c_star, alpha_star, beta_star, gamma_star)
@@ -1,12 +1,73 @@
 import logging
+from typing import Iterable, List, NamedTuple, Tuple
 
 import numpy as np
 
+from crystalsystems import profiling
 from crystalsystems.lattice import Lattice, LatticeBuilder
+from crystalsystems.reflections import ReflectionTable
 
 logger = logging.getLogger("crystalsystems.lattice")
 
 
+# map the reduced parameters of each crystal system onto the six triclinic
+# coefficients (hh, kk, ll, hk, hl, kl) of the solution, highest symmetry first
+CRYSTAL_SYSTEMS = {
+    "cubic": np.asarray([[1, 1, 1, 0, 0, 0]], dtype=float).T,
+    "hexagonal": np.asarray([[1, 1, 0, 1, 0, 0], [0, 0, 1, 0, 0, 0]], dtype=float).T,
+    "tetragonal": np.asarray([[1, 1, 0, 0, 0, 0], [0, 0, 1, 0, 0, 0]], dtype=float).T,
+    "orthorhombic": np.eye(6)[:, :3],
+    "monoclinic": np.eye(6)[:, [0, 1, 2, 4]],  # unique axis b
+    "triclinic": np.eye(6),
+}
+
+
+class CrystalSystemFit(NamedTuple):
+    system: str
+    lattice: Lattice  # None if the hkl do not determine the parameters
+    parameters: int
+    residual: float  # sum of squares in 1/d^2
+    rms: float  # root-mean-square residual relative to 1/d^2
+    consistent: bool
+
+
+class RobustFit(NamedTuple):
+    lattice: Lattice
+    weights: np.ndarray  # final weight of every reflection, including the supplied ones
+    rejected: np.ndarray  # indices of reflections beyond the rejection cutoff
+    iterations: int
+
+
+class LatticeUncertainty(NamedTuple):
+    lattice: Lattice
+    sigma: np.ndarray  # standard deviations of (a, b, c, alpha, beta, gamma)
+    samples: np.ndarray  # (M, 6) scalar constants of every resampled fit that gave a valid lattice
+
+
+class Refinement(NamedTuple):
+    system: str
+    lattice: Lattice
+    parameters: np.ndarray  # refined free parameters, lengths then angles in degrees
+    sigma: np.ndarray  # standard deviations of the free parameters
+    rms: float  # root-mean-square residual in d
+    iterations: int
+
+
+# free parameters of each crystal system as (a, b, c, alpha, beta, gamma) = offset + matrix @ free
+_RIGHT_ANGLES = np.asarray([0, 0, 0, 90, 90, 90], dtype=float)
+REFINED_PARAMETERS = {
+    "cubic": (np.asarray([[1, 1, 1, 0, 0, 0]], dtype=float).T, _RIGHT_ANGLES),
+    "hexagonal": (
+        np.asarray([[1, 1, 0, 0, 0, 0], [0, 0, 1, 0, 0, 0]], dtype=float).T,
+        np.asarray([0, 0, 0, 90, 90, 120], dtype=float),
+    ),
+    "tetragonal": (np.asarray([[1, 1, 0, 0, 0, 0], [0, 0, 1, 0, 0, 0]], dtype=float).T, _RIGHT_ANGLES),
+    "orthorhombic": (np.eye(6)[:, :3], _RIGHT_ANGLES),
+    "monoclinic": (np.eye(6)[:, [0, 1, 2, 4]], np.asarray([0, 0, 0, 90, 0, 90], dtype=float)),  # unique axis b
+    "triclinic": (np.eye(6), np.zeros(6)),
+}
+
+
 def toSolverConstants(h_val, k_val, l_val):
     hh = h_val * h_val
     kk = k_val * k_val
@@ -18,14 +79,32 @@ def toSolverConstants(h_val, k_val, l_val):
     return (hh, kk, ll, hk, hl, kl)
 
 
-def getLattice(hkl, dSpacing) -> Lattice:
-    # convert the hkl to the values used by the least-squares solver
-    inputs = np.asarray([toSolverConstants(*vals) for vals in hkl], dtype=float)
+def toDesignMatrix(hkl):
+    """Convert an ``(N, 3)`` hkl array to the ``(N, 6)`` matrix used by the least-squares solver"""
+    hkl = np.asarray(hkl, dtype=float).reshape(-1, 3)
+    return np.column_stack(toSolverConstants(hkl[:, 0], hkl[:, 1], hkl[:, 2]))
 
-    qCrysSq = 1.0 / np.square(dSpacing)
+
+def _columns(hkl, dSpacing):
+    """``(hkl, dSpacing)`` from either of the two arrays or a :class:`ReflectionTable` in place of hkl"""
+    if isinstance(hkl, ReflectionTable):
+        return hkl.hkl, hkl.d
+    if dSpacing is None:
+        raise ValueError("d-spacings are required unless hkl is a ReflectionTable")
+    return hkl, dSpacing
+
+
+def _solve(hkl, dSpacing):
+    # convert the hkl to the values used by the least-squares solver
+    with profiling.stage("lstsq.design_matrix") as timer:
+        inputs = toDesignMatrix(hkl)
+        qCrysSq = 1.0 / np.square(np.asarray(dSpacing, dtype=float))
+        timer.rows = len(inputs)
 
     # gets the solution up to a scale factor
-    solution, residuals, rank, singular = np.linalg.lstsq(inputs, qCrysSq, rcond=None)
+    with profiling.stage("lstsq.solve") as timer:
+        solution, residuals, rank, singular = np.linalg.lstsq(inputs, qCrysSq, rcond=None)
+        timer.rows = len(inputs)
 
     # since we designed the problem to be 6 values, the answer should have 6 values
     if rank != 6:
@@ -35,4 +114,419 @@ def getLattice(hkl, dSpacing) -> Lattice:
     logging.debug(f"RES {residuals}")  # (Ax - y)**2
     logging.debug(f"SNG {singular}")  # np.linalg.svd(A, compute_uv=False)
 
-    return LatticeBuilder.from_solution(solution)
+    return solution
+
+
+def getLattice(hkl, dSpacing=None) -> Lattice:
+    """Solve for the lattice of an ``(N, 3)`` hkl array and its d-spacings, or of a :class:`ReflectionTable`"""
+    solution = _solve(*_columns(hkl, dSpacing))
+    with profiling.stage("lstsq.lattice"):
+        return LatticeBuilder.from_solution(solution)
+
+
+def iterChunks(hkl, dSpacing=None, chunksize: int = 2**18):
+    """Yield ``(hkl, dSpacing)`` slices of at most ``chunksize`` rows, or slices of a :class:`ReflectionTable`
+
+    Slicing memory-mapped arrays, such as those from ``np.load(..., mmap_mode="r")``,
+    only reads each chunk from disk as it is used.
+    """
+    if isinstance(hkl, ReflectionTable):
+        for start in range(0, len(hkl), chunksize):
+            yield hkl[start : start + chunksize]
+        return
+    if len(hkl) != len(dSpacing):
+        raise ValueError(f"Found {len(hkl)} hkl and {len(dSpacing)} d-spacings")
+    for start in range(0, len(dSpacing), chunksize):
+        yield hkl[start : start + chunksize], dSpacing[start : start + chunksize]
+
+
+def getLatticeStreaming(chunks: Iterable) -> Lattice:
+    """Same as :func:`getLattice` for ``(hkl, dSpacing)`` or :class:`ReflectionTable` chunks that need not fit in
+    memory together
+
+    The chunks are folded one at a time into the 6x6 triangular factor of the
+    design matrix (a tall-skinny QR), which is as stable as solving the whole
+    problem and holds no more than one chunk in memory. Chunks can come from
+    :func:`crystalsystems.cif.loadCIFChunks` or :func:`iterChunks`.
+    """
+    triangle = np.zeros((6, 6))
+    projected = np.zeros(6)
+    num_refl = 0
+    for chunk in chunks:
+        with profiling.stage("lstsq.accumulate") as timer:
+            hkl, dSpacing = _columns(chunk, None) if isinstance(chunk, ReflectionTable) else chunk
+            inputs = toDesignMatrix(hkl)
+            qCrysSq = 1.0 / np.square(np.asarray(dSpacing, dtype=float))
+            ortho, triangle = np.linalg.qr(np.vstack((triangle, inputs)))
+            projected = ortho.T @ np.concatenate((projected, qCrysSq))
+            num_refl += len(qCrysSq)
+            timer.rows = len(qCrysSq)
+
+    with profiling.stage("lstsq.solve") as timer:
+        # the same rank cutoff as lstsq
+        singular = np.linalg.svd(triangle, compute_uv=False)
+        rank = int(np.count_nonzero(singular > singular[0] * np.finfo(float).eps * max(num_refl, 6)))
+        if rank != 6:
+            raise RuntimeError(f"Something went wrong with lstq, rank of result isn't 6 it is {rank}")
+        solution = np.linalg.solve(triangle, projected)
+        timer.rows = num_refl
+
+    with profiling.stage("lstsq.lattice"):
+        return LatticeBuilder.from_solution(solution)
+
+
+def getLattices(hkl, dSpacings) -> List[Lattice]:
+    """Fit a series of datasets that share one hkl list
+
+    ``dSpacings`` has shape ``(N, M)`` with one column per dataset. The design
+    matrix is built and factored once and all M datasets are solved together.
+    """
+    dSpacings = np.asarray(dSpacings, dtype=float)
+    if dSpacings.ndim != 2:
+        raise ValueError(f"Expected a 2-D array of d-spacings, found {dSpacings.ndim} dimensions")
+
+    solutions = _solve(hkl, dSpacings)
+    return list(LatticeBuilder.from_solution(solutions.T))
+
+
+def getCrystalSystem(hkl, dSpacing=None, tolerance: float = 1e-4) -> Tuple[Lattice, List[CrystalSystemFit]]:
+    """Fit every crystal system and return the best lattice with the ranked table of fits
+
+    The design matrix is reduced to its 6x6 triangular factor once, so each
+    constrained system is a tiny least-squares problem against the same
+    factor. A system is consistent when its relative rms residual is within
+    ``tolerance``. The ranking puts consistent systems with the fewest
+    parameters first and breaks ties by residual. Hexagonal assumes the
+    gamma=120 setting and monoclinic assumes unique axis b.
+    """
+    hkl, dSpacing = _columns(hkl, dSpacing)
+    qCrysSq = 1.0 / np.square(np.asarray(dSpacing, dtype=float))
+
+    # ||D C x - y||^2 = ||R C x - Q^T y||^2 + ||y||^2 - ||Q^T y||^2
+    ortho, triangle = np.linalg.qr(toDesignMatrix(hkl))
+    projected = ortho.T @ qCrysSq
+    base = max(float(qCrysSq @ qCrysSq - projected @ projected), 0.0)
+    scale = float(np.sum(np.square(qCrysSq)))
+
+    fits = []
+    for system, constraint in CRYSTAL_SYSTEMS.items():
+        parameters = constraint.shape[1]
+        reduced, _, rank, _ = np.linalg.lstsq(triangle @ constraint, projected, rcond=None)
+        if rank != parameters:
+            logger.debug(f"{system} is not determined by the supplied hkl")
+            fits.append(CrystalSystemFit(system, None, parameters, np.inf, np.inf, False))
+            continue
+
+        solution = constraint @ reduced
+        difference = triangle @ solution - projected
+        residual = base + float(difference @ difference)
+        rms = float(np.sqrt(residual / scale))
+        try:
+            with np.errstate(invalid="ignore"):
+                lattice = LatticeBuilder.from_solution(solution)
+        except RuntimeError:
+            # the solution does not describe a real lattice
+            fits.append(CrystalSystemFit(system, None, parameters, residual, rms, False))
+            continue
+        fits.append(CrystalSystemFit(system, lattice, parameters, residual, rms, bool(rms <= tolerance)))
+
+    fits.sort(key=lambda fit: (not fit.consistent, fit.parameters if fit.consistent else 0, fit.residual))
+    if fits[0].lattice is None:
+        raise RuntimeError("Failed to fit any crystal system")
+    for fit in fits:
+        logger.debug(f"{fit.system:>12} parameters={fit.parameters} rms={fit.rms} consistent={fit.consistent}")
+
+    return fits[0].lattice, fits
+
+
+def _huber(scaled, tuning: float = 1.345):
+    scaled = np.abs(scaled)
+    return np.where(scaled <= tuning, 1.0, tuning / np.maximum(scaled, tuning))
+
+
+def _tukey(scaled, tuning: float = 4.685):
+    return np.where(np.abs(scaled) < tuning, np.square(1.0 - np.square(scaled / tuning)), 0.0)
+
+
+ROBUST_WEIGHTS = {"huber": _huber, "tukey": _tukey}
+
+
+def getLatticeRobust(
+    hkl,
+    dSpacing=None,
+    multiplicity=None,
+    sigma=None,
+    method: str = "tukey",
+    cutoff: float = 4.685,
+    max_iterations: int = 20,
+    tolerance: float = 1e-8,
+) -> RobustFit:
+    """Iteratively reweighted least-squares fit that downweights outliers
+
+    ``multiplicity`` and ``sigma`` (uncertainty of the d-spacings) set the
+    starting weights. Every pass reweights with the ``method`` ("huber" or
+    "tukey") function of the residuals scaled by their median absolute
+    deviation and solves the 6x6 normal equations of the design matrix, which
+    is built once. Reflections whose scaled residual exceeds ``cutoff`` are
+    reported as rejected. A :class:`ReflectionTable` in place of ``hkl``
+    supplies its own multiplicity and sigma unless they are given.
+    """
+    if isinstance(hkl, ReflectionTable):
+        multiplicity = hkl.multiplicity if multiplicity is None else multiplicity
+        sigma = hkl.sigma if sigma is None else sigma
+    hkl, dSpacing = _columns(hkl, dSpacing)
+    if method not in ROBUST_WEIGHTS:
+        raise ValueError(f"Unknown robust weighting {method}, options are {list(ROBUST_WEIGHTS)}")
+    if max_iterations < 1:
+        raise ValueError(f"max_iterations must be at least 1, found {max_iterations}")
+    reweight = ROBUST_WEIGHTS[method]
+
+    dSpacing = np.asarray(dSpacing, dtype=float)
+    inputs = toDesignMatrix(hkl)
+    qCrysSq = 1.0 / np.square(dSpacing)
+
+    # sigma of 1/d^2 from sigma of d
+    weights = np.ones_like(qCrysSq)
+    if sigma is not None:
+        weights = weights / np.square(2.0 * np.asarray(sigma, dtype=float) / dSpacing**3)
+    if multiplicity is not None:
+        weights = weights * np.asarray(multiplicity, dtype=float)
+    sigmas = 1.0 / np.sqrt(weights)
+
+    # scale the columns once so the normal equations stay well conditioned
+    columns = np.sqrt(np.einsum("ij,ij->j", inputs, inputs))
+    if np.any(columns == 0.0):
+        raise RuntimeError("The hkl do not determine all six parameters")
+    inputs = inputs / columns
+
+    robust = np.ones_like(qCrysSq)
+    solution = np.zeros(6)
+    for iteration in range(1, max_iterations + 1):
+        total = weights * robust
+        try:
+            update = np.linalg.solve(inputs.T @ (total[:, np.newaxis] * inputs), inputs.T @ (total * qCrysSq))
+        except np.linalg.LinAlgError as e:
+            raise RuntimeError(f"Robust fit became singular after {iteration} iterations") from e
+
+        residuals = (inputs @ update - qCrysSq) / sigmas
+        scale = 1.4826 * np.median(np.abs(residuals))
+        # an exact fit has nothing left to reweight
+        scale = max(scale, np.finfo(float).eps * np.max(np.abs(qCrysSq / sigmas)))
+        scaled = residuals / scale
+        robust = reweight(scaled)
+
+        converged = np.allclose(update, solution, rtol=tolerance, atol=0.0)
+        solution = update
+        if converged:
+            break
+
+    rejected = np.flatnonzero(np.abs(scaled) > cutoff)
+    logger.debug(f"Robust fit took {iteration} iterations and rejected {len(rejected)} reflections")
+
+    return RobustFit(LatticeBuilder.from_solution(solution / columns), weights * robust, rejected, iteration)
+
+
+def _metric_derivatives(constants):
+    """Derivatives of the direct metric tensor with respect to ``(a, b, c, alpha, beta, gamma)``, angles in degrees"""
+    a_length, b_length, c_length = constants[:3]
+    cos_alpha, cos_beta, cos_gamma = np.cos(np.deg2rad(constants[3:]))
+    sin_alpha, sin_beta, sin_gamma = np.sin(np.deg2rad(constants[3:]))
+    radians = np.pi / 180.0
+
+    # G = [[a a, a b cos(gamma), a c cos(beta)], [., b b, b c cos(alpha)], [., ., c c]]
+    derivatives = np.zeros((6, 3, 3))
+    derivatives[0, 0, 0] = 2 * a_length
+    derivatives[1, 1, 1] = 2 * b_length
+    derivatives[2, 2, 2] = 2 * c_length
+    derivatives[0, 0, 1] = derivatives[0, 1, 0] = b_length * cos_gamma
+    derivatives[0, 0, 2] = derivatives[0, 2, 0] = c_length * cos_beta
+    derivatives[1, 0, 1] = derivatives[1, 1, 0] = a_length * cos_gamma
+    derivatives[1, 1, 2] = derivatives[1, 2, 1] = c_length * cos_alpha
+    derivatives[2, 0, 2] = derivatives[2, 2, 0] = a_length * cos_beta
+    derivatives[2, 1, 2] = derivatives[2, 2, 1] = b_length * cos_alpha
+    derivatives[3, 1, 2] = derivatives[3, 2, 1] = -b_length * c_length * sin_alpha * radians
+    derivatives[4, 0, 2] = derivatives[4, 2, 0] = -a_length * c_length * sin_beta * radians
+    derivatives[5, 0, 1] = derivatives[5, 1, 0] = -a_length * b_length * sin_gamma * radians
+    return derivatives
+
+
+def _model(constants, hkl):
+    """Calculated d-spacings and their ``(N, 6)`` Jacobian with respect to the scalar lattice constants
+
+    With ``u = G* h`` from the reciprocal metric ``G* = B^T B``, the derivative
+    of ``d = (h^T G* h)^(-1/2)`` is ``d^3 u^T (dG/dp) u / 2``.
+    """
+    lattice = LatticeBuilder.construct_from_scalars(*constants)
+    matrix = lattice.toB()
+    reciprocal = matrix.T @ matrix
+    u_vecs = hkl @ reciprocal
+    d_calc = 1.0 / np.sqrt(np.einsum("ni,ni->n", u_vecs, hkl))
+    derivatives = np.einsum("ni,pij,nj->np", u_vecs, _metric_derivatives(constants), u_vecs)
+    jacobian = 0.5 * d_calc[:, np.newaxis] ** 3 * derivatives
+    return d_calc, jacobian
+
+
+def refineLattice(
+    hkl,
+    dSpacing=None,
+    system: str = "triclinic",
+    sigma=None,
+    start: Lattice = None,
+    max_iterations: int = 50,
+    tolerance: float = 1e-12,
+) -> Refinement:
+    """Levenberg-Marquardt refinement of the lattice constants directly against the d-spacings
+
+    Only the free parameters of ``system`` (see ``REFINED_PARAMETERS``) are
+    refined, so the constraints hold exactly. The Jacobian is analytic and
+    built for every reflection in one pass. Refinement starts from ``start``,
+    or the linear :func:`getLattice` solution projected onto the constraints,
+    and stops when the relative change of the weighted sum of squares is
+    below ``tolerance``. ``sigma`` are the uncertainties of the d-spacings.
+    The reported ``sigma`` of the parameters are scaled by the goodness of fit.
+    A :class:`ReflectionTable` in place of ``hkl`` supplies its own sigma unless it is given.
+    """
+    if isinstance(hkl, ReflectionTable):
+        sigma = hkl.sigma if sigma is None else sigma
+    hkl, dSpacing = _columns(hkl, dSpacing)
+    if system not in REFINED_PARAMETERS:
+        raise ValueError(f"Unknown crystal system {system}")
+    if max_iterations < 1:
+        raise ValueError(f"max_iterations must be at least 1, found {max_iterations}")
+    matrix, offset = REFINED_PARAMETERS[system]
+
+    hkl = np.asarray(hkl, dtype=float).reshape(-1, 3)
+    dSpacing = np.asarray(dSpacing, dtype=float)
+    weights = np.ones_like(dSpacing) if sigma is None else 1.0 / np.square(np.asarray(sigma, dtype=float))
+    if len(dSpacing) < matrix.shape[1]:
+        raise RuntimeError(f"Need at least {matrix.shape[1]} reflections to refine a {system} lattice")
+
+    start = getLattice(hkl, dSpacing) if start is None else start
+    parameters = np.linalg.lstsq(matrix, np.asarray(start.scalar_lattice_constants()) - offset, rcond=None)[0]
+
+    def evaluate(parameters):
+        d_calc, jacobian = _model(offset + matrix @ parameters, hkl)
+        residuals = dSpacing - d_calc
+        return residuals, jacobian @ matrix, float(np.sum(weights * np.square(residuals)))
+
+    residuals, jacobian, chisq = evaluate(parameters)
+    damping = 1e-3
+    for iteration in range(1, max_iterations + 1):
+        normal = jacobian.T @ (weights[:, np.newaxis] * jacobian)
+        gradient = jacobian.T @ (weights * residuals)
+        # raise the damping until a step reduces the sum of squares
+        while True:
+            step = np.linalg.solve(normal + damping * np.diag(np.diag(normal)), gradient)
+            trial = parameters + step
+            try:
+                trial_residuals, trial_jacobian, trial_chisq = evaluate(trial)
+            except RuntimeError:
+                trial_chisq = np.inf  # stepped outside of valid lattice constants
+            if np.isfinite(trial_chisq) and trial_chisq <= chisq:
+                break
+            damping *= 10.0
+            if damping > 1e10:
+                break
+        if not np.isfinite(trial_chisq) or trial_chisq > chisq:
+            break
+
+        converged = chisq - trial_chisq <= tolerance * max(chisq, np.finfo(float).tiny)
+        parameters, residuals, jacobian, chisq = trial, trial_residuals, trial_jacobian, trial_chisq
+        damping = max(damping / 10.0, 1e-12)
+        if converged:
+            break
+
+    normal = jacobian.T @ (weights[:, np.newaxis] * jacobian)
+    dof = max(len(dSpacing) - len(parameters), 1)
+    covariance = np.linalg.pinv(normal) * chisq / dof
+    rms = float(np.sqrt(np.mean(np.square(residuals))))
+    logger.debug(f"{system} refinement took {iteration} iterations, rms={rms}")
+
+    lattice = LatticeBuilder.construct_from_scalars(*(offset + matrix @ parameters))
+    return Refinement(system, lattice, parameters, np.sqrt(np.diag(covariance)), rms, iteration)
+
+
+def isMetric(solutions):
+    """Which ``(M, 6)`` solutions describe a positive definite reciprocal metric tensor"""
+    g11, g22, g33 = solutions[:, 0], solutions[:, 1], solutions[:, 2]
+    g12, g13, g23 = 0.5 * solutions[:, 3], 0.5 * solutions[:, 4], 0.5 * solutions[:, 5]
+
+    # Sylvester's criterion: all leading principal minors are positive
+    minor = g11 * g22 - g12 * g12
+    det = g11 * (g22 * g33 - g23 * g23) - g12 * (g12 * g33 - g23 * g13) + g13 * (g12 * g23 - g22 * g13)
+    with np.errstate(invalid="ignore"):
+        return (g11 > 0.0) & (minor > 0.0) & (det > 0.0)
+
+
+def getLatticeUncertainty(
+    hkl, dSpacing=None, method: str = "bootstrap", resamples: int = 1000, seed=None, chunksize: int = 2**22
+) -> LatticeUncertainty:
+    """Estimate the uncertainty of the lattice constants by resampling the reflections
+
+    ``method`` is either "bootstrap", which draws ``resamples`` sets of
+    reflections with replacement, or "jackknife", which leaves out each
+    reflection in turn. Every resample is expressed as counts applied to the
+    per-reflection outer products of the design matrix, so all the normal
+    equations are formed with one matrix product and solved as a stack.
+    ``chunksize`` bounds the number of counts held in memory at once.
+    Resamples that do not determine a real lattice are dropped.
+    """
+    if method not in ("bootstrap", "jackknife"):
+        raise ValueError(f"Unknown resampling method {method}")
+    if resamples < 2:
+        raise ValueError(f"resamples must be at least 2, found {resamples}")
+    hkl, dSpacing = _columns(hkl, dSpacing)
+
+    inputs = toDesignMatrix(hkl)
+    qCrysSq = 1.0 / np.square(np.asarray(dSpacing, dtype=float))
+    num_refl = len(qCrysSq)
+
+    # scale the columns so the normal equations stay well conditioned
+    columns = np.sqrt(np.einsum("ij,ij->j", inputs, inputs))
+    if np.any(columns == 0.0):
+        raise RuntimeError("The hkl do not determine all six parameters")
+    inputs = inputs / columns
+    outer = np.einsum("ni,nj->nij", inputs, inputs).reshape(num_refl, 36)
+    weighted = inputs * qCrysSq[:, np.newaxis]
+
+    if method == "bootstrap":
+        rng = np.random.default_rng(seed)
+        total = resamples
+    else:
+        full_normal = outer.sum(axis=0)
+        full_rhs = weighted.sum(axis=0)
+        total = num_refl
+    step = max(1, chunksize // num_refl)
+
+    solutions = []
+    for start in range(0, total, step):
+        stop = min(start + step, total)
+        if method == "bootstrap":
+            counts = rng.multinomial(num_refl, np.full(num_refl, 1.0 / num_refl), size=stop - start).astype(float)
+            normal = counts @ outer
+            rhs = counts @ weighted
+        else:
+            normal = full_normal - outer[start:stop]
+            rhs = full_rhs - weighted[start:stop]
+        normal = normal.reshape(-1, 6, 6)
+
+        # resamples missing too many reflections can not be solved
+        solvable = np.linalg.cond(normal) < 1.0 / np.finfo(float).eps
+        chunk = np.full((len(normal), 6), np.nan)
+        chunk[solvable] = np.linalg.solve(normal[solvable], rhs[solvable][..., np.newaxis])[..., 0]
+        solutions.append(chunk / columns)
+
+    solutions = np.concatenate(solutions)
+    solutions = solutions[isMetric(solutions)]
+    if len(solutions) < 2:
+        raise RuntimeError("Too few resamples produced a lattice to estimate the uncertainty")
+    logger.debug(f"{len(solutions)} of {total} {method} resamples produced a lattice")
+
+    samples = np.transpose(LatticeBuilder.from_solution(solutions).scalar_lattice_constants())
+    if method == "bootstrap":
+        sigma = np.std(samples, axis=0, ddof=1)
+    else:
+        count = len(samples)
+        sigma = np.sqrt((count - 1) / count * np.sum(np.square(samples - samples.mean(axis=0)), axis=0))
+
+    return LatticeUncertainty(getLattice(hkl, dSpacing), sigma, samples)
@@ -0,0 +1,72 @@
+import logging
+from typing import NamedTuple, Union
+
+import numpy as np
+
+from crystalsystems.lattice import Lattice, Reflections
+
+logger = logging.getLogger("crystalsystems.matching")
+
+
+class PeakMatch(NamedTuple):
+    observed: np.ndarray  # (N,) observed d-spacings in the order supplied
+    hkl: np.ndarray  # (N, 3) closest reflection, zero where nothing is within the tolerance
+    calculated: np.ndarray  # (N,) d-spacing of the closest reflection
+    errors: np.ndarray  # (N,) relative difference between calculated and observed d-spacing
+    assigned: np.ndarray  # (N,) a reflection is within the tolerance
+    ambiguous: np.ndarray  # (N,) reflections with different d-spacings are within the tolerance
+
+    def indexed(self, include_ambiguous: bool = False):
+        """The ``(hkl, dSpacing)`` of the assigned peaks, ready for :func:`crystalsystems.lstsq.getLattice`"""
+        keep = self.assigned if include_ambiguous else self.assigned & ~self.ambiguous
+        return self.hkl[keep], self.observed[keep]
+
+
+def matchPeaks(
+    dSpacing, reflections: Union[Lattice, Reflections], tolerance: float = 0.001, space_group=None
+) -> PeakMatch:
+    """Assign hkl to observed d-spacings from a lattice or a precomputed reflection table
+
+    A lattice is expanded into its Friedel-merged reflections down to the
+    smallest observed d-spacing, without the absences of ``space_group`` if
+    one is given. Friedel pairs always share a d-spacing, while Laue
+    equivalents of a cell that is only nearly symmetric do not. A table must be sorted by decreasing
+    d-spacing, as :meth:`crystalsystems.lattice.Lattice.reflections` returns.
+    Every peak is located with a binary search, so the cost is
+    O((N + M) log M) for N peaks and M reflections. ``tolerance`` is relative
+    in d.
+    """
+    observed = np.asarray(dSpacing, dtype=float)
+    if isinstance(reflections, Lattice):
+        dmin = observed.min() * (1.0 - tolerance)
+        reflections = reflections.reflections(dmin, merge="friedel", space_group=space_group)
+
+    # searchsorted needs increasing values
+    d_calc = reflections.d[::-1]
+    hkl_calc = reflections.hkl[::-1]
+    if len(d_calc) == 0:
+        raise RuntimeError("No reflections to match against")
+
+    # reflections inside the tolerance window of every peak
+    lower = np.searchsorted(d_calc, observed * (1.0 - tolerance), side="left")
+    upper = np.searchsorted(d_calc, observed * (1.0 + tolerance), side="right")
+    assigned = upper > lower
+
+    # the closest reflection is one of the neighbours of the insertion point
+    above = np.clip(np.searchsorted(d_calc, observed), 0, len(d_calc) - 1)
+    below = np.clip(above - 1, 0, len(d_calc) - 1)
+    nearest = np.where(np.abs(d_calc[below] - observed) < np.abs(d_calc[above] - observed), below, above)
+
+    # different d-spacings in the window, equal ones are indistinguishable anyway
+    first = d_calc[np.clip(lower, 0, len(d_calc) - 1)]
+    last = d_calc[np.clip(upper - 1, 0, len(d_calc) - 1)]
+    ambiguous = assigned & (last - first > 1e-9 * observed)
+
+    calculated = d_calc[nearest]
+    hkl = np.where(assigned[:, np.newaxis], hkl_calc[nearest], 0)
+    errors = calculated / observed - 1.0
+    logger.debug(
+        f"Assigned {np.count_nonzero(assigned)} of {len(observed)} peaks, {np.count_nonzero(ambiguous)} ambiguously"
+    )
+
+    return PeakMatch(observed, hkl, calculated, errors, assigned, ambiguous)
@@ -0,0 +1,81 @@
+import time
+from typing import List, NamedTuple
+
+# accumulated [calls, seconds, rows] of every stage while enabled
+_timings = {}
+_enabled = False
+
+
+class StageTiming(NamedTuple):
+    name: str
+    calls: int
+    seconds: float
+    rows: int  # zero for stages that do not count rows
+
+
+class _Timer:
+    __slots__ = ("name", "rows", "_start")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.rows = 0
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *_exc_info):
+        elapsed = time.perf_counter() - self._start
+        entry = _timings.setdefault(self.name, [0, 0.0, 0])
+        entry[0] += 1
+        entry[1] += elapsed
+        entry[2] += self.rows
+        return False
+
+
+class _NullTimer:
+    """Shared stand-in while timing is off, so an instrumented stage costs one function call"""
+
+    __slots__ = ("rows",)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_exc_info):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def stage(name: str):
+    """Context manager timing one stage, set ``rows`` on what it returns to count the rows processed"""
+    return _Timer(name) if _enabled else _NULL_TIMER
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def reset():
+    _timings.clear()
+
+
+def report() -> List[StageTiming]:
+    """Timings of every stage in the order they first ran"""
+    return [StageTiming(name, *entry) for name, entry in _timings.items()]
+
+
+def formatReport() -> str:
+    lines = [f"{'stage':<24}{'calls':>8}{'seconds':>12}{'rows':>12}{'rows/sec':>14}"]
+    for timing in report():
+        rows = f"{timing.rows:>12}" if timing.rows else f"{'-':>12}"
+        rate = f"{timing.rows / timing.seconds:>14.4g}" if timing.rows and timing.seconds > 0 else f"{'-':>14}"
+        lines.append(f"{timing.name:<24}{timing.calls:>8}{timing.seconds:>12.6f}{rows}{rate}")
+    return "\n".join(lines)
@@ -0,0 +1,113 @@
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+
+# candidate types for integer columns, smallest first
+_INTEGER_TYPES = (np.int8, np.int16, np.int32, np.int64)
+
+
+def compactIntegers(values, name: str = "values"):
+    """Integer arrays are kept as they are, anything else is checked and cast to the smallest type that holds it"""
+    if isinstance(values, np.ndarray) and np.issubdtype(values.dtype, np.integer):
+        return values
+    values = np.asarray(values)
+    if values.size and not np.issubdtype(values.dtype, np.integer) and np.any(values != np.round(values)):
+        raise ValueError(f"Found non-integer {name}")
+    largest = np.abs(values).max(initial=0)
+    for dtype in _INTEGER_TYPES:
+        if largest <= np.iinfo(dtype).max:
+            return values.astype(dtype)
+    raise ValueError(f"Found {name} too large for an integer type")
+
+
+def _field_hkl(records):
+    """``(N, 3)`` hkl from a structured array, a view when ``h``, ``k`` and ``l`` are adjacent fields of one type"""
+    if "hkl" in records.dtype.names:
+        return records["hkl"]
+    fields = records.dtype.fields
+    dtype, offset = fields["h"][:2]
+    adjacent = all(
+        fields[name][0] == dtype and fields[name][1] == offset + position * dtype.itemsize
+        for position, name in enumerate("hkl")
+    )
+    if adjacent:
+        first = records["h"]
+        return as_strided(first, shape=(len(first), 3), strides=(first.strides[0], dtype.itemsize))
+    return np.column_stack([records[name] for name in "hkl"])
+
+
+class ReflectionTable:
+    """Columns of a list of reflections: hkl, d-spacing and optionally multiplicity and sigma of the d-spacing
+
+    The hkl are stored as the smallest integer type that holds them, which is
+    a quarter or less of the memory of int64. Arrays that already have
+    suitable types are used without copying, including memory-mapped arrays
+    and views into structured arrays (see :meth:`from_records`). Slicing
+    returns views. Filtering and concatenation copy only the rows they keep.
+    """
+
+    __slots__ = ("hkl", "d", "multiplicity", "sigma")
+
+    def __init__(self, hkl, d, multiplicity=None, sigma=None):
+        self.hkl = compactIntegers(hkl, "hkl")
+        self.d = np.asarray(d, dtype=np.float64)
+        self.multiplicity = None if multiplicity is None else compactIntegers(multiplicity, "multiplicity")
+        self.sigma = None if sigma is None else np.asarray(sigma, dtype=np.float64)
+
+        if self.hkl.ndim != 2 or self.hkl.shape[1] != 3:
+            raise ValueError(f"Expected hkl of shape (N, 3), found {self.hkl.shape}")
+        for name in self.__slots__[1:]:
+            column = getattr(self, name)
+            if column is not None and column.shape != (len(self.hkl),):
+                raise ValueError(f"Found {len(self.hkl)} hkl and {name} of shape {column.shape}")
+
+    @staticmethod
+    def from_records(records) -> "ReflectionTable":
+        """Wrap a structured array with fields ``hkl`` (or ``h``, ``k``, ``l``), ``d`` and optionally
+        ``multiplicity`` and ``sigma``
+
+        Fields of suitable types are viewed rather than copied.
+        """
+        records = np.asarray(records)
+        names = records.dtype.names or ()
+        if "d" not in names or not ("hkl" in names or {"h", "k", "l"} <= set(names)):
+            raise ValueError(f"Expected fields hkl (or h, k, l) and d, found {names}")
+        optional = {name: records[name] for name in ("multiplicity", "sigma") if name in names}
+        return ReflectionTable(_field_hkl(records), records["d"], **optional)
+
+    @staticmethod
+    def from_buffer(buffer, dtype, count: int = -1, offset: int = 0) -> "ReflectionTable":
+        """Same as :meth:`from_records` for anything supporting the buffer protocol, read as records of ``dtype``"""
+        return ReflectionTable.from_records(np.frombuffer(buffer, dtype=dtype, count=count, offset=offset))
+
+    @staticmethod
+    def concatenate(tables) -> "ReflectionTable":
+        """One table of all the rows, optional columns are only kept when every table has them"""
+        tables = list(tables)
+        if not tables:
+            return ReflectionTable(np.zeros((0, 3), dtype=np.int8), np.zeros(0))
+        columns = {}
+        for name in ReflectionTable.__slots__:
+            parts = [getattr(table, name) for table in tables]
+            columns[name] = None if any(part is None for part in parts) else np.concatenate(parts)
+        return ReflectionTable(**columns)
+
+    def __len__(self):
+        return len(self.d)
+
+    def __getitem__(self, index) -> "ReflectionTable":
+        if isinstance(index, (int, np.integer)):
+            index = slice(index, index + 1 or None)
+        columns = (getattr(self, name) for name in self.__slots__)
+        return ReflectionTable(*(None if column is None else column[index] for column in columns))
+
+    def __repr__(self):
+        optional = [name for name in self.__slots__[2:] if getattr(self, name) is not None]
+        return f"ReflectionTable({len(self)} reflections, hkl {self.hkl.dtype}, optional {optional})"
+
+    def select(self, mask) -> "ReflectionTable":
+        """Rows where ``mask`` is true"""
+        return self[np.asarray(mask, dtype=bool)]
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name in self.__slots__ if getattr(self, name) is not None)
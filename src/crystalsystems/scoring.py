@@ -0,0 +1,152 @@
+import itertools
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple
+
+import numpy as np
+
+from crystalsystems.lattice import LatticeBatch
+
+logger = logging.getLogger("crystalsystems.scoring")
+
+# Cu K-alpha1 in angstrom
+DEFAULT_WAVELENGTH = 1.5406
+
+# calculated lines closer than this (relative in Q) are counted as one
+_LINE_TOLERANCE = 1e-7
+
+
+class FiguresOfMerit(NamedTuple):
+    m20: np.ndarray  # (N,) de Wolff M20 of every candidate
+    fn: np.ndarray  # (N,) Smith-Snyder F_N of every candidate
+
+
+def _half_grid(hmax):
+    """hkl within ``|h| <= hmax[0]`` etc. with only one of every Friedel pair, and without 000"""
+    axes = [np.arange(-limit, limit + 1) for limit in hmax]
+    hkl = np.stack(np.meshgrid(*axes, indexing="ij"), axis=-1).reshape(-1, 3)
+    # the first non-zero index is positive
+    first = np.take_along_axis(hkl, np.argmax(hkl != 0, axis=1)[:, np.newaxis], axis=1)[:, 0]
+    return hkl[first > 0]
+
+
+def _hmax(vectors, dmin: float):
+    """Largest index along each axis of every cell with a d-spacing above ``dmin``"""
+    lengths = np.sqrt(np.diagonal(LatticeBatch(vectors).metric_tensor(), axis1=-2, axis2=-1))
+    return np.floor(lengths / dmin).astype(int)
+
+
+def neighbourLines(qCalc, qObs):
+    """Indices of the calculated lines either side of every observed Q, as ``(below, above)``
+
+    ``qCalc`` holds the sorted lines of one candidate per row and ``qObs`` the
+    observed Q. Uses one binary search for every candidate at once: the rows
+    are offset so that together they form a single increasing array. Both
+    results have shape ``(len(qCalc), len(qObs))`` and are clipped to the row.
+    """
+    num_cand, num_calc = qCalc.shape
+    limit = 2.0 * max(qCalc.max(initial=0.0), qObs.max(initial=0.0)) + 1.0
+    offset = (limit * np.arange(num_cand))[:, np.newaxis]
+    flat = (qCalc + offset).ravel()
+    rows = np.arange(num_cand)[:, np.newaxis] * num_calc
+
+    above = np.searchsorted(flat, (qObs + offset).ravel()).reshape(num_cand, len(qObs))
+    above = np.clip(above, rows, rows + num_calc - 1)
+    below = np.clip(above - 1, rows, rows + num_calc - 1)
+    return below - rows, above - rows
+
+
+def deWolffM20(qLast, meanError, lines):
+    """de Wolff figure of merit from the Q of the last peak used, the mean Q error and the number of possible lines"""
+    return qLast / (2.0 * np.maximum(meanError, np.finfo(float).eps * qLast) * np.maximum(lines, 1))
+
+
+def _score_chunk(vectors, qObs, wavelength: float, space_group=None):
+    """Figures of merit of a ``(C, 3, 3)`` chunk of cells against sorted observed Q = 1/d^2"""
+    grid = _half_grid(_hmax(vectors, 1.0 / np.sqrt(qObs[-1])).max(axis=0) + 1)
+    if space_group is not None:
+        grid = grid[~space_group.absent(grid)]
+    recip = LatticeBatch(vectors).reciprocal().metric_tensor()
+    qCalc = np.sort(np.einsum("mi,cij,mj->cm", grid, recip, grid), axis=1)
+
+    # distinct calculated lines up to the last observed peak of each figure
+    distinct = np.ones(qCalc.shape, dtype=bool)
+    distinct[:, 1:] = np.diff(qCalc, axis=1) > _LINE_TOLERANCE * qCalc[:, 1:]
+
+    def possible(qLast):
+        return np.count_nonzero(distinct & (qCalc <= qLast * (1.0 + _LINE_TOLERANCE)), axis=1)
+
+    # both neighbours of every observed peak
+    below, above = neighbourLines(qCalc, qObs)
+    neighbours = np.stack((np.take_along_axis(qCalc, below, axis=1), np.take_along_axis(qCalc, above, axis=1)))
+
+    num_m = min(20, len(qObs))
+    delta_q = np.abs(neighbours[..., :num_m] - qObs[:num_m]).min(axis=0)
+    m20 = deWolffM20(qObs[num_m - 1], delta_q.mean(axis=1), possible(qObs[num_m - 1]))
+
+    def two_theta(q):
+        return 2.0 * np.rad2deg(np.arcsin(np.clip(0.5 * wavelength * np.sqrt(q), 0.0, 1.0)))
+
+    delta_theta = np.abs(two_theta(neighbours) - two_theta(qObs)).min(axis=0)
+    mean_theta = np.maximum(delta_theta.mean(axis=1), np.finfo(float).eps)
+    fn = len(qObs) / (mean_theta * np.maximum(possible(qObs[-1]), 1))
+    return m20, fn
+
+
+def scoreLattices(
+    dSpacing,
+    lattices,
+    peaks: int = 20,
+    wavelength: float = DEFAULT_WAVELENGTH,
+    chunksize: int = 2**22,
+    jobs: int = 1,
+    space_group=None,
+) -> FiguresOfMerit:
+    """de Wolff M20 and Smith-Snyder F_N of many candidate lattices against one set of observed d-spacings
+
+    Every candidate's calculated lines come from one grid of hkl, so each
+    figure takes a handful of array passes rather than a loop over lattices.
+    F_N uses the first ``peaks`` observed lines with their 2theta computed at
+    ``wavelength``. ``chunksize`` bounds the number of calculated lines held in
+    memory at once and setting ``jobs`` to anything but 1 scores the chunks in
+    a process pool. A :class:`crystalsystems.spacegroup.SpaceGroup` removes
+    its systematic absences from the calculated lines, which assumes every
+    cell is in the setting of the group.
+    """
+    qObs = np.sort(1.0 / np.square(np.asarray(dSpacing, dtype=float)))[:peaks]
+    if len(qObs) == 0:
+        raise ValueError("Need at least one observed d-spacing")
+    if 0.5 * wavelength * np.sqrt(qObs[-1]) > 1.0:
+        raise ValueError(f"d-spacings below {0.5 * wavelength} cannot be observed at wavelength {wavelength}")
+    if not isinstance(lattices, LatticeBatch):
+        lattices = LatticeBatch.from_lattices(lattices)
+
+    # group cells needing similar grids, so a large cell does not inflate every chunk
+    hmax = _hmax(lattices.vectors, 1.0 / np.sqrt(qObs[-1])) + 1
+    order = np.argsort(np.prod(2 * hmax + 1, axis=1), kind="stable")
+    chunks = []
+    start = 0
+    while start < len(order):
+        stop = start + 1
+        limits = hmax[order[start]]
+        while stop < len(order):
+            limits = np.maximum(limits, hmax[order[stop]])
+            if (stop - start + 1) * np.prod(2 * limits + 1) // 2 > chunksize:
+                break
+            stop += 1
+        chunks.append(lattices.vectors[order[start:stop]])
+        start = stop
+    logger.debug(f"Scoring {len(lattices)} lattices in {len(chunks)} chunks")
+
+    if jobs == 1:
+        scores = [_score_chunk(chunk, qObs, wavelength, space_group) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            arguments = (itertools.repeat(qObs), itertools.repeat(wavelength), itertools.repeat(space_group))
+            scores = list(executor.map(_score_chunk, chunks, *arguments))
+
+    m20 = np.empty(len(lattices))
+    fn = np.empty(len(lattices))
+    m20[order] = np.concatenate([chunk_m20 for chunk_m20, _ in scores])
+    fn[order] = np.concatenate([chunk_fn for _, chunk_fn in scores])
+    return FiguresOfMerit(m20, fn)
@@ -0,0 +1,184 @@
+import asyncio
+import json
+import logging
+import os
+import signal
+import socket
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, Iterable, List
+
+from crystalsystems.batch import FIELDS, processFile
+from crystalsystems.lstsq import getLattice
+
+logger = logging.getLogger("crystalsystems.server")
+
+# longest request line, inline data can be large
+LINE_LIMIT = 2**28
+
+
+def processRequest(request: Dict, cache_directory: str = None) -> Dict:
+    """Fit the lattice of one request and return the same record as :func:`crystalsystems.batch.processFile`
+
+    A request is a dictionary with either a ``filename`` of a CIF file or
+    inline ``hkl`` and ``d`` lists. An optional ``id`` is copied into the
+    record so results can be matched to requests when they finish out of
+    order.
+    """
+    if "filename" in request:
+        record = processFile(request["filename"], cache_directory)
+    else:
+        record = dict.fromkeys(FIELDS)
+        try:
+            lattice = getLattice(request["hkl"], request["d"])
+        except Exception as e:  # noqa: BLE001
+            record["status"] = "error"
+            record["error"] = f"{type(e).__name__}: {e}"
+        else:
+            record["status"] = "ok"
+            record["reflections"] = len(request["d"])
+            for label, value in zip(FIELDS[3:9], lattice.scalar_lattice_constants()):
+                record[label] = float(value)
+    record["id"] = request.get("id")
+    return record
+
+
+async def serve(reader, writer, executor, max_pending: int = 64, cache_directory: str = None):
+    """Answer JSON-lines requests from ``reader`` until it is exhausted, writing results as they complete
+
+    At most ``max_pending`` requests are in flight, after that no more are
+    read until one finishes. Results wait for ``writer`` to drain, so a slow
+    reader of the results also stops more requests being read. When writing
+    fails, for example because the client went away, the requests in flight
+    are cancelled and the error is raised.
+    """
+    loop = asyncio.get_running_loop()
+    pending = asyncio.Semaphore(max_pending)
+    results = asyncio.Queue(maxsize=max_pending)
+
+    async def run(line: bytes):
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("expected a JSON object")
+        except ValueError as e:
+            record = dict.fromkeys(FIELDS, None)
+            record.update(status="error", error=f"Invalid request: {e}", id=None)
+        else:
+            record = await loop.run_in_executor(executor, processRequest, request, cache_directory)
+        await results.put(record)
+
+    async def write():
+        while True:
+            record = await results.get()
+            if record is None:
+                break
+            writer.write((json.dumps(record) + "\n").encode())
+            await writer.drain()
+
+    def cancel_running(task):
+        # nothing can take the results of the requests in flight any more
+        if not task.cancelled() and task.exception() is not None:
+            for other in list(running):
+                other.cancel()
+
+    writing = asyncio.create_task(write())
+    running = set()
+    writing.add_done_callback(cancel_running)
+    count = 0
+    while not writing.done():
+        line = await reader.readline()
+        if not line:
+            break
+        if not line.strip():
+            continue
+        await pending.acquire()
+        if writing.done():
+            pending.release()
+            break
+        task = asyncio.create_task(run(line))
+        running.add(task)
+        task.add_done_callback(running.discard)
+        task.add_done_callback(lambda _: pending.release())
+        count += 1
+
+    await asyncio.gather(*running, return_exceptions=True)
+    if not writing.done():
+        await results.put(None)
+    await writing
+    logger.debug(f"Answered {count} requests")
+
+
+class _StdinReader:
+    """``readline`` of stdin in a thread, which unlike a pipe transport also works when stdin is a file"""
+
+    async def readline(self) -> bytes:
+        return await asyncio.get_running_loop().run_in_executor(None, sys.stdin.buffer.readline)
+
+
+class _StdoutWriter:
+    def write(self, data: bytes):
+        sys.stdout.buffer.write(data)
+
+    async def drain(self):
+        await asyncio.get_running_loop().run_in_executor(None, sys.stdout.buffer.flush)
+
+
+async def _serve_stdio(executor, max_pending: int, cache_directory: str):
+    await serve(_StdinReader(), _StdoutWriter(), executor, max_pending, cache_directory)
+
+
+async def _serve_socket(path: str, executor, max_pending: int, cache_directory: str):
+    async def handle(reader, writer):
+        try:
+            await serve(reader, writer, executor, max_pending, cache_directory)
+        except ConnectionError as e:
+            logger.info(f"Dropped a client: {e}")
+        finally:
+            writer.close()
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+
+    server = await asyncio.start_unix_server(handle, path=path, limit=LINE_LIMIT)
+    logger.info(f"Listening on {path}")
+    try:
+        await stop.wait()
+    finally:
+        server.close()
+        await server.wait_closed()
+        os.unlink(path)
+
+
+def runServer(socket_path: str = None, jobs: int = None, max_pending: int = 64, cache_directory: str = None):
+    """Serve requests from stdin, or from every connection to a Unix socket, until stopped
+
+    ``jobs`` is the number of worker processes as for
+    :func:`crystalsystems.batch.runBatch`, with ``1`` using a single thread
+    in this process. Reading stdin stops at the end of the input, a socket
+    server stops on SIGINT or SIGTERM.
+    """
+    executor = ThreadPoolExecutor(max_workers=1) if jobs == 1 else ProcessPoolExecutor(max_workers=jobs)
+    with executor:
+        if socket_path:
+            asyncio.run(_serve_socket(socket_path, executor, max_pending, cache_directory))
+        else:
+            asyncio.run(_serve_stdio(executor, max_pending, cache_directory))
+
+
+def sendRequests(socket_path: str, requests: Iterable[Dict]) -> List[Dict]:
+    """Minimal blocking client that sends requests to a server and returns the results in the order they arrive
+
+    Everything is sent before anything is read, so this is meant for tests
+    and batches smaller than the server's ``max_pending``.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.connect(socket_path)
+        with connection.makefile("rwb") as stream:
+            for request in requests:
+                stream.write((json.dumps(request) + "\n").encode())
+            stream.flush()
+            connection.shutdown(socket.SHUT_WR)
+            return [json.loads(line) for line in stream]
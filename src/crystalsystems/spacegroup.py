@@ -0,0 +1,438 @@
+import logging
+import re
+from typing import NamedTuple
+
+import numpy as np
+
+from crystalsystems.lattice import Reflections
+from crystalsystems.reflections import ReflectionTable
+
+logger = logging.getLogger("crystalsystems.spacegroup")
+
+
+def _closure(generators):
+    """Every product of the generators, as an ``(M, 3, 3)`` array starting with the identity"""
+    operations = {tuple(np.eye(3, dtype=int).ravel()): np.eye(3, dtype=int)}
+    frontier = list(operations.values())
+    while frontier:
+        found = []
+        for operation in frontier:
+            for generator in generators:
+                product = np.asarray(generator) @ operation
+                key = tuple(product.ravel())
+                if key not in operations:
+                    operations[key] = product
+                    found.append(product)
+        frontier = found
+    return np.stack(list(operations.values()))
+
+
+_INVERSION = -np.eye(3, dtype=int)
+_TWOFOLD_B = np.diag([-1, 1, -1])
+_TWOFOLD_C = np.diag([-1, -1, 1])
+_FOURFOLD_C = [[0, -1, 0], [1, 0, 0], [0, 0, 1]]
+_THREEFOLD_C = [[-1, -1, 0], [1, 0, 0], [0, 0, 1]]  # hexagonal axes
+_THREEFOLD_DIAGONAL = [[0, 0, 1], [1, 0, 0], [0, 1, 0]]
+_SWAP_HK = [[0, 1, 0], [1, 0, 0], [0, 0, 1]]
+_SWAP_HK_FLIP_L = [[0, 1, 0], [1, 0, 0], [0, 0, -1]]
+
+# operations of every Laue class acting on hkl, hexagonal and trigonal classes use hexagonal axes
+LAUE_CLASSES = {
+    "-1": _closure([_INVERSION]),
+    "2/m": _closure([_INVERSION, _TWOFOLD_B]),  # unique axis b
+    "mmm": _closure([_INVERSION, _TWOFOLD_B, _TWOFOLD_C]),
+    "4/m": _closure([_INVERSION, _FOURFOLD_C]),
+    "4/mmm": _closure([_INVERSION, _FOURFOLD_C, _SWAP_HK]),
+    "-3": _closure([_INVERSION, _THREEFOLD_C]),
+    "-3m1": _closure([_INVERSION, _THREEFOLD_C, _SWAP_HK_FLIP_L]),
+    "-31m": _closure([_INVERSION, _THREEFOLD_C, _SWAP_HK]),
+    "6/m": _closure([_INVERSION, _THREEFOLD_C, _TWOFOLD_C]),
+    "6/mmm": _closure([_INVERSION, _THREEFOLD_C, _TWOFOLD_C, _SWAP_HK]),
+    "m-3": _closure([_INVERSION, _TWOFOLD_B, _TWOFOLD_C, _THREEFOLD_DIAGONAL]),
+    "m-3m": _closure([_INVERSION, _TWOFOLD_B, _TWOFOLD_C, _THREEFOLD_DIAGONAL, _SWAP_HK]),
+}
+
+# integral conditions of the lattice centring, rhombohedral is the obverse setting on hexagonal axes
+_CENTRING = {
+    "P": (),
+    "A": ("hkl: k+l=2n",),
+    "B": ("hkl: h+l=2n",),
+    "C": ("hkl: h+k=2n",),
+    "I": ("hkl: h+k+l=2n",),
+    "F": ("hkl: h+k=2n", "hkl: h+l=2n", "hkl: k+l=2n"),
+    "R": ("hkl: -h+k+l=3n",),
+}
+
+# Laue class and the zonal and serial reflection conditions of the glide planes and screw axes of each group,
+# as in International Tables volume A. Conditions that the Laue class maps onto each other are only listed
+# once, and the centring conditions come from the first letter of the symbol.
+_GROUPS = {
+    # triclinic
+    "P1": ("-1",),
+    "P-1": ("-1",),
+    # monoclinic, unique axis b
+    "P2": ("2/m",),
+    "P21": ("2/m", "0k0: k=2n"),
+    "C2": ("2/m",),
+    "Pm": ("2/m",),
+    "Pc": ("2/m", "h0l: l=2n"),
+    "Cm": ("2/m",),
+    "Cc": ("2/m", "h0l: l=2n"),
+    "P2/m": ("2/m",),
+    "P21/m": ("2/m", "0k0: k=2n"),
+    "C2/m": ("2/m",),
+    "P2/c": ("2/m", "h0l: l=2n"),
+    "P21/c": ("2/m", "h0l: l=2n", "0k0: k=2n"),
+    "P21/n": ("2/m", "h0l: h+l=2n", "0k0: k=2n"),
+    "P21/a": ("2/m", "h0l: h=2n", "0k0: k=2n"),
+    "C2/c": ("2/m", "h0l: l=2n"),
+    # orthorhombic
+    "P222": ("mmm",),
+    "P2221": ("mmm", "00l: l=2n"),
+    "P21212": ("mmm", "h00: h=2n", "0k0: k=2n"),
+    "P212121": ("mmm", "h00: h=2n", "0k0: k=2n", "00l: l=2n"),
+    "C2221": ("mmm", "00l: l=2n"),
+    "C222": ("mmm",),
+    "F222": ("mmm",),
+    "I222": ("mmm",),
+    "Pmm2": ("mmm",),
+    "Pca21": ("mmm", "0kl: l=2n", "h0l: h=2n"),
+    "Pna21": ("mmm", "0kl: k+l=2n", "h0l: h=2n"),
+    "Cmm2": ("mmm",),
+    "Cmc21": ("mmm", "h0l: l=2n"),
+    "Fmm2": ("mmm",),
+    "Imm2": ("mmm",),
+    "Pmmm": ("mmm",),
+    "Pbam": ("mmm", "0kl: k=2n", "h0l: h=2n"),
+    "Pccn": ("mmm", "0kl: l=2n", "h0l: l=2n", "hk0: h+k=2n"),
+    "Pnnm": ("mmm", "0kl: k+l=2n", "h0l: h+l=2n"),
+    "Pbcn": ("mmm", "0kl: k=2n", "h0l: l=2n", "hk0: h+k=2n"),
+    "Pbca": ("mmm", "0kl: k=2n", "h0l: l=2n", "hk0: h=2n"),
+    "Pnma": ("mmm", "0kl: k+l=2n", "hk0: h=2n"),
+    "Cmcm": ("mmm", "h0l: l=2n"),
+    "Cmce": ("mmm", "h0l: l=2n", "hk0: h=2n"),
+    "Cmca": ("mmm", "h0l: l=2n", "hk0: h=2n"),
+    "Cmmm": ("mmm",),
+    "Fmmm": ("mmm",),
+    "Fddd": ("mmm", "0kl: k+l=4n", "h0l: h+l=4n", "hk0: h+k=4n"),
+    "Immm": ("mmm",),
+    "Ibam": ("mmm", "0kl: k=2n", "h0l: h=2n"),
+    "Ibca": ("mmm", "0kl: k=2n", "h0l: l=2n", "hk0: h=2n"),
+    # tetragonal
+    "P4": ("4/m",),
+    "P41": ("4/m", "00l: l=4n"),
+    "P42": ("4/m", "00l: l=2n"),
+    "P43": ("4/m", "00l: l=4n"),
+    "I4": ("4/m",),
+    "I41": ("4/m", "00l: l=4n"),
+    "P-4": ("4/m",),
+    "I-4": ("4/m",),
+    "P4/m": ("4/m",),
+    "P42/m": ("4/m", "00l: l=2n"),
+    "P4/n": ("4/m", "hk0: h+k=2n"),
+    "P42/n": ("4/m", "hk0: h+k=2n", "00l: l=2n"),
+    "I4/m": ("4/m",),
+    "I41/a": ("4/m", "hk0: h=2n", "00l: l=4n"),
+    "P422": ("4/mmm",),
+    "P4212": ("4/mmm", "h00: h=2n"),
+    "P41212": ("4/mmm", "00l: l=4n", "h00: h=2n"),
+    "P43212": ("4/mmm", "00l: l=4n", "h00: h=2n"),
+    "I422": ("4/mmm",),
+    "I4122": ("4/mmm", "00l: l=4n"),
+    "P4mm": ("4/mmm",),
+    "I4mm": ("4/mmm",),
+    "P-42m": ("4/mmm",),
+    "P-421m": ("4/mmm", "h00: h=2n"),
+    "P-421c": ("4/mmm", "hhl: l=2n", "h00: h=2n"),
+    "P-4m2": ("4/mmm",),
+    "I-4m2": ("4/mmm",),
+    "I-42m": ("4/mmm",),
+    "I-42d": ("4/mmm", "hhl: 2h+l=4n"),
+    "P4/mmm": ("4/mmm",),
+    "P4/mcc": ("4/mmm", "0kl: l=2n", "hhl: l=2n"),
+    "P4/nmm": ("4/mmm", "hk0: h+k=2n"),
+    "P4/ncc": ("4/mmm", "hk0: h+k=2n", "0kl: l=2n", "hhl: l=2n"),
+    "P42/mmc": ("4/mmm", "hhl: l=2n"),
+    "P42/mnm": ("4/mmm", "0kl: k+l=2n"),
+    "P42/nmc": ("4/mmm", "hk0: h+k=2n", "hhl: l=2n"),
+    "I4/mmm": ("4/mmm",),
+    "I4/mcm": ("4/mmm", "0kl: l=2n"),
+    "I41/amd": ("4/mmm", "hk0: h=2n", "hhl: 2h+l=4n"),
+    "I41/acd": ("4/mmm", "hk0: h=2n", "0kl: l=2n", "hhl: 2h+l=4n"),
+    # trigonal, hexagonal axes
+    "P3": ("-3",),
+    "P31": ("-3", "00l: l=3n"),
+    "P32": ("-3", "00l: l=3n"),
+    "R3": ("-3",),
+    "P-3": ("-3",),
+    "R-3": ("-3",),
+    "P321": ("-3m1",),
+    "P3121": ("-3m1", "00l: l=3n"),
+    "P3221": ("-3m1", "00l: l=3n"),
+    "R32": ("-3m1",),
+    "P3m1": ("-3m1",),
+    "P3c1": ("-3m1", "h-hl: l=2n"),
+    "R3m": ("-3m1",),
+    "R3c": ("-3m1", "h-hl: l=2n"),
+    "P-3m1": ("-3m1",),
+    "P-3c1": ("-3m1", "h-hl: l=2n"),
+    "R-3m": ("-3m1",),
+    "R-3c": ("-3m1", "h-hl: l=2n"),
+    "P312": ("-31m",),
+    "P31m": ("-31m",),
+    "P31c": ("-31m", "hhl: l=2n"),
+    "P-31m": ("-31m",),
+    "P-31c": ("-31m", "hhl: l=2n"),
+    # hexagonal
+    "P6": ("6/m",),
+    "P61": ("6/m", "00l: l=6n"),
+    "P65": ("6/m", "00l: l=6n"),
+    "P62": ("6/m", "00l: l=3n"),
+    "P64": ("6/m", "00l: l=3n"),
+    "P63": ("6/m", "00l: l=2n"),
+    "P-6": ("6/m",),
+    "P6/m": ("6/m",),
+    "P63/m": ("6/m", "00l: l=2n"),
+    "P622": ("6/mmm",),
+    "P6122": ("6/mmm", "00l: l=6n"),
+    "P6522": ("6/mmm", "00l: l=6n"),
+    "P6222": ("6/mmm", "00l: l=3n"),
+    "P6422": ("6/mmm", "00l: l=3n"),
+    "P6322": ("6/mmm", "00l: l=2n"),
+    "P6mm": ("6/mmm",),
+    "P6cc": ("6/mmm", "h-hl: l=2n", "hhl: l=2n"),
+    "P63cm": ("6/mmm", "h-hl: l=2n"),
+    "P63mc": ("6/mmm", "hhl: l=2n"),
+    "P-6m2": ("6/mmm",),
+    "P-6c2": ("6/mmm", "h-hl: l=2n"),
+    "P-62m": ("6/mmm",),
+    "P-62c": ("6/mmm", "hhl: l=2n"),
+    "P6/mmm": ("6/mmm",),
+    "P6/mcc": ("6/mmm", "h-hl: l=2n", "hhl: l=2n"),
+    "P63/mcm": ("6/mmm", "h-hl: l=2n"),
+    "P63/mmc": ("6/mmm", "hhl: l=2n"),
+    # cubic
+    "P23": ("m-3",),
+    "F23": ("m-3",),
+    "I23": ("m-3",),
+    "P213": ("m-3", "h00: h=2n"),
+    "I213": ("m-3",),
+    "Pm-3": ("m-3",),
+    "Pn-3": ("m-3", "0kl: k+l=2n"),
+    "Fm-3": ("m-3",),
+    "Fd-3": ("m-3", "0kl: k+l=4n"),
+    "Im-3": ("m-3",),
+    "Pa-3": ("m-3", "0kl: k=2n"),
+    "Ia-3": ("m-3", "0kl: k=2n"),
+    "P432": ("m-3m",),
+    "P4232": ("m-3m", "h00: h=2n"),
+    "F432": ("m-3m",),
+    "F4132": ("m-3m", "h00: h=4n"),
+    "I432": ("m-3m",),
+    "P4332": ("m-3m", "h00: h=4n"),
+    "P4132": ("m-3m", "h00: h=4n"),
+    "I4132": ("m-3m", "h00: h=4n"),
+    "P-43m": ("m-3m",),
+    "F-43m": ("m-3m",),
+    "I-43m": ("m-3m",),
+    "P-43n": ("m-3m", "hhl: l=2n"),
+    "F-43c": ("m-3m", "hhl: l=2n"),
+    "I-43d": ("m-3m", "hhl: 2h+l=4n"),
+    "Pm-3m": ("m-3m",),
+    "Pn-3n": ("m-3m", "0kl: k+l=2n", "hhl: l=2n"),
+    "Pm-3n": ("m-3m", "hhl: l=2n"),
+    "Pn-3m": ("m-3m", "0kl: k+l=2n"),
+    "Fm-3m": ("m-3m",),
+    "Fm-3c": ("m-3m", "hhl: l=2n"),
+    "Fd-3m": ("m-3m", "0kl: k+l=4n"),
+    "Fd-3c": ("m-3m", "0kl: k+l=4n", "hhl: h=2n"),
+    "Im-3m": ("m-3m",),
+    "Ia-3d": ("m-3m", "0kl: k=2n", "hhl: 2h+l=4n"),
+}
+
+
+class ReflectionCondition(NamedTuple):
+    zone: np.ndarray  # (M, 3) the condition applies to hkl with zone @ hkl == 0, no rows for every hkl
+    rule: np.ndarray  # (3,) coefficients of the sum of the indices
+    modulus: int  # the sum has to be a multiple of this
+
+
+_INDICES = {"h": 0, "k": 1, "l": 2}
+
+
+def _parse_condition(text: str) -> ReflectionCondition:
+    """Parse a condition written as in International Tables, such as "hhl: 2h+l=4n" or "h0l: l=2n"
+
+    Letters in the rule are the indices in their usual positions.
+    """
+    zone, rule = (part.strip() for part in text.split(":"))
+    tokens = re.findall(r"-?[0hkl]", zone)
+    if len(tokens) != 3 or "".join(tokens) != zone:
+        raise ValueError(f"Cannot parse the zone of {text}")
+
+    rows = []
+    first = {}
+    for position, token in enumerate(tokens):
+        row = np.zeros(3, dtype=int)
+        if token == "0":
+            row[position] = 1
+        elif token[-1] in first:
+            # the same index appears again, with the same or the opposite sign
+            earlier, earlier_sign = first[token[-1]]
+            row[position] = 1
+            row[earlier] = -earlier_sign * (-1 if token.startswith("-") else 1)
+        else:
+            first[token[-1]] = (position, -1 if token.startswith("-") else 1)
+            continue
+        rows.append(row)
+
+    total, modulus = rule.split("=")
+    coefficients = np.zeros(3, dtype=int)
+    for sign, factor, index in re.findall(r"([-+]?)(\d*)([hkl])", total):
+        coefficients[_INDICES[index]] += (-1 if sign == "-" else 1) * int(factor or 1)
+    return ReflectionCondition(np.asarray(rows, dtype=int).reshape(-1, 3), coefficients, int(modulus.rstrip("n")))
+
+
+def _sign(rows):
+    """Rows multiplied by the sign of their first non-zero entry"""
+    first = np.take_along_axis(rows, np.argmax(rows != 0, axis=-1)[..., np.newaxis], axis=-1)
+    return rows * np.where(first < 0, -1, 1)
+
+
+def _equivalent_conditions(conditions, operations):
+    """Every distinct image of the conditions under the operations, so each can be tested on hkl directly
+
+    Breaking a condition at ``g @ hkl`` is breaking the condition with zone
+    ``zone @ g`` and rule ``rule @ g`` at ``hkl``.
+    """
+    equivalent = {}
+    for condition in conditions:
+        images = operations[:1] if len(condition.zone) == 0 else operations
+        for operation in images:
+            zone = _sign(condition.zone @ operation)
+            zone = zone[np.lexsort(zone.T[::-1])] if len(zone) else zone
+            rule = _sign(condition.rule @ operation)
+            key = (zone.tobytes(), rule.tobytes(), condition.modulus)
+            equivalent.setdefault(key, ReflectionCondition(zone, rule, condition.modulus))
+    return tuple(equivalent.values())
+
+
+def _keys(hkl, base: int):
+    """One integer per hkl that orders them like the tuples, for indices smaller than ``base`` in magnitude"""
+    return ((hkl[..., 0] + base) * 2 * base + hkl[..., 1] + base) * 2 * base + hkl[..., 2] + base
+
+
+class SpaceGroup:
+    """Systematic absences and Laue class of a space group in its standard setting
+
+    ``operations`` are the ``(M, 3, 3)`` integer matrices of the Laue class
+    acting on hkl. Trigonal and hexagonal groups, including the rhombohedral
+    ones, use hexagonal axes and monoclinic groups use unique axis b.
+    """
+
+    __slots__ = ("symbol", "laue", "operations", "conditions", "_equivalent")
+
+    def __init__(self, symbol: str, laue: str, conditions=()):
+        if laue not in LAUE_CLASSES:
+            raise ValueError(f"Unknown Laue class {laue}, options are {list(LAUE_CLASSES)}")
+        self.symbol = symbol
+        self.laue = laue
+        self.operations = LAUE_CLASSES[laue]
+        self.conditions = tuple(
+            condition if isinstance(condition, ReflectionCondition) else _parse_condition(condition)
+            for condition in conditions
+        )
+        self._equivalent = _equivalent_conditions(self.conditions, self.operations)
+
+    def __repr__(self):
+        return f"SpaceGroup({self.symbol}, Laue class {self.laue})"
+
+    def absent(self, hkl) -> np.ndarray:
+        """Which rows of an ``(N, 3)`` hkl array, or of a reflection table, are systematically absent
+
+        A reflection is absent when any of its Laue equivalents breaks a
+        condition, so conditions only need to be given for one zone of each
+        equivalent set.
+        """
+        hkl = np.asarray(getattr(hkl, "hkl", hkl), dtype=np.int64).reshape(-1, 3)
+        absent = np.zeros(len(hkl), dtype=bool)
+        for zone, rule, modulus in self._equivalent:
+            broken = (hkl @ rule) % modulus != 0
+            if len(zone):
+                broken &= np.all(hkl @ zone.T == 0, axis=1)
+            absent |= broken
+        return absent
+
+    def canonical(self, hkl) -> np.ndarray:
+        """The largest Laue equivalent of every hkl, the same representative that merging keeps"""
+        hkl = np.asarray(getattr(hkl, "hkl", hkl), dtype=np.int64).reshape(-1, 3)
+        images = np.einsum("oij,nj->oni", self.operations, hkl)
+        keys = _keys(images, int(np.abs(hkl).max(initial=0)) + 1)
+        return images[np.argmax(keys, axis=0), np.arange(len(hkl))]
+
+    def dropAbsent(self, reflections):
+        """Drop the absent rows of a :class:`crystalsystems.reflections.ReflectionTable` or
+        :class:`crystalsystems.lattice.Reflections`"""
+        keep = ~self.absent(reflections)
+        if isinstance(reflections, ReflectionTable):
+            return reflections.select(keep)
+        return type(reflections)(*(column[keep] for column in reflections))
+
+    def merge(self, reflections):
+        """Drop the absent rows and collapse Laue equivalents into one row each, sorted by decreasing d-spacing
+
+        The multiplicity of every row is the sum of the multiplicities, or the
+        number of rows, merged into it. The d-spacing is their mean weighted by
+        ``1 / sigma^2`` when a table has sigma, and by multiplicity otherwise.
+        Works on a :class:`crystalsystems.reflections.ReflectionTable` or
+        :class:`crystalsystems.lattice.Reflections` and returns the same type.
+        """
+        table = reflections
+        if not isinstance(table, ReflectionTable):
+            table = ReflectionTable(reflections.hkl, reflections.d, reflections.multiplicity)
+        table = self.dropAbsent(table)
+
+        canonical = self.canonical(table.hkl)
+        _, first, inverse = np.unique(
+            _keys(canonical, int(np.abs(canonical).max(initial=0)) + 1), return_index=True, return_inverse=True
+        )
+        inverse = inverse.ravel()
+        counts = np.ones(len(table)) if table.multiplicity is None else table.multiplicity.astype(float)
+        multiplicity = np.bincount(inverse, counts)
+        sigma = None
+        if table.sigma is None:
+            d_vals = np.bincount(inverse, counts * table.d) / multiplicity
+        else:
+            weights = 1.0 / np.square(table.sigma)
+            total = np.bincount(inverse, weights)
+            d_vals = np.bincount(inverse, weights * table.d) / total
+            sigma = 1.0 / np.sqrt(total)
+
+        hkl = canonical[first].astype(table.hkl.dtype)
+        order = np.lexsort((-hkl[:, 2], -hkl[:, 1], -hkl[:, 0], -d_vals))
+        multiplicity = np.round(multiplicity[order]).astype(np.int16)
+        logger.debug(f"Merged {len(table)} reflections into {len(order)} unique ones with {self}")
+        if isinstance(reflections, ReflectionTable):
+            return ReflectionTable(hkl[order], d_vals[order], multiplicity, None if sigma is None else sigma[order])
+        return Reflections(hkl[order], d_vals[order], multiplicity)
+
+
+def _normalize(symbol: str) -> str:
+    """Short symbol without spaces, so "P 1 21/c 1" and "P21/c" are the same"""
+    parts = symbol.split()
+    if len(parts) == 4 and parts[1] == "1" and parts[3] == "1":
+        parts = [parts[0], parts[2]]
+    return "".join(parts)
+
+
+SPACE_GROUPS = {
+    symbol: SpaceGroup(symbol, entry[0], _CENTRING[symbol[0]] + entry[1:]) for symbol, entry in _GROUPS.items()
+}
+
+
+def getSpaceGroup(symbol: str) -> SpaceGroup:
+    """Look up a space group by its Hermann-Mauguin symbol, with or without spaces"""
+    name = _normalize(symbol)
+    if name not in SPACE_GROUPS:
+        raise ValueError(f"Unknown or unsupported space group {symbol}")
+    return SPACE_GROUPS[name]
@@ -0,0 +1,97 @@
+import logging
+
+import numpy as np
+
+from crystalsystems.lattice import Lattice, LatticeBatch
+from crystalsystems.reflections import ReflectionTable, compactIntegers
+
+logger = logging.getLogger("crystalsystems.transform")
+
+# Every matrix has the new basis vectors as rows in terms of the old ones, the
+# same convention as ``crystalsystems.lattice.ReducedCell.transform``, so
+# ``new.vectors == transform @ old.vectors``.
+
+# primitive cells of the centred lattices, rhombohedral is the obverse setting on hexagonal axes
+CENTRED_TO_PRIMITIVE = {
+    "A": np.asarray([[2, 0, 0], [0, 1, -1], [0, 1, 1]]) / 2,
+    "B": np.asarray([[1, 0, -1], [0, 2, 0], [1, 0, 1]]) / 2,
+    "C": np.asarray([[1, -1, 0], [1, 1, 0], [0, 0, 2]]) / 2,
+    "I": np.asarray([[-1, 1, 1], [1, -1, 1], [1, 1, -1]]) / 2,
+    "F": np.asarray([[0, 1, 1], [1, 0, 1], [1, 1, 0]]) / 2,
+    "R": np.asarray([[2, 1, 1], [-1, 1, 1], [-1, -2, 1]]) / 3,
+}
+HEXAGONAL_TO_RHOMBOHEDRAL = CENTRED_TO_PRIMITIVE["R"]
+
+# right-handed relabellings of the axes, named after the new axes in terms of the old
+PERMUTATIONS = {
+    "bca": np.asarray([[0, 1, 0], [0, 0, 1], [1, 0, 0]]),
+    "cab": np.asarray([[0, 0, 1], [1, 0, 0], [0, 1, 0]]),
+    "ba-c": np.asarray([[0, 1, 0], [1, 0, 0], [0, 0, -1]]),
+    "-cba": np.asarray([[0, 0, -1], [0, 1, 0], [1, 0, 0]]),
+    "a-cb": np.asarray([[1, 0, 0], [0, 0, -1], [0, 1, 0]]),
+}
+
+
+def supercell(multiples) -> np.ndarray:
+    """The integer matrix of the supercell ``multiples[0] a, multiples[1] b, multiples[2] c``"""
+    multiples = np.asarray(multiples, dtype=np.int64)
+    if multiples.shape != (3,) or np.any(multiples < 1):
+        raise ValueError(f"Expected three positive multiples, found {multiples}")
+    return np.diag(multiples)
+
+
+def _as_transform(transform):
+    """``(3, 3)`` or ``(K, 3, 3)`` float matrices, which represent integer and rational ones exactly enough"""
+    transform = np.asarray(transform, dtype=float)
+    if transform.ndim not in (2, 3) or transform.shape[-2:] != (3, 3):
+        raise ValueError(f"Expected transforms of shape (3, 3) or (K, 3, 3), found {transform.shape}")
+    if np.any(np.abs(np.linalg.det(transform)) < 1e-9):
+        raise ValueError("Transforms have to be invertible")
+    return transform
+
+
+def transformLattices(lattices, transform):
+    """Re-express a lattice, a :class:`crystalsystems.lattice.LatticeBatch` or ``(N, 3, 3)`` vectors in a new cell
+
+    ``transform`` is one ``(3, 3)`` matrix for every cell or ``(N, 3, 3)``
+    matrices, one per cell, and may be rational, for example
+    ``CENTRED_TO_PRIMITIVE["F"]``. A single lattice with a single matrix
+    gives a :class:`crystalsystems.lattice.Lattice`, anything else a batch.
+    """
+    transform = _as_transform(transform)
+    if isinstance(lattices, Lattice):
+        vectors, single = lattices.vectors[np.newaxis], True
+    elif isinstance(lattices, LatticeBatch):
+        vectors, single = lattices.vectors, False
+    else:
+        vectors = np.asarray(lattices, dtype=float)
+        single = vectors.ndim == 2
+        vectors = vectors.reshape(-1, 3, 3)
+
+    transformed = LatticeBatch(np.matmul(transform, vectors))
+    if single and transform.ndim == 2:
+        return transformed[0]
+    return transformed
+
+
+def transformHkl(hkl, transform, tolerance: float = 1e-6):
+    """Indices of an ``(N, 3)`` hkl array, or of a reflection table, in the cell given by ``transform``
+
+    Miller indices change with the same matrix as the basis vectors, so this
+    is ``hkl @ transform.T`` for every matrix at once: ``K`` matrices give a
+    ``(K, N, 3)`` array. The result has the smallest integer type that holds
+    it. A reflection table keeps its other columns without copying them.
+    Indices that are not integers in the new cell, such as the absences of a
+    centred cell in its primitive one, raise a ``ValueError``. Use
+    :meth:`crystalsystems.spacegroup.SpaceGroup.dropAbsent` to remove those first.
+    """
+    if isinstance(hkl, ReflectionTable):
+        return ReflectionTable(transformHkl(hkl.hkl, transform, tolerance), hkl.d, hkl.multiplicity, hkl.sigma)
+
+    transform = _as_transform(transform)
+    transformed = np.matmul(np.asarray(hkl, dtype=float).reshape(-1, 3), np.swapaxes(transform, -1, -2))
+    rounded = np.round(transformed)
+    fractional = np.any(np.abs(transformed - rounded) > tolerance, axis=-1)
+    if np.any(fractional):
+        raise ValueError(f"{np.count_nonzero(fractional)} hkl are not integers in the new cell")
+    return compactIntegers(rounded, "hkl")
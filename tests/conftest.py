@@ -0,0 +1,42 @@
+import pytest
+
+# reflections of a triclinic cell in the format read by crystalsystems.cif.loadCIF
+CIF_TEXT = """# Space group P-1
+# a    6.608677
+# b    6.847855
+# c    7.525497
+# al   106.10666
+# be   106.50219
+# ga   111.62796
+
+h   k   l   m    d_spacing
+
+0   0   1   2    6.51876
+0   1   0   2    5.75105
+0   1  -1   2    5.68918
+1   0  -1   2    5.57554
+1  -1   0   2    5.56100
+1   0   0   2    5.53898
+1  -1  -1   2    4.27249
+1  -1   1   2    4.19014
+1   1  -1   2    3.77900
+0   1   1   2    3.61223
+0   1  -2   2    3.56638
+"""
+
+
+@pytest.fixture()
+def cif_text():
+    return CIF_TEXT
+
+
+@pytest.fixture()
+def cif_lines():
+    return CIF_TEXT.split("\n")
+
+
+@pytest.fixture()
+def cif_file(tmp_path):
+    filename = tmp_path / "data.cif"
+    filename.write_text(CIF_TEXT)
+    return str(filename)
@@ -0,0 +1,70 @@
+import csv
+import io
+import json
+
+import pytest
+from crystalsystems.__main__ import main
+from crystalsystems.batch import expandPaths, processFile, runBatch
+
+
+@pytest.fixture()
+def cif_dir(tmp_path, cif_text):
+    (tmp_path / "good1.cif").write_text(cif_text)
+    (tmp_path / "good2.cif").write_text(cif_text)
+    (tmp_path / "bad.cif").write_text("h k l m d\n")
+    (tmp_path / "ignored.txt").write_text(cif_text)
+    return tmp_path
+
+
+def test_expand(cif_dir):
+    filenames = expandPaths([str(cif_dir), str(cif_dir / "good*.cif")])
+    assert len(filenames) == 3
+    assert all(filename.endswith(".cif") for filename in filenames)
+
+
+def test_process_file(cif_dir):
+    record = processFile(str(cif_dir / "good1.cif"))
+    assert record["status"] == "ok"
+    assert record["reflections"] == 11
+    assert record["a"] == pytest.approx(6.608677, abs=0.001)
+
+    record = processFile(str(cif_dir / "bad.cif"))
+    assert record["status"] == "error"
+    assert "RuntimeError" in record["error"]
+
+    record = processFile(str(cif_dir / "missing.cif"))
+    assert record["status"] == "error"
+
+
+@pytest.mark.parametrize("output_format", ["jsonl", "csv"])
+def test_run_batch(cif_dir, output_format):
+    output = io.StringIO()
+    failures = runBatch(expandPaths([str(cif_dir)]), output, jobs=1, output_format=output_format)
+    assert failures == 1
+
+    output.seek(0)
+    if output_format == "jsonl":
+        records = [json.loads(line) for line in output]
+    else:
+        records = list(csv.DictReader(output))
+    assert len(records) == 3
+    assert sorted(record["status"] for record in records) == ["error", "ok", "ok"]
+
+
+def test_main_batch(cif_dir, tmp_path):
+    output = tmp_path / "results.jsonl"
+    assert main(["--batch", "-j", "2", "-o", str(output), str(cif_dir / "good*.cif")]) == 0
+
+    records = [json.loads(line) for line in output.read_text().splitlines()]
+    assert len(records) == 2
+    assert all(record["status"] == "ok" for record in records)
+
+
+def test_main_multiple_without_batch(cif_dir):
+    with pytest.raises(SystemExit) as e:
+        main([str(cif_dir / "good1.cif"), str(cif_dir / "good2.cif")])
+    assert e.value.code == 2
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,40 @@
+import json
+
+import numpy as np
+import pytest
+from crystalsystems.cif import loadCIF
+from run import main
+from synthetic import LATTICES, generate, writeCIF
+
+
+@pytest.mark.parametrize("system", list(LATTICES))
+def test_generate(system, tmp_path):
+    lattice, hkl, dSpacing = generate(system, 100)
+    assert hkl.shape == (100, 3)
+    assert np.all(np.isfinite(dSpacing))
+
+    filename = tmp_path / "synthetic.cif"
+    with open(filename, "w") as handle:
+        writeCIF(handle, lattice, hkl, dSpacing)
+    with open(filename, "r") as handle:
+        lattice_read, hkl_read, dSpacing_read = loadCIF(handle)
+    lattice.assert_allclose(lattice_read)
+    np.testing.assert_equal(hkl_read, hkl)
+    np.testing.assert_allclose(dSpacing_read, dSpacing)
+
+
+def test_run(tmp_path):
+    results = tmp_path / "results.jsonl"
+    args = ["--sizes", "10", "--systems", "cubic", "--repeat", "1", "--tmpdir", str(tmp_path)]
+    assert main(args + ["-o", str(results)]) == 0
+
+    records = [json.loads(line) for line in results.read_text().splitlines()]
+    assert {record["stage"] for record in records} >= {"loadCIF", "getLattice", "reciprocal", "toB", "toDspacing"}
+    assert {"startup --version", "startup error"} <= {record["stage"] for record in records}
+
+    # nothing can be 1000 times slower than itself
+    assert main(args + ["-o", str(tmp_path / "again.jsonl"), "--compare", str(results), "--threshold", "1000"]) == 0
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
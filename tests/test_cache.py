@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+from crystalsystems.__main__ import main
+from crystalsystems.cache import ReflectionCache
+
+
+def test_cache_hit(cif_file, tmp_path):
+    cache = ReflectionCache(str(tmp_path / "cache"))
+    lattice, hkl, dSpacing = cache.loadCIF(cif_file)
+    assert cache.size() > 0
+
+    lattice_cached, hkl_cached, dSpacing_cached = cache.loadCIF(cif_file)
+    assert isinstance(dSpacing_cached, np.memmap)
+    lattice.assert_allclose(lattice_cached)
+    np.testing.assert_equal(hkl_cached, hkl)
+    np.testing.assert_equal(dSpacing_cached, dSpacing)
+
+
+def test_cache_invalidate(cif_file, cif_text, tmp_path):
+    cache = ReflectionCache(str(tmp_path / "cache"))
+    cache.loadCIF(cif_file)
+
+    # dropping the header changes the size so the file is parsed again
+    with open(cif_file, "w") as handle:
+        handle.write(cif_text[cif_text.index("h   k") :])
+    lattice, hkl, _ = cache.loadCIF(cif_file)
+    assert lattice is None
+    assert hkl.shape == (11, 3)
+
+
+def test_cache_evict(cif_file, tmp_path):
+    cache = ReflectionCache(str(tmp_path / "cache"), max_bytes=0)
+    cache.loadCIF(cif_file)
+    assert cache.size() == 0
+
+    cache.max_bytes = 1024**2
+    cache.loadCIF(cif_file)
+    assert cache.size() > 0
+    cache.clear()
+    assert cache.size() == 0
+
+
+def test_main_clear_cache(cif_file, tmp_path):
+    directory = str(tmp_path / "cache")
+    assert main(["--cache", directory, cif_file]) is None
+    assert ReflectionCache(directory).size() > 0
+
+    assert main(["--cache", directory, "--clear-cache"]) == 0
+    assert ReflectionCache(directory).size() == 0
+
+
+def test_main_cache_environment(cif_file, tmp_path, monkeypatch):
+    directory = str(tmp_path / "environment")
+    monkeypatch.setenv("CRYSTALSYSTEMS_CACHE", directory)
+    assert main([cif_file, "--cache"]) is None
+    assert ReflectionCache(directory).size() > 0
+
+    assert main(["--clear-cache"]) == 0
+    assert ReflectionCache(directory).size() == 0
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -1,6 +1,15 @@
 import numpy as np
 import pytest
-from crystalsystems.cif import _read_crystal_info, _read_data, _split
+from crystalsystems.cif import (
+    _parse_block,
+    _read_crystal_info,
+    _read_header,
+    loadCIF,
+    loadCIFChunks,
+    loadReflections,
+)
+from crystalsystems.lstsq import getLattice, toSolverConstants
+from crystalsystems.reflections import ReflectionTable
 
 DATA = """
 # Space group P-1
@@ -30,23 +39,21 @@ h   k   l   m    d_spacing
 )
 
 
-def test_split():
-    results = _split(DATA)
-    assert len(results) == 2
-    # get local friendly names
-    header, body = results
+def test_read_header():
+    lines = iter(DATA)
+    header = _read_header(lines)
     assert len(header) == 7
+    # the rest of the lines are the data
+    body = [line for line in lines if line.strip()]
     assert len(body) == 11
 
 
-def test_split_no_header():
+def test_read_header_no_header():
     # this skips over the header b/c it isn't clear it will always be there
-    results = _split(DATA[8:])
-    assert len(results) == 2
-
-    # get local friendly names
-    header, body = results
+    lines = iter(DATA[8:])
+    header = _read_header(lines)
     assert len(header) == 0
+    body = [line for line in lines if line.strip()]
     assert len(body) == 11
 
 
@@ -75,17 +82,121 @@ def test_read_crystal():
 
 
 def test_read_empty_data():
+    assert len(_parse_block([])) == 0
     with pytest.raises(RuntimeError):
-        _read_data([])
+        loadReflections(DATA[:11])
 
 
 def test_read_bad_data():
-    result = _read_data(DATA[8:])
+    result = loadReflections(DATA[8:])
     assert len(result) == 2
 
-    hkl, dSpacing = result
-    assert hkl.shape[0] == dSpacing.shape[0]
-    assert hkl.shape[1] == 3
+    lattice, reflections = result
+    assert lattice is None
+    assert reflections.hkl.shape[0] == reflections.d.shape[0]
+    assert reflections.hkl.shape[1] == 3
+
+
+def test_parse_block():
+    reflections = _parse_block(DATA[11:])
+    assert isinstance(reflections, ReflectionTable)
+    assert len(reflections) == 11
+    assert reflections.hkl.shape == (11, 3)
+    assert reflections.d.shape == (11,)
+    np.testing.assert_equal(reflections.multiplicity, 2)
+
+
+def test_read_malformed_data():
+    body = [
+        "0 0 1 2 6.51876",
+        "# a comment",
+        "0 1 0 x 5.75105",  # multiplicity is dropped
+        "0 1 -1 2",  # too few columns
+        "0 1 -1 2 5.68918 7",  # too many columns
+        "1.5 0 -1 2 5.57554",  # non-integer index
+        "1 -1 0 2 abc",
+        "  1 0 0 2 5.53898  ",
+    ]
+    reflections = _parse_block(body)
+    np.testing.assert_equal(reflections.hkl, [[0, 0, 1], [0, 1, 0], [1, 0, 0]])
+    np.testing.assert_allclose(reflections.d, [6.51876, 5.75105, 5.53898])
+    assert reflections.hkl.dtype == np.int8
+    assert reflections.multiplicity is None
+
+    # the multiplicity is kept when it is readable on every line
+    reflections = _parse_block(body[:1] + body[3:])
+    np.testing.assert_equal(reflections.multiplicity, [2, 2])
+
+
+def test_load():
+    lattice, hkl, dSpacing = loadCIF(DATA)
+    assert lattice is not None
+    assert hkl.shape == (11, 3)
+    np.testing.assert_allclose(dSpacing[[0, -1]], [6.51876, 3.56638])
+
+    _, reflections = loadReflections(DATA)
+    np.testing.assert_equal(reflections.hkl, hkl)
+    np.testing.assert_equal(reflections.multiplicity, np.full(11, 2))
+
+
+def test_load_chunks():
+    lattice, chunks = loadCIFChunks(DATA, chunksize=4)
+    assert lattice is not None
+    chunks = list(chunks)
+    assert len(chunks) > 1
+    hkl = np.concatenate([chunk.hkl for chunk in chunks])
+    dSpacing = np.concatenate([chunk.d for chunk in chunks])
+
+    _, hkl_all, dSpacing_all = loadCIF(DATA)
+    np.testing.assert_equal(hkl, hkl_all)
+    np.testing.assert_equal(dSpacing, dSpacing_all)
+
+    _, chunks = loadCIFChunks(DATA[:12])
+    with pytest.raises(RuntimeError):
+        list(chunks)
+
+
+def test_load_large_indices():
+    # a 20 Angstrom cubic cell with indices that overflow int8 once squared
+    hkl = [(12, 0, 0), (0, 13, 1), (1, -14, 2), (15, 3, -12), (2, 5, 7), (-13, 2, 9)]
+    rows = [f"{h} {k} {l_} 2 {20.0 / np.sqrt(h * h + k * k + l_ * l_):.8f}" for h, k, l_ in hkl]
+    _, hkl_loaded, dSpacing = loadCIF(["h k l m d"] + rows)
+    assert hkl_loaded.dtype == np.int64
+    assert toSolverConstants(*hkl_loaded[0]) == (144, 0, 0, 0, 0, 0)
+    assert toSolverConstants(*hkl_loaded[3])[-1] == -36
+    np.testing.assert_allclose(getLattice(hkl_loaded, dSpacing).scalar_lattice_constants(), [20, 20, 20, 90, 90, 90])
+
+    # the chunks stay compact and are widened by the solver
+    _, chunks = loadCIFChunks(["h k l m d"] + rows)
+    (reflections,) = list(chunks)
+    assert reflections.hkl.dtype == np.int8
+    np.testing.assert_allclose(getLattice(reflections).scalar_lattice_constants(), [20, 20, 20, 90, 90, 90])
+
+
+def test_load_symmetry():
+    header = ["# Space group F m -3 m", "# a 4.0", "# b 4.0", "# c 4.0", "# al 90", "# be 90", "# ga 90", "h k l m d"]
+    rows = ["1 1 1 1 2.3094", "1 -1 1 1 2.3094", "1 0 0 1 4.0", "2 0 0 1 2.0", "0 0 -2 1 2.0", "0 2 0 1 2.0"]
+    _, reflections = loadReflections(header + rows)
+    assert len(reflections) == 6
+
+    _, reflections = loadReflections(header + rows, symmetry="filter")
+    assert len(reflections) == 5
+
+    _, reflections = loadReflections(header + rows, symmetry="merge")
+    np.testing.assert_equal(reflections.hkl, [[1, 1, 1], [2, 0, 0]])
+    np.testing.assert_equal(reflections.multiplicity, [2, 3])
+
+    _, chunks = loadCIFChunks(header + rows, chunksize=2, symmetry="filter")
+    assert sum(len(chunk) for chunk in chunks) == 5
+
+    # an unsupported space group leaves the data alone
+    _, reflections = loadReflections(["# Space group X 99"] + header[1:] + rows, symmetry="merge")
+    assert len(reflections) == 6
+
+    with pytest.raises(ValueError, match="Unknown symmetry unknown"):
+        loadReflections(DATA, symmetry="unknown")
+    with pytest.raises(ValueError, match="Unknown symmetry merge for chunks"):
+        loadCIFChunks(DATA, symmetry="merge")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+from crystalsystems.database import ReferenceIndex
+from crystalsystems.lattice import Lattice, LatticeBatch, LatticeBuilder
+
+
+@pytest.fixture(scope="module")
+def references():
+    rng = np.random.default_rng(0)
+    return np.column_stack((rng.uniform(3, 20, (5000, 3)), rng.uniform(60, 120, (5000, 3))))
+
+
+def brute_force(index, constants, rtol, angle_tolerance):
+    """Distance of every pair by comparing everything with everything"""
+    queries = ReferenceIndex.build(constants)
+    reduced = np.repeat(queries.constants[np.argsort(queries.ids)], len(index), axis=0)
+    reference = np.tile(index.constants[np.argsort(index.ids)], (len(constants), 1))
+    lengths = np.abs(reference[:, :3] / reduced[:, :3] - 1.0).max(axis=1) / rtol
+    angles = ReferenceIndex._angle_distance(reference[:, 3:], reduced[:, 3:], angle_tolerance) / angle_tolerance
+    return np.maximum(lengths, angles).reshape(len(constants), len(index))
+
+
+def test_query(references):
+    index = ReferenceIndex.build(references)
+    assert len(index) == len(references)
+
+    # perturbed copies of some of the references, in another setting
+    rng = np.random.default_rng(1)
+    chosen = rng.choice(len(references), 50, replace=False)
+    lattices = LatticeBuilder.construct_from_scalars(*(references[chosen] * [1.002, 0.998, 1.0, 1.0, 1.0, 1.0]).T)
+    lattices = LatticeBatch(np.asarray([[1, 0, 0], [1, 1, 0], [0, 0, 1]]) @ lattices.vectors)
+
+    reference, distance = index.nearest(lattices)
+    np.testing.assert_equal(reference, chosen)
+    assert np.all(distance <= 1.0)
+
+    # the same pairs as comparing with everything
+    matches = index.query(references[:20], rtol=0.05, angle_tolerance=5.0)
+    expected = brute_force(index, references[:20], 0.05, 5.0) <= 1.0
+    found = np.zeros_like(expected)
+    found[matches.query, matches.reference] = True
+    np.testing.assert_equal(found, expected)
+    # sorted by query then distance
+    assert np.all(np.diff(matches.query) >= 0)
+
+
+def test_no_match(references):
+    index = ReferenceIndex.build(references)
+    reference, distance = index.nearest([[50.0, 60.0, 70.0, 90.0, 90.0, 90.0]])
+    np.testing.assert_equal(reference, [-1])
+    assert np.isinf(distance[0])
+
+    single = Lattice(*LatticeBuilder.construct_from_scalars(*references[7]).vectors)
+    reference, _ = index.nearest(single)
+    np.testing.assert_equal(reference, [7])
+
+    with pytest.raises(ValueError, match="Expected lattices or an array of shape"):
+        index.query([1.0, 2.0, 3.0])
+
+
+def test_save_load(references, tmp_path):
+    index = ReferenceIndex.build(references)
+    index.save(str(tmp_path))
+    loaded = ReferenceIndex.load(str(tmp_path))
+    assert isinstance(loaded.constants, np.memmap)
+    assert loaded.bucket_width == index.bucket_width
+
+    matches = index.query(references[:10])
+    loaded_matches = loaded.query(references[:10])
+    for left, right in zip(matches, loaded_matches):
+        np.testing.assert_equal(left, right)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
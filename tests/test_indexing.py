@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+from crystalsystems.cif import loadCIF
+from crystalsystems.indexing import indexPeaks
+from crystalsystems.lattice import LatticeBuilder
+
+
+def powder_pattern(lattice, peaks=20):
+    """The largest distinct d-spacings of every reflection with indices up to 4"""
+    span = np.arange(-4, 5)
+    hkl = np.stack(np.meshgrid(span, span, span), axis=-1).reshape(-1, 3)
+    hkl = hkl[hkl.any(axis=1)]
+    return np.unique(np.round(lattice.toDspacings(hkl), 6))[::-1][:peaks]
+
+
+@pytest.mark.parametrize(
+    ("system", "lattice_constants", "systems"),
+    [
+        ("cubic", (5.43, 5.43, 5.43, 90, 90, 90), None),
+        ("hexagonal", (3.21, 3.21, 5.21, 90, 90, 120), ["hexagonal", "tetragonal", "orthorhombic"]),
+        ("tetragonal", (4.59, 4.59, 2.96, 90, 90, 90), ["hexagonal", "tetragonal", "orthorhombic"]),
+        ("orthorhombic", (4.76, 10.2, 5.98, 90, 90, 90), ["orthorhombic", "monoclinic"]),
+    ],
+)
+def test_index(system, lattice_constants, systems):
+    lattice = LatticeBuilder.construct_from_scalars(*lattice_constants)
+    dSpacing = powder_pattern(lattice)
+
+    solutions = indexPeaks(dSpacing, systems=systems)
+    best = solutions[0]
+    assert best.system == system
+    assert np.all(best.indexed)
+    np.testing.assert_allclose(best.lattice.volume, lattice.volume, rtol=1e-5)
+    # the assigned hkl reproduce the peaks
+    np.testing.assert_allclose(np.sort(best.lattice.toDspacings(best.hkl)), np.sort(dSpacing), rtol=1e-5)
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_index_triclinic(jobs, cif_lines):
+    lattice, _, dSpacing = loadCIF(cif_lines)
+
+    solutions = indexPeaks(dSpacing, systems=["monoclinic", "triclinic"], tolerance=1e-4, jobs=jobs)
+    best = solutions[0]
+    assert best.system == "triclinic"
+    assert np.all(best.indexed)
+    # the cell may be found in a different setting
+    np.testing.assert_allclose(best.lattice.volume, lattice.volume, rtol=1e-4)
+    assert np.max(np.abs(best.errors)) < 1e-4
+
+
+def test_index_unknown_system():
+    with pytest.raises(ValueError, match="Unknown crystal system"):
+        indexPeaks([1.0, 2.0], systems=["rhombic"])
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
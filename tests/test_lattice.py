@@ -1,7 +1,7 @@
 import numpy as np
 import numpy.testing as nptest
 import pytest
-from crystalsystems.lattice import LatticeBuilder
+from crystalsystems.lattice import Lattice, LatticeBatch, LatticeBuilder, delaunay_reduce, niggli_reduce
 
 
 def assert_dotprod(left, right, angle):
@@ -108,5 +108,237 @@ def test_b_matrix():
     # TODO test results
 
 
+@pytest.mark.parametrize(
+    "lattice_constants",
+    [(1, 1, 1, 90, 90, 90), (1, 1, 3, 90, 90, 120), (1, 2, 3, 60, 70, 80)],
+    ids=("cubic", "hexagonal", "triclinic"),
+)
+def test_b_matrix_metric(lattice_constants):
+    lattice = LatticeBuilder.construct_from_scalars(*lattice_constants)
+    matrix = lattice.toB()
+    reciprocal = lattice.reciprocal().vectors
+
+    # B^T B is the reciprocal metric tensor
+    nptest.assert_allclose(matrix.T @ matrix, reciprocal @ reciprocal.T, atol=0.00001)
+
+
+def test_batch():
+    constants = np.asarray([(1, 1, 1, 90, 90, 90), (1, 1, 3, 90, 90, 120), (1, 2, 3, 60, 70, 80)], dtype=float)
+
+    batch = LatticeBuilder.construct_from_scalars(*constants.T)
+    assert isinstance(batch, LatticeBatch)
+    assert len(batch) == 3
+    nptest.assert_allclose(np.transpose(batch.scalar_lattice_constants()), constants)
+
+    reciprocal = batch.reciprocal()
+    matrices = batch.toB()
+    for index, lattice_constants in enumerate(constants):
+        lattice = LatticeBuilder.construct_from_scalars(*lattice_constants)
+        nptest.assert_allclose(batch.volume[index], lattice.volume)
+        nptest.assert_allclose(reciprocal.vectors[index], lattice.reciprocal().vectors, atol=0.00001)
+        nptest.assert_allclose(matrices[index], lattice.toB(), atol=0.00001)
+        batch[index].assert_allclose(lattice)
+
+
+def test_batch_views():
+    batch = LatticeBuilder.construct_from_scalars([1, 2], [1, 2], [1, 2], [90, 90], [90, 90], [90, 90])
+
+    # single lattices share memory with the batch
+    lattice = batch[1]
+    assert np.shares_memory(lattice.vectors, batch.vectors)
+    check_scalar_constants(lattice, 2, 2, 2, 90, 90, 90)
+
+    roundtrip = LatticeBatch.from_lattices(list(batch))
+    nptest.assert_allclose(roundtrip.vectors, batch.vectors)
+
+    with pytest.raises(ValueError, match="Expected an array of shape"):
+        LatticeBatch(np.zeros((2, 3)))
+
+
+@pytest.mark.parametrize(
+    "lattice_constants",
+    [(1, 1, 1, 90, 90, 90), (1, 1, 3, 90, 90, 120), (1, 2, 3, 60, 70, 80)],
+    ids=("cubic", "hexagonal", "triclinic"),
+)
+def test_dspacings(lattice_constants):
+    lattice = LatticeBuilder.construct_from_scalars(*lattice_constants)
+    hkl = np.asarray([[1, 0, 0], [0, 1, 0], [0, 0, 1], [1, 1, 0], [1, 1, 2], [2, 2, 0], [1, -2, 3]])
+
+    # compare to the metric tensor
+    metric = np.linalg.inv(lattice.vectors @ lattice.vectors.T)
+    expected = 1.0 / np.sqrt(np.einsum("ni,ij,nj->n", hkl, metric, hkl))
+
+    dspacing = lattice.toDspacings(hkl)
+    nptest.assert_allclose(dspacing, expected)
+    nptest.assert_allclose(dspacing, [lattice.toDspacing(*vals) for vals in hkl])
+    nptest.assert_allclose(lattice.toQ(hkl), 2.0 * np.pi / expected)
+
+    # the B-matrix is only calculated once
+    assert lattice.toB() is lattice.toB()
+
+    batch = LatticeBatch.from_lattices([lattice, lattice])
+    nptest.assert_allclose(batch.toDspacings(hkl), [expected, expected])
+
+
+def test_cached():
+    lattice = LatticeBuilder.construct_from_scalars(1, 2, 3, 60, 70, 80)
+
+    assert lattice.reciprocal() is lattice.reciprocal()
+    assert lattice.scalar_lattice_constants() is lattice.scalar_lattice_constants()
+    nptest.assert_allclose(lattice.metric_tensor(), lattice.vectors @ lattice.vectors.T)
+    nptest.assert_allclose(lattice.volume, np.sqrt(np.linalg.det(lattice.metric_tensor())))
+
+    # cached values can not be invalidated behind the lattice's back
+    with pytest.raises(ValueError, match="read-only"):
+        lattice.vectors[0, 0] = 2.0
+    with pytest.raises(ValueError, match="read-only"):
+        lattice.toB()[0, 0] = 2.0
+    with pytest.raises(AttributeError):
+        lattice.extra = 1
+
+
+def test_set_vectors_clears_cache():
+    lattice = LatticeBuilder.construct_cubic(1)
+    nptest.assert_allclose(lattice.toDspacings([[1, 0, 0]]), [1.0])
+
+    lattice.set_vectors([2, 0, 0], [0, 2, 0], [0, 0, 2])
+    nptest.assert_allclose(lattice.toDspacings([[1, 0, 0]]), [2.0])
+    nptest.assert_allclose(lattice.volume, 8.0)
+    nptest.assert_allclose(lattice.scalar_lattice_constants(), [2, 2, 2, 90, 90, 90])
+    nptest.assert_allclose(lattice.reciprocal().a_vec, [0.5, 0, 0])
+
+
+def test_from_solution_batch():
+    lattices = [LatticeBuilder.construct_from_scalars(1, 2, 3, 60, 70, 80), LatticeBuilder.construct_hexagonal(1, 2)]
+
+    # the solution is the reciprocal metric tensor with doubled off-diagonal terms
+    solutions = []
+    for lattice in lattices:
+        metric = lattice.reciprocal().metric_tensor()
+        diagonal = [metric[0, 0], metric[1, 1], metric[2, 2]]
+        solutions.append(diagonal + [2 * metric[0, 1], 2 * metric[0, 2], 2 * metric[1, 2]])
+
+    batch = LatticeBuilder.from_solution(solutions)
+    assert isinstance(batch, LatticeBatch)
+    for lattice, solution, observed in zip(lattices, solutions, batch):
+        lattice.assert_allclose(observed)
+        lattice.assert_allclose(LatticeBuilder.from_solution(solution))
+
+
+@pytest.mark.parametrize(
+    ("lattice_constants", "laue_unique"),
+    [((2, 2, 2, 90, 90, 90), 15), ((2, 2, 3, 90, 90, 120), 32), ((1, 2, 3, 60, 70, 80), 74)],
+    ids=("cubic", "hexagonal", "triclinic"),
+)
+def test_reflections(lattice_constants, laue_unique):
+    lattice = LatticeBuilder.construct_from_scalars(*lattice_constants)
+    dmin = 0.5
+
+    reflections = lattice.reflections(dmin)
+    assert np.all(reflections.d >= dmin * (1 - 1e-9))
+    assert np.all(np.diff(reflections.d) <= 0.0)
+    nptest.assert_allclose(reflections.d, lattice.toDspacings(reflections.hkl))
+
+    # compare with brute force
+    span = np.arange(-12, 13)
+    hkl = np.stack(np.meshgrid(span, span, span), axis=-1).reshape(-1, 3)
+    hkl = hkl[hkl.any(axis=1)]
+    assert len(reflections.hkl) == np.count_nonzero(lattice.toDspacings(hkl) >= dmin * (1 - 1e-9))
+
+    friedel = lattice.reflections(dmin, merge="friedel")
+    assert len(friedel.hkl) == len(reflections.hkl) // 2
+    assert np.all(friedel.multiplicity == 2)
+
+    laue = lattice.reflections(dmin, merge="laue")
+    assert len(laue.hkl) == laue_unique
+    assert laue.multiplicity.sum() == len(reflections.hkl)
+
+
+def test_reflections_cached():
+    lattice = LatticeBuilder.construct_cubic(2)
+    reflections = lattice.reflections(0.5)
+
+    # a larger dmin is a slice of the cached table
+    fewer = lattice.reflections(1.0)
+    assert np.shares_memory(fewer.hkl, reflections.hkl)
+    assert np.all(fewer.d >= 1.0)
+    assert len(fewer.hkl) == 32  # {100}, {110}, {111} and {200}
+
+    with pytest.raises(ValueError, match="dmin must be positive"):
+        lattice.reflections(0.0)
+    with pytest.raises(ValueError, match="Unknown merge"):
+        lattice.reflections(1.0, merge="unknown")
+
+
+def test_reflections_merge_cut():
+    # symmetric within the tolerance of the metric, so dmin falls between members of {200}
+    lattice = LatticeBuilder.construct_from_scalars(4 * (1 - 1e-7), 4, 4 * (1 + 1e-7), 90, 90, 90)
+    for dmin in (2.0, 1.9999999, 2.0000001, 1.3):
+        unmerged = lattice.reflections(dmin)
+        for merge in ("friedel", "laue"):
+            merged = lattice.reflections(dmin, merge=merge)
+            assert merged.multiplicity.sum() == len(unmerged.hkl)
+            # every representative is one of the reflections present
+            assert {tuple(row) for row in merged.hkl} <= {tuple(row) for row in unmerged.hkl}
+
+    merged = lattice.reflections(2.0, merge="laue")
+    nptest.assert_equal(merged.hkl, [[1, 0, 0], [1, 1, 0], [1, 1, 1], [0, 2, 0]])
+    nptest.assert_equal(merged.multiplicity, [6, 12, 8, 4])
+
+
+def scrambled(lattices, seed=0):
+    """The same lattices in other settings, from products of random integer shears"""
+    rng = np.random.default_rng(seed)
+    num = len(lattices)
+    transform = np.broadcast_to(np.eye(3, dtype=int), (num, 3, 3)).copy()
+    for _ in range(5):
+        shear = np.broadcast_to(np.eye(3, dtype=int), (num, 3, 3)).copy()
+        row = rng.integers(0, 3, num)
+        shear[np.arange(num), row, (row + rng.integers(1, 3, num)) % 3] = rng.integers(-2, 3, num)
+        transform = shear @ transform
+    return LatticeBatch(transform @ lattices.vectors)
+
+
+def test_niggli():
+    # body-centred cubic in a primitive setting reduces to the rhombohedral cell
+    cubic = LatticeBuilder.construct_cubic(4.0)
+    bcc = Lattice(*(np.asarray([[-0.5, 0.5, 0.5], [0.5, -0.5, 0.5], [0.5, 0.5, 2.5]]) @ cubic.vectors))
+    reduced, transform = niggli_reduce(bcc)
+    check_scalar_constants(reduced, *([np.sqrt(12)] * 3), *([np.rad2deg(np.arccos(-1 / 3))] * 3))
+    nptest.assert_allclose(transform @ bcc.vectors, reduced.vectors)
+    assert round(np.linalg.det(transform)) == 1
+
+    # every setting of the same cells reduces to the same cell
+    rng = np.random.default_rng(1)
+    cells = LatticeBuilder.construct_from_scalars(*rng.uniform(3, 10, (3, 100)), *rng.uniform(70, 110, (3, 100)))
+    expected = niggli_reduce(cells).lattice
+    reduced, transform = niggli_reduce(scrambled(expected))
+    assert len(reduced) == 100
+    nptest.assert_allclose(reduced.metric_tensor(), expected.metric_tensor(), rtol=1e-8, atol=1e-8)
+    nptest.assert_allclose(reduced.volume, cells.volume)
+    A, B, C = (reduced.metric_tensor()[:, index, index] for index in range(3))
+    assert np.all((A <= B + 1e-8) & (B <= C + 1e-8))
+
+
+def test_delaunay():
+    # face-centred cubic in its primitive setting
+    cubic = LatticeBuilder.construct_cubic(4.0)
+    fcc = Lattice(*(np.asarray([[0, 0.5, 0.5], [0.5, 0, 0.5], [0.5, 0.5, 0]]) @ cubic.vectors))
+    reduced, transform = delaunay_reduce(fcc)
+    nptest.assert_allclose(reduced.scalar_lattice_constants()[:3], [np.sqrt(8)] * 3)
+    assert round(np.linalg.det(transform)) == 1
+
+    rng = np.random.default_rng(2)
+    cells = LatticeBuilder.construct_from_scalars(*rng.uniform(3, 10, (3, 100)), *rng.uniform(70, 110, (3, 100)))
+    reduced, transform = delaunay_reduce(scrambled(cells))
+    nptest.assert_allclose(reduced.volume, cells.volume)
+    # the superbase has no acute angles
+    vectors = reduced.vectors
+    superbase = np.concatenate((-vectors.sum(axis=1, keepdims=True), vectors), axis=1)
+    first, second = np.triu_indices(4, k=1)
+    products = np.einsum("npi,nqi->npq", superbase, superbase)[:, first, second]
+    assert np.all(products <= 1e-6)
+
+
 if __name__ == "__main__":
     pytest.main([__file__])
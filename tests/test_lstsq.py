@@ -1,6 +1,21 @@
+import numpy as np
 import pytest
+from crystalsystems.cif import loadCIF, loadCIFChunks
 from crystalsystems.lattice import LatticeBuilder
-from crystalsystems.lstsq import getLattice
+from crystalsystems.lstsq import (
+    CRYSTAL_SYSTEMS,
+    _model,
+    getCrystalSystem,
+    getLattice,
+    getLatticeRobust,
+    getLattices,
+    getLatticeStreaming,
+    getLatticeUncertainty,
+    isMetric,
+    iterChunks,
+    refineLattice,
+)
+from crystalsystems.reflections import ReflectionTable
 
 
 @pytest.mark.parametrize("a", [1, 2])
@@ -33,5 +48,209 @@ def test_hexagonal(a, c):
     lattice.assert_allclose(obs)
 
 
+def test_series():
+    # a triclinic cell that expands with "temperature"
+    lattices = [LatticeBuilder.construct_from_scalars(1 + scale, 2, 3 + scale, 60, 70, 80) for scale in (0, 0.1, 0.2)]
+
+    hkl = [[1, 0, 0], [0, 1, 0], [0, 0, 1], [1, 1, 0], [1, 1, 2], [2, 2, 0], [1, 2, 3], [1, -1, 0], [0, 1, -1]]
+    dSpacings = np.transpose([lattice.toDspacings(hkl) for lattice in lattices])
+    assert dSpacings.shape == (len(hkl), len(lattices))
+
+    observed = getLattices(hkl, dSpacings)
+    assert len(observed) == len(lattices)
+    for lattice, obs in zip(lattices, observed):
+        lattice.assert_allclose(obs)
+
+    # the series agrees with individual fits
+    getLattice(hkl, dSpacings[:, 1]).assert_allclose(observed[1])
+
+    with pytest.raises(ValueError, match="Expected a 2-D array of d-spacings"):
+        getLattices(hkl, dSpacings[:, 0])
+
+
+@pytest.mark.parametrize(
+    ("system", "lattice_constants"),
+    [
+        ("cubic", (2, 2, 2, 90, 90, 90)),
+        ("hexagonal", (2, 2, 3, 90, 90, 120)),
+        ("tetragonal", (2, 2, 3, 90, 90, 90)),
+        ("orthorhombic", (2, 3, 4, 90, 90, 90)),
+        ("monoclinic", (2, 3, 4, 90, 100, 90)),
+        ("triclinic", (1, 2, 3, 60, 70, 80)),
+    ],
+)
+def test_crystal_system(system, lattice_constants):
+    lattice = LatticeBuilder.construct_from_scalars(*lattice_constants)
+
+    hkl = [[1, 0, 0], [0, 1, 0], [0, 0, 1], [1, 1, 0], [1, 1, 2], [2, 2, 0], [1, 2, 3], [1, 0, -1], [0, 1, -1]]
+    dSpacing = lattice.toDspacings(hkl)
+
+    best, fits = getCrystalSystem(hkl, dSpacing)
+    assert len(fits) == len(CRYSTAL_SYSTEMS)
+    assert fits[0].system == system
+    assert fits[0].parameters == CRYSTAL_SYSTEMS[system].shape[1]
+    lattice.assert_allclose(best)
+
+
+@pytest.mark.parametrize("method", ["huber", "tukey"])
+def test_robust(method):
+    lattice = LatticeBuilder.construct_from_scalars(1, 2, 3, 60, 70, 80)
+
+    hkl = np.asarray([(h, k, l_) for h in range(-2, 3) for k in range(-2, 3) for l_ in range(0, 3) if h or k or l_])
+    dSpacing = lattice.toDspacings(hkl)
+    # small noise everywhere and one misindexed peak
+    dSpacing *= 1.0 + 1e-6 * np.random.default_rng(0).standard_normal(len(dSpacing))
+    dSpacing[7] *= 1.05
+
+    with pytest.raises(AssertionError):
+        lattice.assert_allclose(getLattice(hkl, dSpacing), atol=0.001)
+
+    fit = getLatticeRobust(hkl, dSpacing, multiplicity=np.full(len(dSpacing), 2), method=method)
+    lattice.assert_allclose(fit.lattice, atol=0.001)
+    assert 7 in fit.rejected
+    assert len(fit.rejected) < 5
+    assert fit.weights[7] < fit.weights[0]
+
+    with pytest.raises(ValueError, match="Unknown robust weighting"):
+        getLatticeRobust(hkl, dSpacing, method="unknown")
+    with pytest.raises(ValueError, match="max_iterations must be at least 1"):
+        getLatticeRobust(hkl, dSpacing, max_iterations=0)
+
+
+def test_uncertainty():
+    lattice = LatticeBuilder.construct_from_scalars(1, 2, 3, 60, 70, 80)
+
+    hkl = np.asarray([(h, k, l_) for h in range(-3, 4) for k in range(-3, 4) for l_ in range(0, 4) if h or k or l_])
+    dSpacing = lattice.toDspacings(hkl) * (1.0 + 1e-4 * np.random.default_rng(1).standard_normal(len(hkl)))
+
+    bootstrap = getLatticeUncertainty(hkl, dSpacing, resamples=500, seed=0, chunksize=1000)
+    assert bootstrap.samples.shape == (500, 6)
+    getLattice(hkl, dSpacing).assert_allclose(bootstrap.lattice)
+    # the scatter of the samples agrees with how far the fit is from the truth
+    errors = np.abs(np.subtract(bootstrap.lattice.scalar_lattice_constants(), lattice.scalar_lattice_constants()))
+    assert np.all(errors < 5 * bootstrap.sigma)
+
+    jackknife = getLatticeUncertainty(hkl, dSpacing, method="jackknife")
+    assert jackknife.samples.shape == (len(hkl), 6)
+    np.testing.assert_allclose(jackknife.sigma, bootstrap.sigma, rtol=0.5)
+
+    with pytest.raises(ValueError, match="Unknown resampling method"):
+        getLatticeUncertainty(hkl, dSpacing, method="unknown")
+    with pytest.raises(ValueError, match="resamples must be at least 2"):
+        getLatticeUncertainty(hkl, dSpacing, resamples=0)
+
+
+def test_streaming(tmp_path, cif_lines):
+    lattice = LatticeBuilder.construct_from_scalars(3.1, 4.2, 5.3, 80, 95, 110)
+    span = np.arange(-4, 5)
+    hkl = np.stack(np.meshgrid(span, span, span), axis=-1).reshape(-1, 3)
+    hkl = hkl[hkl.any(axis=1)]
+    rng = np.random.default_rng(0)
+    dSpacing = lattice.toDspacings(hkl) * (1.0 + 1e-4 * rng.standard_normal(len(hkl)))
+    expected = getLattice(hkl, dSpacing)
+
+    # chunks smaller than the number of parameters still work
+    for chunksize in [5, 100, len(hkl)]:
+        expected.assert_allclose(getLatticeStreaming(iterChunks(hkl, dSpacing, chunksize)), atol=1e-10)
+
+    # from memory-mapped columns
+    np.save(tmp_path / "hkl.npy", hkl)
+    np.save(tmp_path / "d.npy", dSpacing)
+    hkl_mapped = np.load(tmp_path / "hkl.npy", mmap_mode="r")
+    d_mapped = np.load(tmp_path / "d.npy", mmap_mode="r")
+    expected.assert_allclose(getLatticeStreaming(iterChunks(hkl_mapped, d_mapped, 64)), atol=1e-10)
+
+    # from chunks of a CIF file
+    _, chunks = loadCIFChunks(cif_lines, chunksize=4)
+    streamed = getLatticeStreaming(chunks)
+    _, hkl_cif, d_cif = loadCIF(cif_lines)
+    getLattice(hkl_cif, d_cif).assert_allclose(streamed, atol=1e-10)
+
+    # from slices of a reflection table
+    table = ReflectionTable(hkl, dSpacing)
+    expected.assert_allclose(getLatticeStreaming(iterChunks(table, chunksize=64)), atol=1e-10)
+
+    with pytest.raises(RuntimeError):
+        getLatticeStreaming(iterChunks(hkl[:5], dSpacing[:5]))
+    with pytest.raises(ValueError, match="hkl and .* d-spacings"):
+        list(iterChunks(hkl, dSpacing[:-1]))
+
+
+def test_reflection_table():
+    lattice = LatticeBuilder.construct_from_scalars(3.1, 4.2, 5.3, 80, 95, 110)
+    span = np.arange(-3, 4)
+    hkl = np.stack(np.meshgrid(span, span, span), axis=-1).reshape(-1, 3)
+    hkl = hkl[hkl.any(axis=1)]
+    table = ReflectionTable(hkl.astype(float), lattice.toDspacings(hkl), sigma=np.full(len(hkl), 1e-4))
+    assert table.hkl.dtype == np.int8
+
+    lattice.assert_allclose(getLattice(table))
+    lattice.assert_allclose(getCrystalSystem(table)[0])
+    lattice.assert_allclose(getLatticeRobust(table).lattice)
+    lattice.assert_allclose(refineLattice(table).lattice)
+    with pytest.raises(ValueError, match="d-spacings are required"):
+        getLattice(hkl)
+
+
+def test_refine_jacobian():
+    constants = np.asarray([3.1, 4.2, 5.3, 80.0, 95.0, 110.0])
+    hkl = np.asarray([[1, 0, 0], [0, 1, 0], [0, 0, 1], [1, 1, 0], [1, 0, 1], [0, 1, 1], [1, -2, 3]], dtype=float)
+    _, jacobian = _model(constants, hkl)
+
+    step = 1e-6
+    for index in range(6):
+        shift = np.zeros(6)
+        shift[index] = step
+        numeric = (_model(constants + shift, hkl)[0] - _model(constants - shift, hkl)[0]) / (2 * step)
+        np.testing.assert_allclose(jacobian[:, index], numeric, atol=1e-8)
+
+
+@pytest.mark.parametrize(
+    ("system", "lattice_constants"),
+    [
+        ("triclinic", (3.1, 4.2, 5.3, 80, 95, 110)),
+        ("monoclinic", (3.1, 4.2, 5.3, 90, 95, 90)),
+        ("hexagonal", (3.2, 3.2, 5.2, 90, 90, 120)),
+        ("cubic", (4.0, 4.0, 4.0, 90, 90, 90)),
+    ],
+)
+def test_refine(system, lattice_constants):
+    lattice = LatticeBuilder.construct_from_scalars(*lattice_constants)
+    span = np.arange(-3, 4)
+    hkl = np.stack(np.meshgrid(span, span, span), axis=-1).reshape(-1, 3)
+    hkl = hkl[hkl.any(axis=1)]
+    rng = np.random.default_rng(0)
+    dSpacing = lattice.toDspacings(hkl) + 1e-4 * rng.standard_normal(len(hkl))
+
+    refined = refineLattice(hkl, dSpacing, system=system)
+    assert refined.iterations < 10
+    # the constraints hold exactly and the result is within a few sigma of the truth
+    constants = np.asarray(refined.lattice.scalar_lattice_constants())
+    np.testing.assert_allclose(constants[3:][np.asarray(lattice_constants[3:]) == 90], 90.0)
+    np.testing.assert_allclose(constants, lattice_constants, atol=5e-3)
+    assert np.all(refined.sigma > 0)
+
+    # it minimizes the residual in d, which the linear fit does not
+    linear = getLattice(hkl, dSpacing)
+    linear_rms = np.sqrt(np.mean(np.square(linear.toDspacings(hkl) - dSpacing)))
+    assert refined.rms <= linear_rms
+
+
+def test_refine_errors():
+    hkl = [[1, 0, 0], [0, 1, 0], [0, 0, 1], [1, 1, 0], [1, 0, 1], [0, 1, 1]]
+    dSpacing = LatticeBuilder.construct_cubic(4).toDspacings(hkl)
+    with pytest.raises(ValueError, match="Unknown crystal system"):
+        refineLattice(hkl, dSpacing, system="unknown")
+    with pytest.raises(ValueError, match="max_iterations must be at least 1"):
+        refineLattice(hkl, dSpacing, max_iterations=0)
+    with pytest.raises(RuntimeError):
+        refineLattice(hkl[:1], dSpacing[:1], system="orthorhombic", start=LatticeBuilder.construct_cubic(4))
+
+
+def test_is_metric():
+    cubic = np.asarray([1.0, 1.0, 1.0, 0.0, 0.0, 0.0])
+    np.testing.assert_equal(isMetric(np.asarray([cubic, -cubic, [1.0, 1.0, 1.0, 2.0, 0.0, 0.0]])), [True, False, False])
+
+
 if __name__ == "__main__":
     pytest.main([__file__])
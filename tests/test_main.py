@@ -1,3 +1,8 @@
+import os
+import subprocess
+import sys
+
+import crystalsystems
 import pytest
 from crystalsystems import __version__
 from crystalsystems.__main__ import main
@@ -23,5 +28,45 @@ def test_noargs():
     assert e.value.code == 2
 
 
+@pytest.mark.parametrize("cached", [False, True])
+def test_missing_file(cached, tmp_path, capsys):
+    missing = str(tmp_path / "missing.cif")
+    args = ["--cache", str(tmp_path / "cache")] if cached else []
+    with pytest.raises(SystemExit) as e:
+        main(args + [missing])
+    assert e.value.code == 2
+    assert f"can't open '{missing}'" in capsys.readouterr().err
+
+
+@pytest.mark.parametrize("mode", [["--batch", "one.cif"], ["--serve"]])
+def test_streaming_conflicts(mode, capsys):
+    with pytest.raises(SystemExit) as e:
+        main(["--streaming"] + mode)
+    assert e.value.code == 2
+    assert "--streaming only applies to a single file" in capsys.readouterr().err
+
+
+# runs the command line in a fresh interpreter and reports whether numpy was loaded
+IMPORTS_NUMPY = """
+import sys
+from crystalsystems.__main__ import main
+try:
+    main({args})
+except SystemExit:
+    pass
+print("numpy" in sys.modules)
+"""
+
+
+@pytest.mark.parametrize("args", [["--version"], [], ["one.cif", "two.cif"], ["--unknown"]])
+def test_no_numpy(args):
+    # the package may only be on the path pytest was given
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(crystalsystems.__file__)))
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORTS_NUMPY.format(args=args)], capture_output=True, text=True, check=True, env=env
+    )
+    assert result.stdout.strip().splitlines()[-1] == "False"
+
+
 if __name__ == "__main__":
     pytest.main([__file__])
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+from crystalsystems.lattice import LatticeBuilder
+from crystalsystems.lstsq import getLattice
+from crystalsystems.matching import matchPeaks
+
+
+def test_match():
+    lattice = LatticeBuilder.construct_from_scalars(3, 4, 5, 90, 100, 90)
+    hkl = np.asarray([[1, 0, 0], [0, 1, 0], [0, 0, 1], [1, 1, 0], [1, 0, 1], [1, 0, -1], [0, 1, 1], [2, 1, 1]])
+    observed = lattice.toDspacings(hkl) * (1.0 + 1e-5)
+    # add a peak nothing can explain
+    observed = np.append(observed, 10.0)
+
+    match = matchPeaks(observed, lattice, tolerance=1e-4)
+    np.testing.assert_equal(match.assigned, [True] * len(hkl) + [False])
+    assert not np.any(match.ambiguous)
+    np.testing.assert_allclose(match.errors[:-1], -1e-5, atol=1e-8)
+    np.testing.assert_equal(match.hkl[-1], [0, 0, 0])
+    # the assignment may be a symmetry equivalent
+    np.testing.assert_allclose(lattice.toDspacings(match.hkl[:-1]), lattice.toDspacings(hkl))
+
+    # feeds straight into a refit
+    refit = getLattice(*match.indexed())
+    lattice.assert_allclose(refit, atol=0.001)
+
+
+def test_match_table():
+    lattice = LatticeBuilder.construct_cubic(4)
+    table = lattice.reflections(1.0, merge="laue")
+
+    # (300) and (221) have the same d-spacing, which is not ambiguous
+    match = matchPeaks([lattice.toDspacing(3, 0, 0)], table, tolerance=0.01)
+    np.testing.assert_equal(match.assigned, [True])
+    np.testing.assert_equal(match.ambiguous, [False])
+
+    # while a wide tolerance between (110) and (111) takes in both
+    observed = [lattice.toDspacing(3, 0, 0), 0.5 * (lattice.toDspacing(1, 1, 0) + lattice.toDspacing(1, 1, 1))]
+    match = matchPeaks(observed, table, tolerance=0.02)
+    np.testing.assert_equal(match.assigned, [True, False])
+    match = matchPeaks(observed[1:], table, tolerance=0.15)
+    np.testing.assert_equal(match.ambiguous, [True])
+    assert len(match.indexed()[0]) == 0
+    assert len(match.indexed(include_ambiguous=True)[0]) == 1
+
+
+def test_match_nearly_symmetric():
+    # within the tolerance of the metric symmetry, so Laue merging would collapse {200}
+    lattice = LatticeBuilder.construct_from_scalars(4 * (1 - 1e-7), 4, 4 * (1 + 1e-7), 90, 90, 90)
+    hkl = np.asarray([[1, 0, 0], [1, 1, 0], [0, 0, 2], [2, 0, 0]])
+    match = matchPeaks(lattice.toDspacings(hkl), lattice, tolerance=1e-9)
+    np.testing.assert_equal(match.assigned, [True] * 4)
+    np.testing.assert_equal(match.hkl[2:], [[0, 0, 2], [2, 0, 0]])
+
+    # the (002) peak on its own sits right at the cut of the table
+    match = matchPeaks(lattice.toDspacings([[0, 0, 2]]), lattice, tolerance=1e-9)
+    np.testing.assert_equal(match.assigned, [True])
+    np.testing.assert_equal(np.abs(match.hkl), [[0, 0, 2]])
+
+
+def test_match_empty():
+    lattice = LatticeBuilder.construct_cubic(1)
+    with pytest.raises(RuntimeError):
+        matchPeaks([2.0], lattice.reflections(1.5))
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
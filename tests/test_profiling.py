@@ -0,0 +1,70 @@
+import pstats
+
+import pytest
+from crystalsystems import profiling
+from crystalsystems.__main__ import main
+from crystalsystems.cif import loadCIF
+from crystalsystems.lstsq import getLattice
+
+
+@pytest.fixture()
+def _timings():
+    profiling.reset()
+    profiling.enable()
+    yield
+    profiling.disable()
+    profiling.reset()
+
+
+def test_disabled():
+    profiling.reset()
+    with profiling.stage("nothing") as timer:
+        timer.rows = 10
+    assert profiling.report() == []
+
+
+@pytest.mark.usefixtures("_timings")
+def test_stages(cif_lines):
+    _, hkl, dSpacing = loadCIF(cif_lines)
+    getLattice(hkl, dSpacing)
+
+    report = {timing.name: timing for timing in profiling.report()}
+    assert list(report) == [
+        "cif.header",
+        "cif.crystal_info",
+        "cif.data",
+        "lstsq.design_matrix",
+        "lstsq.solve",
+        "lstsq.lattice",
+    ]
+    assert report["cif.data"].rows == 11
+    assert report["lstsq.solve"].rows == 11
+    assert report["lstsq.solve"].calls == 1
+    assert all(timing.seconds >= 0 for timing in report.values())
+
+    text = profiling.formatReport()
+    assert "rows/sec" in text
+    assert "lstsq.solve" in text
+
+
+def test_main_profile(cif_file, tmp_path, capsys):
+    stats = tmp_path / "profile.out"
+
+    main([cif_file, "--profile", str(stats)])
+    assert "cif.data" in capsys.readouterr().err
+    assert pstats.Stats(str(stats)).total_calls > 0
+    # timing is only on while profiling
+    assert not profiling._enabled
+
+
+def test_main_streaming(cif_file, capsys):
+    # the in-memory fit is the default
+    main([cif_file, "--profile"])
+    assert "lstsq.accumulate" not in capsys.readouterr().err
+
+    main([cif_file, "--profile", "--streaming"])
+    assert "lstsq.accumulate" in capsys.readouterr().err
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,111 @@
+import numpy as np
+import pytest
+from crystalsystems.lattice import LatticeBuilder
+from crystalsystems.reflections import ReflectionTable, compactIntegers
+
+HKL = [[1, 0, 0], [0, 1, 0], [0, 0, 1], [1, 1, 0], [1, -1, 2], [-2, 2, 0]]
+D = [4.0, 3.0, 2.0, 1.5, 1.0, 0.5]
+
+
+def test_compact():
+    table = ReflectionTable(np.asarray(HKL, dtype=float), D)
+    assert table.hkl.dtype == np.int8
+    assert table.d.dtype == np.float64
+    assert table.multiplicity is None
+    assert table.sigma is None
+    assert len(table) == 6
+    assert table.nbytes == 6 * 3 + 6 * 8
+
+    assert ReflectionTable((np.asarray(HKL) * 100).tolist(), D).hkl.dtype == np.int16
+    assert compactIntegers([1.0, -200.0]).dtype == np.int16
+
+    # integer and float64 arrays are used as they are
+    hkl = np.asarray(HKL, dtype=np.int64)
+    d_vals = np.asarray(D)
+    table = ReflectionTable(hkl, d_vals)
+    assert table.hkl is hkl
+    assert table.d is d_vals
+
+
+def test_invalid():
+    with pytest.raises(ValueError, match="non-integer hkl"):
+        ReflectionTable(np.asarray(HKL) + 0.5, D)
+    with pytest.raises(ValueError, match="hkl and d of shape"):
+        ReflectionTable(HKL, D[:-1])
+    with pytest.raises(ValueError, match="Expected hkl of shape"):
+        ReflectionTable(np.asarray(HKL)[:, :2], D)
+    with pytest.raises(ValueError, match="hkl and sigma of shape"):
+        ReflectionTable(HKL, D, sigma=[1.0])
+
+
+def test_slicing():
+    table = ReflectionTable(HKL, D, multiplicity=[2] * 6, sigma=np.arange(6.0))
+
+    part = table[1:4]
+    assert len(part) == 3
+    for name in ReflectionTable.__slots__:
+        assert np.shares_memory(getattr(part, name), getattr(table, name))
+    np.testing.assert_equal(part.hkl, HKL[1:4])
+
+    last = table[-1]
+    assert len(last) == 1
+    np.testing.assert_equal(last.hkl, [HKL[-1]])
+
+    kept = table.select(table.d > 1.0)
+    np.testing.assert_equal(kept.d, [4.0, 3.0, 2.0, 1.5])
+    np.testing.assert_equal(kept.sigma, [0.0, 1.0, 2.0, 3.0])
+
+
+def test_concatenate():
+    first = ReflectionTable(HKL[:2], D[:2], multiplicity=[1, 2])
+    second = ReflectionTable((np.asarray(HKL[2:]) * 200).tolist(), D[2:], multiplicity=[3, 4, 5, 6])
+    table = ReflectionTable.concatenate([first, second])
+    assert table.hkl.dtype == np.int16
+    np.testing.assert_equal(table.multiplicity, np.arange(1, 7))
+    assert table.sigma is None
+
+    # a column missing from any table is dropped
+    assert ReflectionTable.concatenate([first, ReflectionTable(HKL, D)]).multiplicity is None
+    assert len(ReflectionTable.concatenate([])) == 0
+
+
+def test_records():
+    dtype = np.dtype([("h", np.int16), ("k", np.int16), ("l", np.int16), ("d", np.float64), ("sigma", np.float64)])
+    records = np.zeros(6, dtype=dtype)
+    for position, name in enumerate("hkl"):
+        records[name] = np.asarray(HKL)[:, position]
+    records["d"] = D
+
+    table = ReflectionTable.from_records(records)
+    np.testing.assert_equal(table.hkl, HKL)
+    assert np.shares_memory(table.hkl, records)
+    assert np.shares_memory(table.d, records)
+    assert table.multiplicity is None
+    assert table.sigma is not None
+
+    # from raw bytes without a copy
+    buffer = bytearray(records.tobytes())
+    table = ReflectionTable.from_buffer(buffer, dtype)
+    np.testing.assert_equal(table.hkl, HKL)
+    buffer[dtype.fields["d"][1] : dtype.fields["d"][1] + 8] = np.float64(9.0).tobytes()
+    assert table.d[0] == 9.0
+
+    # a single hkl field
+    packed = np.zeros(6, dtype=[("hkl", np.int8, (3,)), ("d", np.float64)])
+    packed["hkl"] = HKL
+    packed["d"] = D
+    assert np.shares_memory(ReflectionTable.from_records(packed).hkl, packed)
+
+    with pytest.raises(ValueError, match="Expected fields"):
+        ReflectionTable.from_records(np.zeros(3, dtype=[("d", np.float64)]))
+
+
+def test_lattice_dspacings():
+    lattice = LatticeBuilder.construct_from_scalars(3.1, 4.2, 5.3, 80, 95, 110)
+    table = ReflectionTable(HKL, D)
+    np.testing.assert_allclose(lattice.toDspacings(table), lattice.toDspacings(HKL))
+    np.testing.assert_allclose(lattice.toQ(table), lattice.toQ(HKL))
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+from crystalsystems.lattice import LatticeBatch, LatticeBuilder
+from crystalsystems.scoring import _half_grid, deWolffM20, neighbourLines, scoreLattices
+
+
+def observed(lattice, count=20, noise=2e-4, seed=0):
+    grid = _half_grid([6, 6, 6])
+    dSpacing = np.unique(np.round(lattice.toDspacings(grid), 6))[::-1][:count]
+    return dSpacing * (1.0 + noise * np.random.default_rng(seed).uniform(-1, 1, len(dSpacing)))
+
+
+def test_score():
+    truth = LatticeBuilder.construct_from_scalars(4.1, 5.3, 6.2, 90, 97, 90)
+    dSpacing = observed(truth)
+    candidates = [
+        truth,
+        LatticeBuilder.construct_from_scalars(4.1, 5.3, 6.2, 90, 90, 90),
+        LatticeBuilder.construct_from_scalars(8.2, 5.3, 6.2, 90, 97, 90),  # supercell
+        LatticeBuilder.construct_cubic(5.0),
+    ]
+
+    merit = scoreLattices(dSpacing, candidates)
+    assert merit.m20.shape == (4,)
+    assert np.argmax(merit.m20) == 0
+    assert np.argmax(merit.fn) == 0
+    assert merit.m20[0] > 10.0 * merit.m20[[1, 3]].max()
+    # the supercell indexes everything, but predicts twice as many lines
+    np.testing.assert_allclose(merit.m20[2], 0.5 * merit.m20[0], rtol=0.1)
+
+    # chunking and the process pool do not change anything
+    batch = LatticeBatch.from_lattices(candidates * 3)
+    for kwargs in [dict(chunksize=1), dict(jobs=2)]:
+        chunked = scoreLattices(dSpacing, batch, **kwargs)
+        np.testing.assert_allclose(chunked.m20, np.tile(merit.m20, 3))
+        np.testing.assert_allclose(chunked.fn, np.tile(merit.fn, 3))
+
+
+def test_score_single():
+    # a cubic pattern in a few lines with a known value
+    lattice = LatticeBuilder.construct_cubic(4.0)
+    dSpacing = lattice.toDspacings([[1, 0, 0], [1, 1, 0], [1, 1, 1]]) * np.asarray([1.001, 1.0, 1.0])
+    qObs = 1.0 / np.square(np.sort(dSpacing)[::-1])
+    error = np.abs(1.0 / 16.0 - qObs[0]) / 3.0
+    merit = scoreLattices(dSpacing, [lattice])
+    np.testing.assert_allclose(merit.m20, qObs[-1] / (2.0 * error * 3))
+
+
+def test_neighbour_lines():
+    qCalc = np.asarray([[0.1, 0.2, 0.4], [0.05, 0.3, 0.9]])
+    below, above = neighbourLines(qCalc, np.asarray([0.0, 0.25, 1.0]))
+    np.testing.assert_equal(below, [[0, 1, 1], [0, 0, 1]])
+    np.testing.assert_equal(above, [[0, 2, 2], [0, 1, 2]])
+
+    np.testing.assert_allclose(deWolffM20(0.5, [0.001, 0.0], [10, 0]), [25.0, 0.5 / np.finfo(float).eps])
+
+
+def test_score_errors():
+    lattice = LatticeBuilder.construct_cubic(4.0)
+    with pytest.raises(ValueError, match="at least one observed d-spacing"):
+        scoreLattices([], [lattice])
+    with pytest.raises(ValueError, match="cannot be observed at wavelength"):
+        scoreLattices([0.5], [lattice])
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
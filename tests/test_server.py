@@ -0,0 +1,123 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import crystalsystems
+import pytest
+from crystalsystems.server import processRequest, sendRequests, serve
+
+HKL = [[1, 0, 0], [0, 1, 0], [0, 0, 1], [1, 1, 0], [1, 0, 1], [0, 1, 1]]
+D_VALS = [3.0, 4.0, 5.0, 2.4, 2.5724787771376323, 3.1234752377721215]
+
+
+class BytesWriter:
+    def __init__(self):
+        self.data = b""
+
+    def write(self, data):
+        self.data += data
+
+    async def drain(self):
+        await asyncio.sleep(0)
+
+
+def test_process_request(cif_file):
+    record = processRequest({"id": "inline", "hkl": HKL, "d": D_VALS})
+    assert record["status"] == "ok"
+    assert record["id"] == "inline"
+    assert record["reflections"] == 6
+    assert record["a"] == pytest.approx(3.0)
+
+    record = processRequest({"filename": cif_file})
+    assert record["status"] == "ok"
+    assert record["id"] is None
+
+    record = processRequest({"id": 1, "hkl": HKL[:2], "d": D_VALS[:2]})
+    assert record["status"] == "error"
+
+
+@pytest.mark.parametrize("max_pending", [1, 4])
+def test_serve(max_pending):
+    requests = [{"id": index, "hkl": HKL, "d": D_VALS} for index in range(10)]
+    lines = [json.dumps(request) + "\n" for request in requests] + ["\n", "not json\n"]
+
+    async def run():
+        reader = asyncio.StreamReader()
+        reader.feed_data("".join(lines).encode())
+        reader.feed_eof()
+        writer = BytesWriter()
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            await serve(reader, writer, executor, max_pending=max_pending)
+        return [json.loads(line) for line in writer.data.decode().splitlines()]
+
+    records = asyncio.run(run())
+    assert len(records) == 11
+    assert sorted(record["id"] for record in records if record["id"] is not None) == list(range(10))
+    assert sum(record["status"] == "error" for record in records) == 1
+
+
+def test_serve_client_gone():
+    class BrokenWriter(BytesWriter):
+        async def drain(self):
+            raise ConnectionResetError("client went away")
+
+    lines = "".join(json.dumps({"id": index, "hkl": HKL, "d": D_VALS}) + "\n" for index in range(20))
+
+    async def run():
+        reader = asyncio.StreamReader()
+        reader.feed_data(lines.encode())
+        reader.feed_eof()
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            await asyncio.wait_for(serve(reader, BrokenWriter(), executor, max_pending=2), timeout=30)
+
+    # the error is raised rather than waiting forever for room in the results
+    with pytest.raises(ConnectionResetError, match="client went away"):
+        asyncio.run(run())
+
+
+def test_stdin():
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(crystalsystems.__file__)))
+    requests = "".join(json.dumps({"id": index, "hkl": HKL, "d": D_VALS}) + "\n" for index in range(3))
+    result = subprocess.run(
+        [sys.executable, "-m", "crystalsystems", "--serve", "--jobs", "1"],
+        input=requests,
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+    records = [json.loads(line) for line in result.stdout.splitlines()]
+    assert sorted(record["id"] for record in records) == [0, 1, 2]
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs Unix sockets")
+def test_socket(cif_file, tmp_path):
+    path = str(tmp_path / "server.sock")
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(crystalsystems.__file__)))
+    server = subprocess.Popen(
+        [sys.executable, "-m", "crystalsystems", "--serve", "--socket", path, "--jobs", "1"], env=env
+    )
+    try:
+        for _ in range(100):
+            if os.path.exists(path):
+                break
+            time.sleep(0.1)
+        records = sendRequests(path, [{"id": 1, "hkl": HKL, "d": D_VALS}, {"id": 2, "filename": cif_file}])
+        assert sorted(record["id"] for record in records) == [1, 2]
+        assert all(record["status"] == "ok" for record in records)
+
+        # the server keeps going for more connections
+        records = sendRequests(path, [{"id": 3, "hkl": HKL, "d": D_VALS}])
+        assert records[0]["id"] == 3
+    finally:
+        server.terminate()
+        assert server.wait(timeout=10) == 0
+    assert not os.path.exists(path)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,179 @@
+import numpy as np
+import pytest
+from crystalsystems.lattice import LatticeBuilder
+from crystalsystems.matching import matchPeaks
+from crystalsystems.reflections import ReflectionTable
+from crystalsystems.scoring import _half_grid, scoreLattices
+from crystalsystems.spacegroup import LAUE_CLASSES, SPACE_GROUPS, SpaceGroup, _parse_condition, getSpaceGroup
+
+GRID = _half_grid([5, 5, 5])
+
+
+@pytest.mark.parametrize(
+    ("laue", "order"),
+    [("-1", 2), ("2/m", 4), ("mmm", 8), ("4/m", 8), ("4/mmm", 16), ("-3", 6), ("-3m1", 12), ("-31m", 12)]
+    + [("6/m", 12), ("6/mmm", 24), ("m-3", 24), ("m-3m", 48)],
+)
+def test_laue_classes(laue, order):
+    operations = LAUE_CLASSES[laue]
+    assert operations.shape == (order, 3, 3)
+    np.testing.assert_equal(operations[0], np.eye(3))
+    # closed under products
+    products = {tuple(a.dot(b).ravel()) for a in operations for b in operations}
+    assert products == {tuple(operation.ravel()) for operation in operations}
+
+
+def test_laue_classes_keep_metric():
+    # every operation leaves d-spacings of a cell of the right shape unchanged
+    cells = {
+        "2/m": (3, 4, 5, 90, 100, 90),
+        "mmm": (3, 4, 5, 90, 90, 90),
+        "4/mmm": (3, 3, 5, 90, 90, 90),
+        "-3m1": (3, 3, 5, 90, 90, 120),
+        "-31m": (3, 3, 5, 90, 90, 120),
+        "6/mmm": (3, 3, 5, 90, 90, 120),
+        "m-3m": (3, 3, 3, 90, 90, 90),
+    }
+    for laue, constants in cells.items():
+        lattice = LatticeBuilder.construct_from_scalars(*constants)
+        expected = lattice.toDspacings(GRID)
+        for operation in LAUE_CLASSES[laue]:
+            np.testing.assert_allclose(lattice.toDspacings(GRID @ operation.T), expected)
+
+
+def test_parse_condition():
+    condition = _parse_condition("hhl: 2h+l=4n")
+    np.testing.assert_equal(condition.zone, [[-1, 1, 0]])
+    np.testing.assert_equal(condition.rule, [2, 0, 1])
+    assert condition.modulus == 4
+
+    condition = _parse_condition("h-hl: l=2n")
+    np.testing.assert_equal(condition.zone, [[1, 1, 0]])
+    assert _parse_condition("hkl: -h+k+l=3n").zone.shape == (0, 3)
+    np.testing.assert_equal(_parse_condition("00l: l=6n").zone, [[1, 0, 0], [0, 1, 0]])
+
+    with pytest.raises(ValueError, match="Cannot parse the zone"):
+        _parse_condition("hk: h=2n")
+
+
+@pytest.mark.parametrize(
+    ("symbol", "present", "absent"),
+    [
+        ("Fm-3m", [[1, 1, 1], [2, 0, 0], [2, 2, 0], [3, 1, 1]], [[1, 0, 0], [1, 1, 0], [2, 1, 0]]),
+        ("Fd-3m", [[1, 1, 1], [4, 0, 0], [2, 2, 0], [0, 2, 2]], [[2, 0, 0], [0, 0, 2], [0, 4, 2], [4, 2, 0]]),
+        ("Im-3m", [[1, 1, 0], [2, 0, 0], [2, 1, 1]], [[1, 0, 0], [1, 1, 1]]),
+        ("Ia-3d", [[2, 1, 1], [4, 0, 0], [2, 2, 0]], [[1, 1, 0], [0, 0, 2], [1, 1, 4], [2, 2, 2]]),
+        ("Pa-3", [[0, 2, 1], [1, 0, 2], [2, 1, 0], [1, 1, 1]], [[0, 1, 1], [1, 0, 1], [1, 1, 0]]),
+        ("P21/c", [[0, 2, 0], [1, 0, 2], [1, 1, 1], [0, 1, 1]], [[0, 1, 0], [1, 0, 1], [0, 0, 1]]),
+        ("Pnma", [[0, 1, 1], [2, 1, 0], [1, 0, 1]], [[0, 1, 0], [0, 1, 2], [1, 1, 0], [1, 0, 0]]),
+        ("I41/amd", [[0, 0, 4], [1, 0, 1], [2, 2, 0], [1, 1, 2]], [[0, 0, 2], [1, 1, 0], [3, 1, 0], [1, 3, 0]]),
+        ("P63/mmc", [[1, 0, 1], [0, 0, 2], [1, 1, 0], [1, 1, 2]], [[0, 0, 1], [1, 1, 1], [-1, 2, 1]]),
+        ("R-3m", [[1, 0, 1], [0, 1, 2], [0, 0, 3], [1, 1, 0]], [[1, 0, 0], [0, 0, 1], [0, 1, 0]]),
+        ("P-1", [[0, 0, 1], [1, 1, 1]], []),
+    ],
+)
+def test_absent(symbol, present, absent):
+    group = getSpaceGroup(symbol)
+    assert not np.any(group.absent(np.asarray(present).reshape(-1, 3)))
+    assert np.all(group.absent(np.asarray(absent).reshape(-1, 3)))
+
+
+def test_absent_invariant():
+    # the absences of every group are the same for all Laue equivalents and Friedel pairs
+    for group in SPACE_GROUPS.values():
+        images = np.einsum("oij,nj->oni", group.operations, GRID)
+        absent = group.absent(images.reshape(-1, 3)).reshape(len(images), -1)
+        assert np.all(absent == absent[0]), group.symbol
+
+
+def test_lookup():
+    assert getSpaceGroup("P 1 21/c 1") is getSpaceGroup("P21/c")
+    assert getSpaceGroup("F d -3 m").symbol == "Fd-3m"
+    with pytest.raises(ValueError, match="Unknown or unsupported space group"):
+        getSpaceGroup("X99")
+    with pytest.raises(ValueError, match="Unknown Laue class"):
+        SpaceGroup("P1", "unknown")
+
+
+def test_drop_absent():
+    group = getSpaceGroup("Im-3m")
+    table = ReflectionTable([[1, 0, 0], [1, 1, 0], [1, 1, 1], [2, 0, 0]], [4.0, 2.83, 2.31, 2.0])
+    kept = group.dropAbsent(table)
+    assert isinstance(kept, ReflectionTable)
+    np.testing.assert_equal(kept.hkl, [[1, 1, 0], [2, 0, 0]])
+
+    reflections = group.dropAbsent(LatticeBuilder.construct_cubic(4.0).reflections(1.5))
+    assert not np.any(group.absent(reflections))
+
+
+def test_merge_generated():
+    lattice = LatticeBuilder.construct_cubic(4.0)
+    group = getSpaceGroup("Fm-3m")
+    everything = lattice.reflections(1.0)
+    merged = group.merge(everything)
+    np.testing.assert_equal(merged.hkl[:3], [[1, 1, 1], [2, 0, 0], [2, 2, 0]])
+    np.testing.assert_equal(merged.multiplicity[:3], [8, 6, 12])
+    assert merged.multiplicity.sum() == np.count_nonzero(~group.absent(everything))
+    assert np.all(np.diff(merged.d) <= 0)
+
+    # the same as generating with the space group
+    generated = lattice.reflections(1.0, merge="laue", space_group=group)
+    for column, expected in zip(generated, merged):
+        np.testing.assert_allclose(column, expected)
+    assert len(generated.d) < len(lattice.reflections(1.0, merge="laue").d)
+
+
+@pytest.mark.parametrize(
+    ("constants", "symbol"),
+    [((2, 2, 3, 90, 90, 90), "Pm-3m"), ((4, 4, 4, 90, 90, 90), "Fm-3m"), ((3, 3, 5, 90, 90, 120), "P63/mmc")],
+)
+def test_merge_generated_agrees(constants, symbol):
+    # generating with a space group is the same as merging the generated reflections with it
+    lattice = LatticeBuilder.construct_from_scalars(*constants)
+    group = getSpaceGroup(symbol)
+    everything = lattice.reflections(1.2)
+    merged = group.merge(everything)
+    generated = lattice.reflections(1.2, merge="laue", space_group=group)
+    for column, expected in zip(generated, merged):
+        np.testing.assert_allclose(column, expected)
+    assert generated.multiplicity.sum() == np.count_nonzero(~group.absent(everything))
+
+
+def test_merge_table():
+    table = ReflectionTable(
+        [[1, 0, 0], [0, 1, 0], [0, 0, -1], [1, 1, 0], [1, 1, 1]],
+        [4.0, 4.0002, 3.9998, 2.83, 2.31],
+        sigma=[1e-3, 1e-3, 2e-3, 1e-3, 1e-3],
+    )
+    merged = getSpaceGroup("Pm-3m").merge(table)
+    assert isinstance(merged, ReflectionTable)
+    np.testing.assert_equal(merged.hkl, [[1, 0, 0], [1, 1, 0], [1, 1, 1]])
+    np.testing.assert_equal(merged.multiplicity, [3, 1, 1])
+    np.testing.assert_allclose(merged.d[0], (4.0 + 4.0002 + 3.9998 / 4) / 2.25)
+    np.testing.assert_allclose(merged.sigma[0], 1.0 / np.sqrt(2.25e6))
+
+    # body centring removes 100 and 111
+    merged = getSpaceGroup("Im-3m").merge(ReflectionTable(table.hkl, table.d, multiplicity=[1, 2, 3, 4, 5]))
+    np.testing.assert_equal(merged.hkl, [[1, 1, 0]])
+    np.testing.assert_equal(merged.multiplicity, [4])
+
+
+def test_match_and_score():
+    lattice = LatticeBuilder.construct_cubic(5.0)
+    group = getSpaceGroup("Fm-3m")
+    observed = lattice.reflections(1.2, merge="laue", space_group=group).d
+    observed = observed * (1.0 + 1e-4 * np.random.default_rng(0).uniform(-1, 1, len(observed)))
+
+    match = matchPeaks(observed, lattice, tolerance=1e-4, space_group=group)
+    assert np.all(match.assigned)
+    assert not np.any(group.absent(match.hkl))
+
+    # without the absences the same cell predicts more lines than are seen
+    merit = scoreLattices(observed, [lattice, lattice], space_group=group)
+    primitive = scoreLattices(observed, [lattice])
+    assert merit.m20[0] > 2.0 * primitive.m20[0]
+    np.testing.assert_allclose(merit.m20[1], merit.m20[0])
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
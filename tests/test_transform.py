@@ -0,0 +1,142 @@
+import numpy as np
+import pytest
+from crystalsystems.lattice import LatticeBatch, LatticeBuilder, niggli_reduce
+from crystalsystems.reflections import ReflectionTable
+from crystalsystems.scoring import _half_grid
+from crystalsystems.transform import (
+    CENTRED_TO_PRIMITIVE,
+    HEXAGONAL_TO_RHOMBOHEDRAL,
+    PERMUTATIONS,
+    supercell,
+    transformHkl,
+    transformLattices,
+)
+
+GRID = _half_grid([4, 4, 4])
+
+# the integral condition of each centring, as (rule, modulus)
+CENTRING = {"A": ([0, 1, 1], 2), "B": ([1, 0, 1], 2), "C": ([1, 1, 0], 2), "I": ([1, 1, 1], 2), "R": ([-1, 1, 1], 3)}
+
+
+@pytest.mark.parametrize("centring", ["A", "B", "C", "I", "F", "R"])
+def test_centred_to_primitive(centring):
+    if centring == "R":
+        lattice = LatticeBuilder.construct_hexagonal(3.0, 10.0)
+    else:
+        lattice = LatticeBuilder.construct_from_scalars(3.0, 4.0, 5.0, 90, 90, 90)
+    transform = CENTRED_TO_PRIMITIVE[centring]
+    primitive = transformLattices(lattice, transform)
+    np.testing.assert_allclose(primitive.volume, lattice.volume * np.linalg.det(transform))
+
+    if centring == "F":
+        allowed = np.all(GRID % 2 == GRID[:, :1] % 2, axis=1)
+    else:
+        rule, modulus = CENTRING[centring]
+        allowed = GRID @ rule % modulus == 0
+    hkl = transformHkl(GRID[allowed], transform)
+    assert hkl.dtype == np.int8
+    np.testing.assert_allclose(primitive.toDspacings(hkl), lattice.toDspacings(GRID[allowed]))
+
+    # the absences of the centred cell are not reflections of the primitive one
+    with pytest.raises(ValueError, match="hkl are not integers in the new cell"):
+        transformHkl(GRID[~allowed], transform)
+
+
+def test_rhombohedral():
+    hexagonal = LatticeBuilder.construct_hexagonal(3.0, 10.0)
+    rhombohedral = transformLattices(hexagonal, HEXAGONAL_TO_RHOMBOHEDRAL)
+    a_length, b_length, c_length, alpha, beta, gamma = rhombohedral.scalar_lattice_constants()
+    np.testing.assert_allclose([b_length, c_length], a_length)
+    np.testing.assert_allclose([beta, gamma], alpha)
+
+    # and back again
+    hexagonal.assert_allclose(transformLattices(rhombohedral, np.linalg.inv(HEXAGONAL_TO_RHOMBOHEDRAL)))
+
+
+def test_fcc_primitive():
+    primitive = transformLattices(LatticeBuilder.construct_cubic(4.0), CENTRED_TO_PRIMITIVE["F"])
+    np.testing.assert_allclose(primitive.scalar_lattice_constants(), [4.0 / np.sqrt(2)] * 3 + [60.0] * 3)
+
+
+def test_supercell():
+    lattice = LatticeBuilder.construct_from_scalars(3.1, 4.2, 5.3, 80, 95, 110)
+    transform = supercell([2, 1, 3])
+    bigger = transformLattices(lattice, transform)
+    np.testing.assert_allclose(bigger.scalar_lattice_constants()[:3], [6.2, 4.2, 15.9])
+    np.testing.assert_allclose(bigger.volume, 6 * lattice.volume)
+
+    hkl = transformHkl(GRID, transform)
+    np.testing.assert_equal(hkl, GRID * [2, 1, 3])
+    np.testing.assert_allclose(bigger.toDspacings(hkl), lattice.toDspacings(GRID))
+
+    for multiples in [[1, 2], [0, 1, 1]]:
+        with pytest.raises(ValueError, match="Expected three positive multiples"):
+            supercell(multiples)
+
+
+@pytest.mark.parametrize("name", list(PERMUTATIONS))
+def test_permutations(name):
+    lattice = LatticeBuilder.construct_from_scalars(3.1, 4.2, 5.3, 80, 95, 110)
+    transform = PERMUTATIONS[name]
+    assert np.linalg.det(transform) == pytest.approx(1.0)
+    permuted = transformLattices(lattice, transform)
+    np.testing.assert_allclose(permuted.volume, lattice.volume)
+    lengths = dict(zip("abc", lattice.scalar_lattice_constants()[:3]))
+    expected = [lengths[axis] for axis in name.replace("-", "")]
+    np.testing.assert_allclose(permuted.scalar_lattice_constants()[:3], expected)
+    np.testing.assert_allclose(permuted.toDspacings(transformHkl(GRID, transform)), lattice.toDspacings(GRID))
+
+
+def test_batches():
+    rng = np.random.default_rng(0)
+    constants = np.column_stack((rng.uniform(3, 6, (50, 3)), rng.uniform(80, 100, (50, 3))))
+    cells = LatticeBuilder.construct_from_scalars(*constants.T)
+    transform = CENTRED_TO_PRIMITIVE["I"]
+
+    # one matrix for every cell
+    batch = transformLattices(cells, transform)
+    assert isinstance(batch, LatticeBatch)
+    for cell, transformed in zip(cells, batch):
+        transformed.assert_allclose(transformLattices(cell, transform))
+    np.testing.assert_allclose(transformLattices(cells.vectors, transform).vectors, batch.vectors)
+
+    # a matrix per cell
+    transforms = np.stack([supercell([1 + index % 3, 1, 1]) for index in range(len(cells))])
+    batch = transformLattices(cells, transforms)
+    np.testing.assert_allclose(batch.volume, cells.volume * (1 + np.arange(len(cells)) % 3))
+
+    # many matrices applied to the same hkl
+    hkl = transformHkl(GRID, list(PERMUTATIONS.values()))
+    assert hkl.shape == (len(PERMUTATIONS), len(GRID), 3)
+    np.testing.assert_equal(hkl[0], GRID[:, [1, 2, 0]])
+
+
+def test_reflection_table():
+    lattice = LatticeBuilder.construct_from_scalars(3.1, 4.2, 5.3, 80, 95, 110)
+    table = ReflectionTable(GRID, lattice.toDspacings(GRID))
+    transformed = transformHkl(table, PERMUTATIONS["cab"])
+    assert transformed.d is table.d
+    np.testing.assert_equal(transformed.hkl, GRID[:, [2, 0, 1]])
+
+
+def test_reduced_transform():
+    # the matrix of a reduction re-indexes reflections into the reduced cell
+    lattice = LatticeBuilder.construct_from_scalars(3.1, 4.2, 5.3, 80, 95, 110)
+    skewed = transformLattices(lattice, [[1, 0, 0], [2, 1, 0], [-1, 1, 1]])
+    reduced = niggli_reduce(skewed)
+    hkl = transformHkl(GRID, reduced.transform)
+    np.testing.assert_allclose(reduced.lattice.toDspacings(hkl), skewed.toDspacings(GRID))
+
+
+def test_invalid():
+    lattice = LatticeBuilder.construct_cubic(4.0)
+    with pytest.raises(ValueError, match="have to be invertible"):
+        transformLattices(lattice, np.ones((3, 3)))
+    with pytest.raises(ValueError, match="Expected transforms of shape"):
+        transformLattices(lattice, np.eye(2))
+    with pytest.raises(ValueError, match="Expected transforms of shape"):
+        transformHkl(GRID, np.eye(4))
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])